@@ -5,17 +5,34 @@ from flask import Flask, render_template, request, redirect, url_for, flash, jso
 from datetime import date, timedelta, datetime
 import os
 import json
+import re
+import math
+import logging
 import secrets
 from werkzeug.utils import secure_filename
 
 # Lokale Imports
 from config import Config
-from models import db, Customer, Quote, QuoteItem, QuoteSubItem, Supplier, CompanySettings, QuoteRejection, Order, SupplierOrder, SupplierOrderItem, WorkInstruction, AcquisitionChannel, PositionTemplate, PositionTemplateSubItem, Invoice, InvoiceReminder, Article, InvoicePosition
+from models import db, DEFAULT_QUOTE_TEXTS, Customer, CustomerStatusChange, Quote, QuoteItem, QuoteSubItem, Supplier, CompanySettings, QuoteRejection, Order, SupplierOrder, SupplierOrderItem, WorkInstruction, AcquisitionChannel, PositionTemplate, PositionTemplateSubItem, Invoice, InvoiceReminder, Article, InvoicePosition, sub_position_from_number
 from flask_migrate import Migrate
 from forms import CustomerForm, QuoteForm, SupplierForm, SettingsForm, QuoteRejectionForm, SupplierOrderUpdateForm, OrderForm, OrderUpdateForm, AcquisitionChannelForm, CustomerWorkflowForm, AppointmentForm
 from utils import get_default_hourly_rate, generate_quote_number, load_position_templates, load_suppliers, update_quote_total, safe_float_conversion, parse_quantity_from_text
 from pdf_export import PDFExporter
-from work_steps import get_work_steps
+from quote_builder import apply_templates_to_quote, reorder_quote, renumber_sub_items
+from quote_batch import apply_quote_operations
+from quote_fragments import render_item_rows, quote_totals, render_totals
+from quote_snapshot import write_quote_snapshot, quote_positions, quote_costs
+from purchasing import create_supplier_orders, open_purchase_runs, generate_purchase_run_email, mark_purchase_run_ordered, start_purchase_run
+from mail_queue import mail_enabled, enqueue_supplier_order_email, wake_mail_sender
+from pricing_engine import price_template_batch
+from master_data_cache import (
+    get_suppliers, get_supplier_categories, get_position_templates, get_acquisition_channels, get_articles,
+    get_position_template_catalog, get_position_template, master_data_etag
+)
+from work_steps import get_work_steps, replace_work_steps
+from http_cache import conditional_get
+
+logger = logging.getLogger(__name__)
 
 # Upload-Konfiguration und Hilfsfunktionen
 ALLOWED_PHOTO_EXTENSIONS = {'png', 'jpg', 'jpeg'}
@@ -77,7 +94,7 @@ def safe_sqlite_operation(db_path, operation_func, *args, **kwargs):
                 conn.commit()
                 return result
     except Exception as e:
-        print(f"SQLite operation failed: {str(e)}")
+        logger.error("SQLite-Operation fehlgeschlagen: %s", e)
         raise e
 
 def create_app():
@@ -93,6 +110,44 @@ def create_app():
     # Flask-Migrate initialisieren
     migrate = Migrate(app, db)
     
+    # Request-IDs für das Logging
+    from logging_config import init_request_logging
+    init_request_logging(app)
+    
+    # SQL-Monitoring (Abfragen pro Request, N+1-Erkennung, Slow-Query-Log)
+    from query_monitor import init_query_monitor
+    init_query_monitor(app, db)
+    
+    # Laufzeit-Metriken (Prometheus)
+    from metrics import init_metrics
+    init_metrics(app, db)
+    
+    # Request-Profiler (nur aktiv, wenn im Admin-Bereich eingeschaltet)
+    from profiler import init_profiler
+    init_profiler(app)
+    
+    # Stammdaten-Cache (Invalidierung bei jeder Änderung über Versionszähler)
+    from master_data_cache import init_master_data_cache
+    init_master_data_cache(app)
+    
+    # Automatische Kunden-Status-Updates (Intervall-Job + CLI-Befehl)
+    from customer_status_job import init_customer_status_job
+    init_customer_status_job(app)
+    
+    # E-Mail-Warteschlange für Lieferantenbestellungen (Hintergrund-Versand + CLI-Befehl)
+    from mail_queue import init_mail_queue
+    init_mail_queue(app)
+    
+    # Komprimierung (gzip/Brotli) und Fingerprint-URLs mit langem Caching für statische Dateien
+    from compression import init_compression
+    from http_cache import init_static_fingerprints
+    init_compression(app)
+    init_static_fingerprints(app)
+    
+    # Jinja-Bytecode-Cache und Vorwärmen der Templates (schneller Worker-Start)
+    from worker_startup import init_template_cache
+    init_template_cache(app)
+    
     # Datenbankinitialisierung für Railway (nur zur Laufzeit)
     if os.environ.get('DATABASE_URL'):  # Nur auf Railway
         with app.app_context():
@@ -101,10 +156,10 @@ def create_app():
                 from sqlalchemy import text
                 with db.engine.connect() as connection:
                     connection.execute(text("SELECT 1 FROM login_admins LIMIT 1"))
-                print("✅ Datenbank bereits initialisiert")
+                logger.info("Datenbank bereits initialisiert")
             except:
                 # Initialisiere DB
-                print("🔧 Initialisiere Railway-Datenbank...")
+                logger.info("Initialisiere Railway-Datenbank...")
                 
                 from models import (LoginAdmin, Customer, Quote, QuoteItem, QuoteSubItem, 
                                   Supplier, CompanySettings, AcquisitionChannel, Article, InvoicePosition)
@@ -151,7 +206,7 @@ def create_app():
                     db.session.add(channel)
                 
                 db.session.commit()
-                print("✅ Railway-Datenbank erfolgreich initialisiert!")
+                logger.info("Railway-Datenbank erfolgreich initialisiert")
     
     # Upload-Konfiguration
     app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'static', 'uploads')
@@ -161,16 +216,6 @@ def create_app():
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     
     # Template-Filter registrieren
-    @app.template_filter('from_json')
-    def from_json_filter(value):
-        """Konvertiert JSON-String zu Python-Objekt"""
-        if not value:
-            return []
-        try:
-            return json.loads(value)
-        except (json.JSONDecodeError, TypeError):
-            return []
-    
     @app.template_filter('currency')
     def currency_filter(value):
         """Formatiert einen Wert als Währung"""
@@ -319,9 +364,26 @@ def register_routes(app):
     @login_required
     def send_supplier_order_email(order_id):
         from models import SupplierOrder
+        from utils import get_supplier_email
         order = SupplierOrder.query.get_or_404(order_id)
         
-        # Status auf 'Bestellt' setzen
+        if order.email_status == 'In Warteschlange':
+            flash(f'Die Bestellung an {order.supplier_name} wird bereits per E-Mail verschickt.', 'info')
+            return redirect(url_for('supplier_orders'))
+        
+        # Mit SMTP-Server: E-Mail einreihen, der Status wechselt nach dem Versand im Hintergrund
+        if mail_enabled() and get_supplier_email(order.supplier_name):
+            try:
+                enqueue_supplier_order_email(order.supplier_name, [order])
+                db.session.commit()
+                wake_mail_sender()
+                flash(f'Die Bestellung an {order.supplier_name} wird per E-Mail verschickt und danach als "Bestellt" markiert.', 'success')
+            except Exception as e:
+                safe_rollback()
+                flash(f'Fehler beim Einreihen der E-Mail: {str(e)}', 'error')
+            return redirect(url_for('supplier_orders'))
+        
+        # Status auf 'Bestellt' setzen (E-Mail wurde manuell verschickt)
         order.status = 'Bestellt'
         db.session.commit()
         flash('Die Bestellung wurde als "Bestellt" markiert!', 'success')
@@ -334,6 +396,7 @@ def register_routes(app):
     def index():
         from models import Customer, Quote, Order, SupplierOrder, InvoiceReminder
         from datetime import datetime, timedelta
+        from sqlalchemy.orm import joinedload, load_only
         
         # Dashboard-Statistiken berechnen (ohne Preisinformationen)
         total_customers = Customer.query.count()
@@ -341,11 +404,20 @@ def register_routes(app):
         active_orders = Order.query.filter(Order.status.in_(['Geplant', 'In Arbeit'])).count()
         
         # Letzte Aktivitäten (letzte 5 Angebote/Aufträge)
-        recent_quotes = Quote.query.order_by(Quote.created_at.desc()).limit(3).all()
-        recent_orders = Order.query.order_by(Order.created_at.desc()).limit(3).all()
+        # Nur die angezeigten Spalten laden (ohne lange Angebotstexte)
+        recent_quotes = Quote.query.options(
+            load_only(*Quote.list_columns()),
+            joinedload(Quote.customer).load_only(*Customer.list_columns())
+        ).order_by(Quote.created_at.desc()).limit(3).all()
+        order_list_options = (
+            load_only(*Order.list_columns()),
+            joinedload(Order.quote).load_only(*Quote.list_columns())
+                .joinedload(Quote.customer).load_only(*Customer.list_columns()),
+        )
+        recent_orders = Order.query.options(*order_list_options).order_by(Order.created_at.desc()).limit(3).all()
         
         # Anstehende Termine (Aufträge die in den nächsten 7 Tagen starten)
-        upcoming_orders = Order.query.filter(
+        upcoming_orders = Order.query.options(*order_list_options).filter(
             Order.start_date >= datetime.now().date(),
             Order.start_date <= (datetime.now() + timedelta(days=7)).date(),
             Order.status.in_(['Geplant', 'In Arbeit'])
@@ -372,6 +444,128 @@ def register_routes(app):
                              invoice_reminders=needed_reminders,
                              today=datetime.now().strftime('%d.%m.%Y'))
     
+    # ===============================
+    # SQL-MONITORING, METRIKEN UND PROFILER (ADMIN)
+    # ===============================
+    
+    @app.route('/metrics')
+    def metrics():
+        """Laufzeit-Metriken im Prometheus-Textformat (Bearer-Token oder Admin-Login)"""
+        import hmac
+        from flask import Response
+        from metrics import generate_metrics
+        
+        token = app.config.get('METRICS_TOKEN')
+        auth_header = request.headers.get('Authorization', '')
+        token_valid = bool(token) and hmac.compare_digest(auth_header, f'Bearer {token}')
+        if not token_valid and 'login_admin_id' not in session:
+            return Response('Nicht autorisiert', status=401, headers={'WWW-Authenticate': 'Bearer'})
+        
+        data, content_type = generate_metrics()
+        return Response(data, content_type=content_type)
+    
+    @app.route('/admin/query-stats')
+    @login_required
+    def query_stats():
+        """SQL-Statistiken pro Endpoint (Abfragen, DB-Zeit, N+1-Verdacht, langsame Abfragen)"""
+        from query_monitor import get_query_stats
+        return render_template('query_stats.html',
+                             stats=get_query_stats(),
+                             slow_threshold_ms=app.config.get('SLOW_QUERY_THRESHOLD_MS'),
+                             n_plus_one_threshold=app.config.get('N_PLUS_ONE_THRESHOLD'),
+                             monitor_enabled=app.config.get('QUERY_MONITOR_ENABLED'))
+    
+    @app.route('/admin/query-stats/reset', methods=['POST'])
+    @login_required
+    def reset_query_stats():
+        """SQL-Statistiken zurücksetzen"""
+        from query_monitor import reset_query_stats as reset_stats
+        reset_stats()
+        flash('SQL-Statistiken wurden zurückgesetzt.', 'success')
+        return redirect(url_for('query_stats'))
+    
+    @app.route('/admin/profiler')
+    @login_required
+    def profiler_overview():
+        """Profiler-Steuerung und Liste der aufgezeichneten Profile"""
+        from profiler import get_profiler_status, list_profiles
+        return render_template('profiler.html',
+                             status=get_profiler_status(),
+                             profiles=list_profiles())
+    
+    @app.route('/admin/profiler/start', methods=['POST'])
+    @login_required
+    def start_profiler():
+        """Profiler für ein Pfad-Muster einschalten"""
+        from profiler import start_profiling
+        path_pattern = request.form.get('path_pattern', '').strip() or '.*'
+        max_requests = request.form.get('max_requests', 10, type=int)
+        only_my_session = request.form.get('only_my_session') == 'on'
+        
+        if not max_requests or max_requests < 1 or max_requests > 500:
+            flash('Anzahl Requests muss zwischen 1 und 500 liegen!', 'error')
+            return redirect(url_for('profiler_overview'))
+        
+        try:
+            start_profiling(path_pattern, max_requests,
+                            admin_id=session.get('login_admin_id') if only_my_session else None)
+            flash(f'Profiler gestartet: die nächsten {max_requests} Requests auf "{path_pattern}" werden aufgezeichnet.', 'success')
+        except Exception as e:
+            flash(f'Fehler beim Starten des Profilers: {str(e)}', 'error')
+        return redirect(url_for('profiler_overview'))
+    
+    @app.route('/admin/profiler/stop', methods=['POST'])
+    @login_required
+    def stop_profiler():
+        """Profiler ausschalten"""
+        from profiler import stop_profiling
+        stop_profiling()
+        flash('Profiler gestoppt.', 'success')
+        return redirect(url_for('profiler_overview'))
+    
+    @app.route('/admin/profiler/clear', methods=['POST'])
+    @login_required
+    def clear_profiles():
+        """Alle gespeicherten Profile löschen"""
+        from profiler import delete_profiles
+        delete_profiles()
+        flash('Alle Profile wurden gelöscht.', 'success')
+        return redirect(url_for('profiler_overview'))
+    
+    @app.route('/admin/profiler/<run_id>/<name>')
+    @login_required
+    def profile_detail(run_id, name):
+        """Top-Funktionen eines aufgezeichneten Profils"""
+        from profiler import get_top_functions, list_profiles
+        sort_by = request.args.get('sort', 'cumulative')
+        if sort_by not in ('cumulative', 'tottime'):
+            sort_by = 'cumulative'
+        
+        top_functions = get_top_functions(run_id, name, sort_by=sort_by)
+        if top_functions is None:
+            flash('Profil nicht gefunden!', 'error')
+            return redirect(url_for('profiler_overview'))
+        
+        profile = next((p for p in list_profiles() if p['run_id'] == run_id and p['name'] == name), {})
+        return render_template('profile_detail.html',
+                             profile=profile,
+                             run_id=run_id,
+                             name=name,
+                             sort_by=sort_by,
+                             top_functions=top_functions)
+    
+    @app.route('/admin/profiler/<run_id>/<name>/download')
+    @login_required
+    def download_profile(run_id, name):
+        """Profil als .prof-Datei herunterladen (z.B. für snakeviz)"""
+        from flask import send_file
+        from profiler import get_profile_path
+        path = get_profile_path(run_id, name)
+        if not path:
+            flash('Profil nicht gefunden!', 'error')
+            return redirect(url_for('profiler_overview'))
+        return send_file(path, as_attachment=True, download_name=f'{name}.prof')
+    
     # ===============================
     # USER MANAGEMENT (ADMIN)
     # ===============================
@@ -385,7 +579,7 @@ def register_routes(app):
             admins = LoginAdmin.query.all()
         except Exception as e:
             # Falls keine Login-Tabelle vorhanden (z.B. nach Backup-Wiederherstellung)
-            print(f"Warnung: Login-Tabelle nicht gefunden: {e}")
+            logger.warning("Login-Tabelle nicht gefunden: %s", e)
             flash('⚠️ Login-Verwaltung nicht verfügbar - Login-Daten sind aus Sicherheitsgründen nicht im Backup enthalten.', 'warning')
             admins = []
         return render_template('admin_users.html', admins=admins)
@@ -494,21 +688,6 @@ def register_routes(app):
     def customers():
         from flask import request
         
-        # Automatische Status-Updates für alle Kunden prüfen
-        customers_to_update = Customer.query.filter(
-            db.or_(
-                db.and_(Customer.status == '1. Termin vereinbart', Customer.appointment_date < db.func.date('now')),
-                db.and_(Customer.status == '2. Termin vereinbart', Customer.second_appointment_date < db.func.date('now'))
-            )
-        ).all()
-        
-        for customer in customers_to_update:
-            if customer.check_auto_status_update():
-                try:
-                    db.session.commit()
-                except Exception as e:
-                    db.session.rollback()
-        
         # Filter-Parameter aus URL lesen
         search_query = request.args.get('search', '').strip()
         customer_manager_filter = request.args.get('customer_manager', '')
@@ -601,8 +780,8 @@ def register_routes(app):
     def new_customer():
         form = CustomerForm()
         
-        # Akquisekanäle für das SelectField laden
-        acquisition_channels = AcquisitionChannel.query.filter_by(is_active=True).all()
+        # Akquisekanäle für das SelectField laden (aus dem Stammdaten-Cache)
+        acquisition_channels = get_acquisition_channels(active_only=True)
         form.acquisition_channel.choices = [(0, 'Nicht ausgewählt')] + [(c.id, c.name) for c in acquisition_channels]
         
         if form.validate_on_submit():
@@ -637,8 +816,8 @@ def register_routes(app):
         customer = Customer.query.get_or_404(id)
         form = CustomerForm(obj=customer)
         
-        # Akquisekanäle für das SelectField laden
-        acquisition_channels = AcquisitionChannel.query.filter_by(is_active=True).all()
+        # Akquisekanäle für das SelectField laden (aus dem Stammdaten-Cache)
+        acquisition_channels = get_acquisition_channels(active_only=True)
         form.acquisition_channel.choices = [(0, 'Nicht ausgewählt')] + [(c.id, c.name) for c in acquisition_channels]
         
         # Aktuellen Wert setzen
@@ -697,15 +876,20 @@ def register_routes(app):
     @login_required
     def quotes():
         from flask import request
-        from sqlalchemy.orm import joinedload
+        from sqlalchemy.orm import joinedload, load_only, selectinload
         
         # Filter-Parameter aus URL lesen
         search_query = request.args.get('search', '').strip()
         sort_by = request.args.get('sort', 'created_at')
         sort_dir = request.args.get('dir', 'desc')
         
-        # Basis-Query mit JOIN aufbauen
-        query = Quote.query.options(joinedload(Quote.customer))
+        # Basis-Query mit JOIN aufbauen - nur die Spalten der Liste laden
+        query = Quote.query.options(
+            load_only(*Quote.list_columns()),
+            joinedload(Quote.customer).load_only(*Customer.list_columns()),
+            selectinload(Quote.order).load_only(Order.id, Order.quote_id, Order.status),
+            selectinload(Quote.rejection)
+        )
         
         # Suchfilter anwenden
         if search_query:
@@ -796,15 +980,15 @@ def register_routes(app):
                     # Lade Defaults aus Settings
                     leistungsumfang=CompanySettings.get_setting(
                         'default_leistungsumfang',
-                        'Wir bedanken uns für Ihr Vertrauen und bieten Ihnen folgenden Leistungsumfang:\n*  Demontage der bestehenden Produkte inklusive/exklusive Entsorgung\n*  Montage der im Angebot angeführten Produkte\n*  Anschluss an bestehendes Gebäudeleitungssystem im unmittelbaren Umbaubereich ab Badezimmer oder in der Dusche\n*  Bei Komplettsanierung des Badezimmer werden die Abdichtungsarbeiten gemäß ÖNORM B3407 ausgeführt.\n*  Bei Teilsanierungen gilt eine Sonderkonstruktion bei der Ausführung der Verbundabdichtung als vereinbart. Auf Grund der Teilsanierung kann keine Gewährleistung für Bestandsabdichtungen übernommen werden. Die Anbindung der neu hergestellten Verbundabdichtungsbereiche an Bestandsabdichtungen kann bei der angebotenen Teilsanierung nicht  oder teilweise nicht ausgeführt werden. In kritischen Bereichen werden als technisch bestmögliche Lösung  MS-Polymerdichtstoffe anstelle von herkömmlichen Sanitärsilikonen als Sonderkonstruktion vereinbart und eingesetzt.'
+                        DEFAULT_QUOTE_TEXTS['leistungsumfang']
                     ),
                     objektinformationen=CompanySettings.get_setting(
                         'default_objektinformationen',
-                        '* Einfamilienhaus / Wohnung im __ Stock\n* Zuschnitt vor dem Gebäude möglich: ja / nein\n* Parken vor dem Gebäude möglich:  ja /  nein'
+                        DEFAULT_QUOTE_TEXTS['objektinformationen']
                     ),
                     installationsleistungen=CompanySettings.get_setting(
                         'default_nebenabsprachen',
-                        '* Demontage , Vorbereitung und Entsorgung erfolgt durch Innsan/Kunde selbst\n* Die Duschtasse wird bodengleich ohne Stufe gesetzt.\n* Die Duschtasse wird auf die bestehenden Fliesen aufgelegt. Stufe von ca. 3 cm\n* Die Paneele werden im gesamten Duschbereich/Badezimmer über die bestehenden Wandfliesen (raupenförmige Kleberaufbringung) verklebt, Höhe Raum hoch/ca. ____cm . Die Wandpaneele werden im Eck- und Plattenstoßbereich mittels Aluprofilen verbunden; das Standard-Plattenformat beträgt 130 x 280 cm/150 x 255cm.\n* Die verbleibende Wandfläche außerhalb des Paneelbereiches wird gespachtelt und gemalt\n* Der Vinylboden wird über den bestehenden Fliesenboden verklebt verlegt'
+                        DEFAULT_QUOTE_TEXTS['installationsleistungen']
                     )
                 )
                 db.session.add(quote)
@@ -833,9 +1017,46 @@ def register_routes(app):
             flash('Angenommene Angebote können nicht mehr bearbeitet werden!', 'warning')
             return redirect(url_for('view_quote', id=id))
         
-        suppliers = Supplier.query.order_by(Supplier.name).all()
+        suppliers = get_suppliers()
         work_steps = get_work_steps()
-        return render_template('quote_edit.html', quote=quote, suppliers=suppliers, work_steps=work_steps)
+        item_rows = [html for _, html in render_item_rows(quote)]
+        return render_template('quote_edit.html', quote=quote, suppliers=suppliers, work_steps=work_steps,
+                               item_rows=item_rows, totals=quote_totals(quote))
+    
+    def _totals_fragment(quote, totals):
+        """Summenblock als HTML und als Zahlen (für die Preisaufschlüsselung im Editor)"""
+        return {'totals_html': render_totals(quote, totals), 'totals': totals}
+    
+    @app.route('/quote/<int:id>/fragments/items')
+    @login_required
+    def quote_item_fragments(id):
+        """Nur die angegebenen Positionszeilen (?ids=1,2,3) samt Summenblock - für Updates ohne Seiten-Reload"""
+        quote = Quote.query.get_or_404(id)
+        try:
+            item_ids = [int(part) for part in request.args.get('ids', '').split(',') if part.strip()]
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Ungültige Positions-IDs'}), 400
+        
+        rows = render_item_rows(quote, item_ids)
+        found = {item.id for item, _ in rows}
+        return jsonify({
+            'success': True,
+            'items': [{'id': item.id, 'position_number': item.position_number, 'html': html} for item, html in rows],
+            'missing': [item_id for item_id in item_ids if item_id not in found],  # gelöschte Positionen
+            **_totals_fragment(quote, quote_totals(quote))
+        })
+    
+    @app.route('/quote/<int:id>/fragments/totals')
+    @login_required
+    def quote_totals_fragment(id):
+        """Summenblock - optional als Vorschau mit noch nicht gespeichertem Aufschlag/Rabatt"""
+        quote = Quote.query.get_or_404(id)
+        totals = quote_totals(
+            quote,
+            markup_percentage=request.args.get('markup_percentage', type=float),
+            discount_percentage=request.args.get('discount_percentage', type=float),
+        )
+        return jsonify({'success': True, **_totals_fragment(quote, totals)})
     
     @app.route('/quote/<int:id>/add_detailed_item', methods=['POST'])
     @login_required
@@ -1003,11 +1224,108 @@ def register_routes(app):
             flash('Angenommene Angebote können nicht mehr bearbeitet werden!', 'warning')
             return redirect(url_for('view_quote', id=id))
         
-        # Alle verfügbaren Positionsvorlagen laden - sortiert nach Reihenfolge
-        templates = PositionTemplate.query.order_by(PositionTemplate.sort_order, PositionTemplate.id).all()
+        # Vorlagen werden seitenweise über /api/templates/catalog nachgeladen,
+        # Unterpositionen erst beim Öffnen einer Vorlage über /api/templates/<id>
         # Lieferanten für Dropdown laden - alphabetisch sortiert
-        suppliers = Supplier.query.order_by(Supplier.name).all()
-        return render_template('quote_template_selector.html', quote=quote, templates=templates, suppliers=suppliers)
+        suppliers = get_suppliers()
+        return render_template('quote_template_selector.html', quote=quote, suppliers=suppliers)
+
+    def _cached_json_response(etag, build_payload):
+        """JSON-Antwort mit ETag; bei passendem If-None-Match nur 304 ohne Inhalt"""
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+        else:
+            response = jsonify(build_payload())
+        response.set_etag(etag)
+        # Browser darf speichern, muss aber vor jeder Verwendung per ETag nachfragen
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+
+    @app.route('/api/templates/catalog')
+    @login_required
+    def api_template_catalog():
+        """Seitenweiser Vorlagen-Katalog (nur Übersichtsdaten, ohne Unterpositionen)"""
+        search = request.args.get('q', '').strip().lower()
+        category = request.args.get('category', '')  # has_calc / no_calc (Vorlagen haben keine Kategorie-Spalte)
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 25, type=int), 1), 100)
+
+        def build_payload():
+            templates = get_position_template_catalog()
+            if search:
+                templates = [t for t in templates if search in t['name'].lower()]
+            if category == 'has_calc':
+                templates = [t for t in templates if t['calc_fields']]
+            elif category == 'no_calc':
+                templates = [t for t in templates if not t['calc_fields']]
+            start = (page - 1) * per_page
+            return {
+                'templates': templates[start:start + per_page],
+                'page': page,
+                'per_page': per_page,
+                'total': len(templates),
+                'has_next': start + per_page < len(templates),
+            }
+
+        etag = master_data_etag('position_template', 'catalog', search, category, page, per_page)
+        return _cached_json_response(etag, build_payload)
+
+    @app.route('/api/templates/<int:template_id>')
+    @login_required
+    def api_template_detail(template_id):
+        """Eine Positionsvorlage mit allen Unterpositionen - wird beim Öffnen im Vorlagen-Selector geladen"""
+        template = get_position_template(template_id)
+        if template is None:
+            return jsonify({'error': 'Vorlage nicht gefunden'}), 404
+
+        def build_payload():
+            return {
+                'id': template.id,
+                'name': template.name,
+                'description': template.description or '',
+                'created_at': template.created_at.strftime('%d.%m.%y') if template.created_at else None,
+                'enable_length': bool(template.enable_length),
+                'enable_width': bool(template.enable_width),
+                'enable_height': bool(template.enable_height),
+                'enable_area': bool(template.enable_area),
+                'enable_volume': bool(template.enable_volume),
+                'subitems': [{
+                    'description': subitem.description,
+                    'item_type': subitem.item_type,
+                    'unit': subitem.unit,
+                    'price_per_unit': subitem.price_per_unit or 0,
+                    'formula': subitem.formula or '',
+                    'requires_order': bool(subitem.requires_order),
+                    'supplier': subitem.supplier or '',
+                    'part_number': subitem.part_number or '',
+                    'part_quantity': subitem.part_quantity or '1',
+                    'hours': subitem.hours or 0,
+                    'hourly_rate': subitem.hourly_rate or 95,
+                    'quantity': subitem.quantity or '1',
+                } for subitem in template.subitems],
+            }
+
+        etag = master_data_etag('position_template', 'detail', template_id)
+        return _cached_json_response(etag, build_payload)
+
+    @app.route('/api/templates/<int:template_id>/price', methods=['POST'])
+    @login_required
+    def api_template_price(template_id):
+        """Serverseitige Preisberechnung einer Vorlage für einen oder mehrere Parametersätze
+        Erwartet {'parameter_sets': [{'length', 'width', 'height', 'subitems': [...]}, ...]}"""
+        template = get_position_template(template_id)
+        if template is None:
+            return jsonify({'error': 'Vorlage nicht gefunden'}), 404
+        
+        data = request.get_json(silent=True) or {}
+        parameter_sets = data.get('parameter_sets')
+        if not isinstance(parameter_sets, list) or not parameter_sets:
+            return jsonify({'error': 'parameter_sets fehlt'}), 400
+        try:
+            return jsonify({'results': price_template_batch(template, parameter_sets)})
+        except (ValueError, AttributeError) as e:
+            return jsonify({'error': str(e)}), 400
 
     @app.route('/quotes/<int:id>/add_template', methods=['POST'])
     @login_required
@@ -1020,111 +1338,170 @@ def register_routes(app):
         
         try:
             data = request.get_json()
-            template_id = data.get('template_id')
-            calculation_parameters = data.get('calculation_parameters', {})
-            subitems_data = data.get('subitems', [])
-            
-            # Template laden für Informationen
-            template = PositionTemplate.query.get_or_404(template_id)
-            
-            # Neue Position erstellen basierend auf der bearbeiteten Vorlage
-            position_number = len(quote.quote_items) + 1
-            
-            # Berechnungsparameter extrahieren
-            length = float(calculation_parameters.get('length', 0))
-            width = float(calculation_parameters.get('width', 0))
-            height = float(calculation_parameters.get('height', 0))
-            area = float(calculation_parameters.get('area', 0))
-            volume = float(calculation_parameters.get('volume', 0))
-            calculated_price = float(calculation_parameters.get('calculatedPrice', 0))
-            
-            # Dynamische Beschreibung basierend auf aktivierten Feldern
-            dimension_parts = []
-            if template.enable_length and length > 0:
-                dimension_parts.append(f"L:{length}cm")
-            if template.enable_width and width > 0:
-                dimension_parts.append(f"B:{width}cm")
-            if template.enable_height and height > 0:
-                dimension_parts.append(f"H:{height}cm")
-            if template.enable_area and area > 0:
-                dimension_parts.append(f"Fläche:{area:.2f}m²")
-            if template.enable_volume and volume > 0:
-                dimension_parts.append(f"Vol.:{volume:.2f}m³")
-            
-            # Beschreibung erstellen - nur Template-Name ohne Variablen
-            description = template.name
+            result = apply_templates_to_quote(quote, [data])[0]
+            db.session.commit()
             
-            # Hauptposition erstellen
-            quote_item = QuoteItem(
-                quote_id=quote.id,
-                position_number=position_number,
-                description=description,
-                quantity=1,
-                unit_price=calculated_price,
-                total_price=calculated_price
-            )
+            return jsonify({
+                'success': True,
+                'message': f'Vorlage "{result["name"]}" wurde erfolgreich mit {result["subitems_count"]} Unterpositionen hinzugefügt!',
+                'position_number': result['position_number'],
+                'total_price': result['total_price'],
+                'subitems_count': result['subitems_count']
+            })
             
-            db.session.add(quote_item)
-            db.session.flush()  # Um die ID zu erhalten
-            
-            # Unterpositionen aus den bearbeiteten Daten erstellen
-            sub_position = 1
-            for subitem_data in subitems_data:
-                # Basis-Daten
-                description = subitem_data.get('description', '')
-                item_type = subitem_data.get('item_type', 'sonstiges')  # quote_edit verwendet kleinschreibung
-                calculated_subitem_price = float(subitem_data.get('calculated_price', 0))
-                base_price = float(subitem_data.get('base_price', 0))  # Grundpreis = Preis pro Stück
-                
-                # Erstelle QuoteSubItem mit berechneten Werten
-                quote_subitem = QuoteSubItem(
-                    quote_item_id=quote_item.id,
-                    sub_number=f"{position_number}.{sub_position}",
-                    description=description,
-                    item_type=item_type,  # Direkt verwenden, da Template-Selector angepasst wird
-                    price=calculated_subitem_price
-                )
-                
-                # Typ-spezifische Felder setzen
-                if item_type == 'bestellteil':
-                    quote_subitem.supplier = subitem_data.get('supplier', '')
-                    quote_subitem.part_number = subitem_data.get('supplier_part_number', '')
-                    quote_subitem.part_quantity = subitem_data.get('part_quantity', '1')
-                    quote_subitem.requires_order = subitem_data.get('requires_order', False)
-                    # part_price = Stückpreis (nicht der berechnete Gesamtpreis!)
-                    quote_subitem.part_price = base_price
-                    
-                elif item_type == 'arbeitsvorgang':
-                    quote_subitem.hours = float(subitem_data.get('hours', 0))
-                    quote_subitem.hourly_rate = float(subitem_data.get('hourly_rate', 95))
-                    
-                else:  # sonstiges
-                    quote_subitem.quantity = subitem_data.get('quantity', '1')
-                    quote_subitem.unit_price = base_price  # Stückpreis, nicht berechneter Gesamtpreis
-                
-                # Setze den berechneten Gesamtpreis
-                quote_subitem.price = calculated_subitem_price
-                
-                db.session.add(quote_subitem)
-                sub_position += 1
+        except Exception as e:
+            safe_rollback()
+            return jsonify({'success': False, 'message': f'Fehler beim Hinzufügen der Vorlage: {str(e)}'})
+    
+    @app.route('/quotes/<int:id>/add_templates', methods=['POST'])
+    @login_required
+    def add_templates_to_quote(id):
+        """Mehrere Vorlagen in einem Request und einer Transaktion hinzufügen
+        Erwartet {'templates': [{'template_id', 'calculation_parameters', 'subitems'}, ...]}"""
+        quote = Quote.query.get_or_404(id)
+        
+        # Prüfe ob Angebot angenommen wurde - dann eingefroren
+        if quote.status == 'Angenommen':
+            return jsonify({'success': False, 'message': 'Angenommene Angebote können nicht mehr bearbeitet werden!'})
+        
+        try:
+            data = request.get_json() or {}
+            results = apply_templates_to_quote(quote, data.get('templates') or [])
+            db.session.commit()
             
-            # Aktualisiere den Gesamtpreis der Hauptposition basierend auf den Unterpositionen
-            quote_item.update_price()
+            return jsonify({
+                'success': True,
+                'message': f'{len(results)} Vorlagen wurden erfolgreich hinzugefügt!',
+                'positions': results,
+                'total_amount': quote.total_amount
+            })
             
+        except Exception as e:
+            safe_rollback()
+            return jsonify({'success': False, 'message': f'Fehler beim Hinzufügen der Vorlagen: {str(e)}'})
+    
+    @app.route('/quotes/<int:id>/reorder', methods=['POST'])
+    @login_required
+    def reorder_quote_items(id):
+        """Neue Reihenfolge aller Positionen und Unterpositionen (Drag & Drop) in einem Request übernehmen
+        Erwartet {'items': [{'id': Positions-ID, 'sub_items': [Unterpositions-IDs]}, ...]}"""
+        quote = Quote.query.get_or_404(id)
+        
+        # Prüfe ob Angebot angenommen wurde - dann eingefroren
+        if quote.status == 'Angenommen':
+            return jsonify({'success': False, 'error': 'Angenommene Angebote können nicht mehr bearbeitet werden'}), 403
+        
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'success': False, 'error': 'Erwartet ein JSON-Objekt {"items": [...]}'}), 400
+        
+        try:
+            counts = reorder_quote(quote, data.get('items') or [])
             db.session.commit()
-            quote.update_total()
+            return jsonify({'success': True, 'message': 'Reihenfolge aktualisiert', **counts})
             
+        except ValueError as e:
+            safe_rollback()
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            safe_rollback()
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
+    @app.route('/quotes/<int:id>/batch', methods=['POST'])
+    @login_required
+    def batch_edit_quote(id):
+        """Mehrere Änderungen am Angebot (Autosave des Editors) in einer Transaktion übernehmen
+        Erwartet {'operations': [{'op': 'update_item', 'item_id': ..., 'fields': {...}}, ...]}"""
+        quote = Quote.query.get_or_404(id)
+        
+        # Prüfe ob Angebot angenommen wurde - dann eingefroren
+        if quote.status == 'Angenommen':
+            return jsonify({'success': False, 'error': 'Angenommene Angebote können nicht mehr bearbeitet werden'}), 403
+        
+        try:
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict):
+                return jsonify({'success': False, 'error': 'Erwartet ein JSON-Objekt {"operations": [...]}'}), 400
+            results = apply_quote_operations(quote, data.get('operations') or [])
+            db.session.commit()
             return jsonify({
                 'success': True,
-                'message': f'Vorlage "{template.name}" wurde erfolgreich mit {len(subitems_data)} Unterpositionen hinzugefügt!',
-                'position_number': position_number,
-                'total_price': calculated_price,
-                'subitems_count': len(subitems_data)
+                'message': 'Änderungen gespeichert',
+                'results': results,
+                'total_amount': quote.total_amount
             })
             
+        except ValueError as e:
+            safe_rollback()
+            return jsonify({'success': False, 'error': str(e)}), 400
         except Exception as e:
             safe_rollback()
-            return jsonify({'success': False, 'message': f'Fehler beim Hinzufügen der Vorlage: {str(e)}'})
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
+    def _parse_scenario_values(text, maximum=None):
+        """
+        Szenario-Werte aus einem Eingabefeld, getrennt durch Semikolon oder Leerzeichen (leer = aktueller Wert).
+        Nur endliche Werte >= 0 (bzw. bis maximum, z.B. 100 für Prozentwerte) - NaN würde sonst als
+        "aktueller Wert" bzw. als Preis übernommen.
+        """
+        values = [float(part.replace(',', '.')) for part in re.split(r'[;\s]+', text or '') if part]
+        for value in values:
+            if not math.isfinite(value) or value < 0 or (maximum is not None and value > maximum):
+                limit = f'0 bis {maximum:g}' if maximum is not None else 'mindestens 0'
+                raise ValueError(f'{value:g} liegt außerhalb des erlaubten Bereichs ({limit})')
+        return values or [None]
+    
+    def _repricing_model(args):
+        """Preismodell der offenen Angebote mit der Auswahl aus dem Formular"""
+        from quote_repricing import QuoteRepricing
+        return QuoteRepricing(
+            supplier=args.get('supplier') or None,
+            current_hourly_rate=get_default_hourly_rate() if args.get('only_default_rate') else None,
+        )
+    
+    @app.route('/quotes/repricing')
+    @login_required
+    def quote_repricing():
+        """Was-wäre-wenn: Auswirkung von Stundensatz, Aufschlag, Rabatt und Lieferantenpreisen auf offene Angebote"""
+        scenarios = None
+        quote_totals = None
+        if request.args.get('evaluate'):
+            try:
+                model = _repricing_model(request.args)
+                scenarios = model.evaluate(
+                    hourly_rates=_parse_scenario_values(request.args.get('hourly_rates')),
+                    markups=_parse_scenario_values(request.args.get('markups'), maximum=100),
+                    discounts=_parse_scenario_values(request.args.get('discounts'), maximum=100),
+                    supplier_factors=_parse_scenario_values(request.args.get('supplier_factors')),
+                ).sort_values('difference')
+                if len(scenarios) == 1:
+                    # Bei genau einem Szenario die Auswirkung pro Angebot zeigen
+                    scenario = scenarios.iloc[0]
+                    quote_totals = model.quote_totals(scenario['hourly_rate'], scenario['markup'],
+                                                      scenario['discount'], scenario['supplier_factor'])
+                    quote_totals = quote_totals[quote_totals['difference'] != 0].reset_index()
+            except ValueError as e:
+                flash(f'Ungültige Eingabe: {str(e)}', 'error')
+        return render_template('quote_repricing.html',
+                             scenarios=scenarios.to_dict('records') if scenarios is not None else None,
+                             quote_totals=quote_totals.to_dict('records') if quote_totals is not None else None,
+                             suppliers=get_suppliers(),
+                             default_hourly_rate=get_default_hourly_rate())
+    
+    @app.route('/quotes/repricing/apply', methods=['POST'])
+    @login_required
+    def apply_quote_repricing():
+        """Gewähltes Szenario auf alle offenen Angebote übernehmen"""
+        try:
+            values = {key: _parse_scenario_values(request.form.get(key), maximum=maximum)[0]
+                      for key, maximum in (('hourly_rate', None), ('markup', 100),
+                                           ('discount', 100), ('supplier_factor', None))}
+            count = _repricing_model(request.form).apply(**values)
+            flash(f'Szenario übernommen: {count} offene Angebote neu berechnet.', 'success')
+        except Exception as e:
+            safe_rollback()
+            flash(f'Fehler beim Übernehmen des Szenarios: {str(e)}', 'error')
+        return redirect(url_for('quote_repricing'))
     
     @app.route('/quote/<int:id>/delete')
     @login_required
@@ -1185,8 +1562,9 @@ def register_routes(app):
         
         if form.validate_on_submit():
             try:
-                # Status auf Angenommen setzen
+                # Status auf Angenommen setzen und eingefrorenen Stand als Snapshot festhalten
                 quote.status = 'Angenommen'
+                write_quote_snapshot(quote)
                 
                 # Auftrag erstellen
                 order_number = generate_order_number()
@@ -1203,59 +1581,8 @@ def register_routes(app):
                 db.session.add(order)
                 db.session.flush()  # Um ID zu bekommen
                 
-                # Sammle alle Bestellteile pro Lieferant
-                from utils import collect_supplier_orders, generate_supplier_order_email, get_supplier_email
-                from models import SupplierOrder, SupplierOrderItem
-                supplier_orders = collect_supplier_orders(quote)
-                
-                email_info = []
-                
-                # Generiere E-Mail-Templates für jeden Lieferanten
-                for supplier_name, order_items in supplier_orders.items():
-                    if order_items:  # Nur wenn Bestellteile vorhanden
-                        supplier_email = get_supplier_email(supplier_name)
-                        subject, html_body, plain_body = generate_supplier_order_email(quote, supplier_name, order_items, order_number)
-                        
-                        email_info.append({
-                            'supplier': supplier_name,
-                            'email': supplier_email,
-                            'subject': subject,
-                            'body': html_body,
-                            'plain_body': plain_body,
-                            'items_count': len(order_items)
-                        })
-                
-
-                # Erstelle SupplierOrder-Einträge mit Status 'Noch nicht bestellt', falls noch nicht vorhanden
-                from models import SupplierOrder, SupplierOrderItem
-                for supplier_name, order_items in supplier_orders.items():
-                    if order_items:
-                        existing_order = SupplierOrder.query.filter_by(
-                            quote_id=quote.id,
-                            supplier_name=supplier_name
-                        ).first()
-                        if not existing_order:
-                            supplier_order = SupplierOrder(
-                                quote_id=quote.id,
-                                order_id=order.id,
-                                supplier_name=supplier_name,
-                                status='Noch nicht bestellt'
-                            )
-                            db.session.add(supplier_order)
-                            db.session.flush()
-                            for item in order_items:
-                                order_item = SupplierOrderItem(
-                                    supplier_order_id=supplier_order.id,
-                                    sub_number=item['sub_number'],
-                                    description=item['description'],
-                                    part_number=item['part_number'],
-                                    quantity=item['quantity'],
-                                    quote_sub_item_id=item.get('quote_sub_item_id')
-                                )
-                                db.session.add(order_item)
-                        else:
-                            # Falls schon vorhanden, nur Auftrag zuordnen
-                            existing_order.order_id = order.id
+                # Bestellungen 'Noch nicht bestellt' je Lieferant anlegen (bestehende dem neuen Auftrag zuordnen)
+                create_supplier_orders([quote.id], {quote.id: order.id}, reassign_order=True)
 
                 # Erstelle Rechnungs-Reminder für den neuen Auftrag
                 reminders = InvoiceReminder.create_reminders_for_order(order)
@@ -1265,7 +1592,7 @@ def register_routes(app):
                 # Aktualisiere Kundenstatus auf "Auftrag erteilt"
                 old_status = quote.customer.status
                 quote.customer.status = 'Auftrag erteilt'
-                print(f"DEBUG: Kundenstatus geändert von '{old_status}' zu '{quote.customer.status}'")
+                logger.debug("Kundenstatus geändert von '%s' zu '%s'", old_status, quote.customer.status)
 
                 db.session.commit()
 
@@ -1399,19 +1726,16 @@ def register_routes(app):
     @app.route('/stammdaten')
     @login_required
     def stammdaten():
-        suppliers = Supplier.query.order_by(Supplier.name).all()
+        # Lieferanten, Kategorien, Akquisekanäle und Vorlagen aus dem Stammdaten-Cache
+        suppliers = get_suppliers()
         current_hourly_rate = get_default_hourly_rate()
-        categories = db.session.query(Supplier.category).filter(
-            Supplier.category.isnot(None)
-        ).filter(Supplier.category != '').distinct().all()
-        categories = [cat[0] for cat in categories if cat[0]]
+        categories = get_supplier_categories()
 
         # Akquisekanäle laden
-        acquisition_channels = AcquisitionChannel.query.all()
+        acquisition_channels = get_acquisition_channels()
 
         # PositionTemplates laden - sortiert nach Reihenfolge
-        from models import PositionTemplate
-        templates = PositionTemplate.query.order_by(PositionTemplate.sort_order, PositionTemplate.id).all()
+        templates = get_position_templates()
 
         return render_template('stammdaten.html', 
                              suppliers=suppliers, 
@@ -1575,9 +1899,6 @@ def register_routes(app):
     @login_required
     def update_work_steps():
         try:
-            from work_steps import WORK_STEPS
-            import os
-            
             # Sammle alle Formulardaten
             form_data = request.form
             new_work_steps = {}
@@ -1605,37 +1926,14 @@ def register_routes(app):
                             
                             new_work_steps[category].append(step)
             
-            # Aktualisiere die work_steps.py Datei
-            work_steps_content = f'''# Arbeitsschritte-Konfiguration für Angebotserstellung
-# Diese Datei definiert alle verfügbaren Arbeitsschritte mit Standardzeiten
-
-WORK_STEPS = {repr(new_work_steps)}
-
-def get_work_steps():
-    """Gibt alle verfügbaren Arbeitsschritte zurück"""
-    return WORK_STEPS
-
-def get_work_step_by_category_and_name(category, name):
-    """Gibt einen spezifischen Arbeitsschritt zurück"""
-    if category in WORK_STEPS:
-        for step in WORK_STEPS[category]:
-            if step["name"] == name:
-                return step
-    return None
-'''
-            
-            # Schreibe die neue Datei
-            with open('work_steps.py', 'w', encoding='utf-8') as f:
-                f.write(work_steps_content)
-            
-            # Lade das Modul neu
-            import importlib
-            import work_steps
-            importlib.reload(work_steps)
+            # Katalog in der Datenbank ersetzen - der Versionszähler macht den Cache aller Worker ungültig
+            replace_work_steps(new_work_steps)
+            db.session.commit()
             
             flash('Arbeitsschritte wurden erfolgreich gespeichert!', 'success')
             
         except Exception as e:
+            safe_rollback()
             flash(f'Fehler beim Speichern: {str(e)}', 'error')
         
         return redirect(url_for('work_steps_management'))
@@ -1661,15 +1959,15 @@ def get_work_step_by_category_and_name(category, name):
             # Quote-Defaults laden
             form.default_leistungsumfang.data = CompanySettings.get_setting(
                 'default_leistungsumfang',
-                'Wir bedanken uns für Ihr Vertrauen und bieten Ihnen folgenden Leistungsumfang:\n*  Demontage der bestehenden Produkte inklusive/exklusive Entsorgung\n*  Montage der im Angebot angeführten Produkte\n*  Anschluss an bestehendes Gebäudeleitungssystem im unmittelbaren Umbaubereich ab Badezimmer oder in der Dusche\n*  Bei Komplettsanierung des Badezimmer werden die Abdichtungsarbeiten gemäß ÖNORM B3407 ausgeführt.\n*  Bei Teilsanierungen gilt eine Sonderkonstruktion bei der Ausführung der Verbundabdichtung als vereinbart. Auf Grund der Teilsanierung kann keine Gewährleistung für Bestandsabdichtungen übernommen werden. Die Anbindung der neu hergestellten Verbundabdichtungsbereiche an Bestandsabdichtungen kann bei der angebotenen Teilsanierung nicht  oder teilweise nicht ausgeführt werden. In kritischen Bereichen werden als technisch bestmögliche Lösung  MS-Polymerdichtstoffe anstelle von herkömmlichen Sanitärsilikonen als Sonderkonstruktion vereinbart und eingesetzt.'
+                DEFAULT_QUOTE_TEXTS['leistungsumfang']
             )
             form.default_objektinformationen.data = CompanySettings.get_setting(
                 'default_objektinformationen',
-                '* Einfamilienhaus / Wohnung im __ Stock\n* Zuschnitt vor dem Gebäude möglich: ja / nein\n* Parken vor dem Gebäude möglich:  ja /  nein'
+                DEFAULT_QUOTE_TEXTS['objektinformationen']
             )
             form.default_nebenabsprachen.data = CompanySettings.get_setting(
                 'default_nebenabsprachen',
-                '* Demontage , Vorbereitung und Entsorgung erfolgt durch Innsan/Kunde selbst\n* Die Duschtasse wird bodengleich ohne Stufe gesetzt.\n* Die Duschtasse wird auf die bestehenden Fliesen aufgelegt. Stufe von ca. 3 cm\n* Die Paneele werden im gesamten Duschbereich/Badezimmer über die bestehenden Wandfliesen (raupenförmige Kleberaufbringung) verklebt, Höhe Raum hoch/ca. ____cm . Die Wandpaneele werden im Eck- und Plattenstoßbereich mittels Aluprofilen verbunden; das Standard-Plattenformat beträgt 130 x 280 cm/150 x 255cm.\n* Die verbleibende Wandfläche außerhalb des Paneelbereiches wird gespachtelt und gemalt\n* Der Vinylboden wird über den bestehenden Fliesenboden verklebt verlegt'
+                DEFAULT_QUOTE_TEXTS['installationsleistungen']
             )
         
         if form.validate_on_submit():
@@ -1863,6 +2161,7 @@ def get_work_step_by_category_and_name(category, name):
     # Angebot anzeigen
     @app.route('/quote/<int:id>')
     @login_required
+    @conditional_get('quote', 'order', 'customer', 'company_settings', html=True)
     def view_quote(id):
         quote = Quote.query.get_or_404(id)
         return render_template('quote_view.html', quote=quote)
@@ -1945,9 +2244,8 @@ def get_work_step_by_category_and_name(category, name):
             # Update position number
             item.position_number = new_position_number
             
-            # Update sub_numbers für alle Unterpositionen
-            for index, sub_item in enumerate(item.sub_items, start=1):
-                sub_item.sub_number = f"{new_position_number}.{index}"
+            # Unterpositionen in bisheriger Reihenfolge lückenlos neu nummerieren - ein UPDATE
+            renumber_sub_items(item.id, new_position_number)
             
             db.session.commit()
             
@@ -2086,7 +2384,7 @@ def get_work_step_by_category_and_name(category, name):
             return redirect(url_for('edit_quote', id=id) + f'#position-{item_id}')
 
         # GET Request - Bearbeitungsformular anzeigen
-        suppliers = Supplier.query.order_by(Supplier.name).all()
+        suppliers = get_suppliers()
         work_steps = get_work_steps()
         return render_template(
             'quote_item_edit.html',
@@ -2104,50 +2402,10 @@ def get_work_step_by_category_and_name(category, name):
         quote = Quote.query.get_or_404(quote_id)
         
         try:
-            # Sammle alle Bestellteile pro Lieferant
-            from utils import collect_supplier_orders
-            from models import SupplierOrder, SupplierOrderItem
-            supplier_orders = collect_supplier_orders(quote)
-            
-            # Automatische Zuordnung zum Auftrag falls vorhanden
-            order_id = None
-            if quote.order:
-                order_id = quote.order.id
-            
-            # Erstelle SupplierOrder-Einträge
-            for supplier_name, order_items in supplier_orders.items():
-                if order_items:
-                    # Prüfe ob bereits eine Bestellung für diesen Lieferant und Quote existiert
-                    existing_order = SupplierOrder.query.filter_by(
-                        quote_id=quote.id, 
-                        supplier_name=supplier_name
-                    ).first()
-                    
-                    if not existing_order:
-                        supplier_order = SupplierOrder(
-                            quote_id=quote.id,
-                            order_id=order_id,  # Automatische Zuordnung zum Auftrag
-                            supplier_name=supplier_name,
-                            status='Noch nicht bestellt'  # Status bleibt unverändert bis E-Mail versendet wird
-                        )
-                        db.session.add(supplier_order)
-                        db.session.flush()  # Um ID zu bekommen
-                        
-                        # Erstelle die Bestellpositionen für neue Bestellung
-                        for item in order_items:
-                            order_item = SupplierOrderItem(
-                                supplier_order_id=supplier_order.id,
-                                sub_number=item['sub_number'],
-                                description=item['description'],
-                                part_number=item['part_number'],
-                                quantity=item['quantity'],
-                                quote_sub_item_id=item.get('quote_sub_item_id')
-                            )
-                            db.session.add(order_item)
-                    else:
-                        # Aktualisiere bestehende Bestellung mit order_id falls noch nicht gesetzt
-                        if order_id and not existing_order.order_id:
-                            existing_order.order_id = order_id
+            # Bestellteile aller Lieferanten mit einer Abfrage, neue Bestellungen per Bulk-INSERT
+            # (automatische Zuordnung zum Auftrag falls vorhanden)
+            order_ids = {quote.id: quote.order.id} if quote.order else {}
+            create_supplier_orders([quote.id], order_ids)
             
             db.session.commit()
             flash('Alle Bestellungen wurden erfolgreich erfasst!', 'success')
@@ -2238,6 +2496,80 @@ def get_work_step_by_category_and_name(category, name):
                              sort_by=sort_by,
                              sort_dir=sort_dir)
     
+    # Sammelbestellungen: offene Bestellungen je Lieferant über alle Projekte
+    @app.route('/supplier_orders/purchase_runs')
+    @login_required
+    def supplier_purchase_runs():
+        from utils import get_supplier_email
+        
+        runs = []
+        for supplier_name, supplier_orders in open_purchase_runs().items():
+            subject, html_body, plain_body = generate_purchase_run_email(supplier_name, supplier_orders)
+            runs.append({
+                'supplier': supplier_name,
+                'email': get_supplier_email(supplier_name),
+                'subject': subject,
+                'body': html_body,
+                'plain_body': plain_body,
+                'orders': supplier_orders,
+                'items_count': sum(len(supplier_order.items) for supplier_order in supplier_orders)
+            })
+        return render_template('supplier_purchase_runs.html', runs=runs)
+    
+    # Sammelbestellung als bestellt markieren (nur die angezeigten Bestellungen)
+    @app.route('/supplier_orders/purchase_runs/send', methods=['POST'])
+    @login_required
+    def send_supplier_purchase_run():
+        from utils import get_supplier_email
+        supplier_name = request.form.get('supplier_name', '')
+        supplier_order_ids = request.form.getlist('order_ids', type=int)
+        
+        # Mit SMTP-Server: eine E-Mail für die ganze Sammelbestellung einreihen
+        if mail_enabled() and get_supplier_email(supplier_name):
+            try:
+                purchase_run, supplier_orders = start_purchase_run(supplier_name, supplier_order_ids)
+                if supplier_orders:
+                    enqueue_supplier_order_email(supplier_name, supplier_orders)
+                db.session.commit()
+                if supplier_orders:
+                    wake_mail_sender()
+                    flash(f'Sammelbestellung {purchase_run} an {supplier_name} ({len(supplier_orders)} Bestellung(en)) wird per E-Mail verschickt.', 'success')
+                else:
+                    flash(f'Keine offenen Bestellungen für {supplier_name} gefunden.', 'warning')
+            except Exception as e:
+                safe_rollback()
+                flash(f'Fehler beim Einreihen der Sammelbestellung: {str(e)}', 'error')
+            return redirect(url_for('supplier_purchase_runs'))
+        
+        try:
+            purchase_run, count = mark_purchase_run_ordered(supplier_name, supplier_order_ids)
+            db.session.commit()
+            if count:
+                flash(f'Sammelbestellung {purchase_run} an {supplier_name}: {count} Bestellung(en) als "Bestellt" markiert!', 'success')
+            else:
+                flash(f'Keine offenen Bestellungen für {supplier_name} gefunden.', 'warning')
+        except Exception as e:
+            safe_rollback()
+            flash(f'Fehler beim Markieren der Sammelbestellung: {str(e)}', 'error')
+        
+        return redirect(url_for('supplier_purchase_runs'))
+    
+    # Bestellungen für alle angenommenen Angebote erfassen (ein Durchlauf statt Angebot für Angebot)
+    @app.route('/supplier_orders/collect', methods=['POST'])
+    @login_required
+    def collect_all_supplier_orders():
+        try:
+            quote_ids = [quote_id for quote_id, in db.session.query(Quote.id).filter(Quote.status == 'Angenommen')]
+            order_ids = dict(db.session.query(Order.quote_id, Order.id).filter(Order.quote_id.in_(quote_ids)).order_by(Order.id).all()) if quote_ids else {}
+            result = create_supplier_orders(quote_ids, order_ids)
+            db.session.commit()
+            flash(f'{result["created"]} neue Bestellung(en) erfasst, {result["linked"]} Bestellung(en) einem Auftrag zugeordnet.', 'success')
+        except Exception as e:
+            safe_rollback()
+            flash(f'Fehler beim Erfassen der Bestellungen: {str(e)}', 'error')
+        
+        return redirect(url_for('supplier_purchase_runs'))
+    
     # Einzelne Bestellung bearbeiten
     @app.route('/supplier_order/<int:order_id>/edit', methods=['GET', 'POST'])
     @login_required
@@ -2285,16 +2617,18 @@ def get_work_step_by_category_and_name(category, name):
     def orders():
         from models import Order
         from flask import request
-        from sqlalchemy.orm import joinedload
+        from sqlalchemy.orm import joinedload, load_only
         
         # Filter-Parameter aus URL lesen
         search_query = request.args.get('search', '').strip()
         sort_by = request.args.get('sort', 'created_at')
         sort_dir = request.args.get('dir', 'desc')
         
-        # Basis-Query mit JOINs aufbauen
+        # Basis-Query mit JOINs aufbauen - nur die Spalten der Liste laden
         query = Order.query.options(
-            joinedload(Order.quote).joinedload(Quote.customer)
+            load_only(*Order.list_columns()),
+            joinedload(Order.quote).load_only(*Quote.list_columns())
+                .joinedload(Quote.customer).load_only(*Customer.list_columns())
         )
         
         # Suchfilter anwenden
@@ -2396,7 +2730,7 @@ def get_work_step_by_category_and_name(category, name):
                 # Aktualisiere Kundenstatus auf "Auftrag erteilt"
                 old_status = quote.customer.status
                 quote.customer.status = 'Auftrag erteilt'
-                print(f"Kundenstatus geändert von '{old_status}' zu '{quote.customer.status}'")
+                logger.debug("Kundenstatus geändert von '%s' zu '%s'", old_status, quote.customer.status)
                 
                 db.session.commit()
                 
@@ -2414,7 +2748,7 @@ def get_work_step_by_category_and_name(category, name):
     def view_order(order_id):
         from models import Order
         order = Order.query.get_or_404(order_id)
-        return render_template('order_view.html', order=order)
+        return render_template('order_view.html', order=order, quote_items=quote_positions(order.quote))
     
     @app.route('/order/<int:order_id>/edit', methods=['GET', 'POST'])
     @login_required
@@ -2723,12 +3057,8 @@ def get_work_step_by_category_and_name(category, name):
             # Connection wird automatisch durch Context Manager geschlossen
             
         except Exception as e:
-            # Detailliertere Fehlerbehandlung
-            import traceback
-            error_details = traceback.format_exc()
+            logger.exception("Fehler bei der Datenbank-Reparatur")
             flash(f'Fehler bei der Reparatur: {str(e)}', 'error')
-            # Log für Debugging (nur in Development)
-            print(f"Database repair error: {error_details}")
         
         return redirect(url_for('index'))
 
@@ -2793,17 +3123,13 @@ def get_work_step_by_category_and_name(category, name):
             if order.quote.customer and order.quote.customer.city:
                 installation_location = order.quote.customer.city
             
-            # Lade Installationsleistungen aus dem Angebot
-            installation_services = ""
-            if order.quote and order.quote.installationsleistungen:
-                installation_services = order.quote.installationsleistungen
-            else:
-                installation_services = ""
+            # Installationsleistungen aus dem Angebot übernehmen (Verweis auf denselben Textbaustein)
+            installation_block_id = order.quote.installationsleistungen_block_id if order.quote else None
             
             # Neue Arbeitsanweisung erstellen
             work_instruction = WorkInstruction(
                 order_id=order.id,
-                created_by=installation_services,  # Installationsleistungen aus Angebot
+                created_by_block_id=installation_block_id,  # Installationsleistungen aus Angebot
                 status='Erstellt',
                 priority='Normal',
                 # Automatische Vorschläge basierend auf dem Auftrag
@@ -2838,16 +3164,9 @@ def get_work_step_by_category_and_name(category, name):
             return redirect(url_for('view_order', order_id=order.id))
         
         # Lade Arbeitsschritte - gespeicherte Daten haben Vorrang vor Quote-Daten
-        work_steps = []
-        if order.work_instruction.work_steps_data:
-            # Verwende gespeicherte Arbeitsschritte
-            try:
-                work_steps = json.loads(order.work_instruction.work_steps_data)
-                # Umstrukturierung für die View (anders als Edit)
-                for step in work_steps:
-                    step['is_completed'] = False  # Default für View
-            except:
-                work_steps = []
+        # Kopien der gespeicherten Einträge, damit die View-Felder nicht in der JSON-Spalte landen
+        work_steps = [dict(step, is_completed=False)  # Default für View
+                      for step in order.work_instruction.work_steps_data or []]
         
         # Falls keine gespeicherten Arbeitsschritte vorhanden, lade aus Quote
         if not work_steps and order.quote:
@@ -2865,16 +3184,8 @@ def get_work_step_by_category_and_name(category, name):
                         step_number += 1
         
         # Lade Teile - gespeicherte Daten haben Vorrang vor Quote-Daten
-        work_parts = []
-        if order.work_instruction.work_parts_data:
-            # Verwende gespeicherte Teile
-            try:
-                work_parts = json.loads(order.work_instruction.work_parts_data)
-                # Zusätzliche Felder für die View
-                for part in work_parts:
-                    part['is_available'] = True  # Default für View
-            except:
-                work_parts = []
+        work_parts = [dict(part, is_available=True)  # Default für View
+                      for part in order.work_instruction.work_parts_data or []]
         
         # Falls keine gespeicherten Teile vorhanden, lade aus Quote
         if not work_parts and order.quote:
@@ -2932,7 +3243,6 @@ def get_work_step_by_category_and_name(category, name):
         from models import Order, WorkInstruction
         from flask import request
         import uuid
-        import json
         
         order = Order.query.get_or_404(order_id)
         work_instruction = order.work_instruction
@@ -2949,15 +3259,13 @@ def get_work_step_by_category_and_name(category, name):
             if order.quote.customer and order.quote.customer.city:
                 installation_location = order.quote.customer.city
             
-            # Lade Installationsleistungen aus dem Angebot
-            installation_services = ""
-            if order.quote and order.quote.installationsleistungen:
-                installation_services = order.quote.installationsleistungen
+            # Installationsleistungen aus dem Angebot übernehmen (Verweis auf denselben Textbaustein)
+            installation_block_id = order.quote.installationsleistungen_block_id if order.quote else None
             
             # Neue Arbeitsanweisung erstellen (aber noch nicht speichern)
             work_instruction = WorkInstruction(
                 order_id=order.id,
-                created_by=installation_services,  # Installationsleistungen aus Angebot
+                created_by_block_id=installation_block_id,  # Installationsleistungen aus Angebot
                 status='Erstellt',
                 priority='Normal',
                 installation_location=installation_location
@@ -2999,7 +3307,7 @@ def get_work_step_by_category_and_name(category, name):
                             'notes': step_notes[i].strip() if i < len(step_notes) else ''
                         })
                 
-                work_instruction.work_steps_data = json.dumps(work_steps_data) if work_steps_data else None
+                work_instruction.work_steps_data = work_steps_data or None
                 
                 # Teile/Materialien verarbeiten
                 part_suppliers = request.form.getlist('part_supplier[]')
@@ -3019,7 +3327,7 @@ def get_work_step_by_category_and_name(category, name):
                             'storage_location': part_storage_locations[i].strip() if i < len(part_storage_locations) else ''
                         })
                 
-                work_instruction.work_parts_data = json.dumps(work_parts_data) if work_parts_data else None
+                work_instruction.work_parts_data = work_parts_data or None
                 
                 # Handle file uploads (keeping existing functionality)
                 upload_folder = app.config['UPLOAD_FOLDER']
@@ -3027,15 +3335,8 @@ def get_work_step_by_category_and_name(category, name):
                 # Handle photo uploads
                 photo_files = request.files.getlist('photos')
                 if photo_files and any(f.filename for f in photo_files):
-                    photo_paths = []
-                    
                     # Keep existing photos
-                    if work_instruction.photo_paths:
-                        try:
-                            existing_photos = json.loads(work_instruction.photo_paths)
-                            photo_paths.extend(existing_photos)
-                        except:
-                            pass
+                    photo_paths = list(work_instruction.photo_paths or [])
                     
                     for photo in photo_files:
                         if photo and photo.filename and allowed_photo_file(photo.filename):
@@ -3052,7 +3353,7 @@ def get_work_step_by_category_and_name(category, name):
                         elif photo and photo.filename:
                             flash(f'Datei {photo.filename} ist kein gültiges Foto-Format (nur JPEG/PNG erlaubt)', 'warning')
                     
-                    work_instruction.photo_paths = json.dumps(photo_paths) if photo_paths else work_instruction.photo_paths
+                    work_instruction.photo_paths = photo_paths or work_instruction.photo_paths
                     work_instruction.has_photos = bool(photo_paths)
                 
                 # Handle plan upload
@@ -3084,22 +3385,20 @@ def get_work_step_by_category_and_name(category, name):
                 # Handle deletions
                 delete_photos = request.form.getlist('delete_photos[]')
                 if delete_photos and work_instruction.photo_paths:
-                    try:
-                        current_photos = json.loads(work_instruction.photo_paths)
-                        for delete_photo in delete_photos:
-                            if delete_photo in current_photos:
-                                current_photos.remove(delete_photo)
-                                file_path = os.path.join(upload_folder, delete_photo.split('/')[-1])
-                                if os.path.exists(file_path):
-                                    try:
-                                        os.remove(file_path)
-                                    except:
-                                        pass
-                        
-                        work_instruction.photo_paths = json.dumps(current_photos) if current_photos else None
-                        work_instruction.has_photos = bool(current_photos)
-                    except:
-                        pass
+                    current_photos = work_instruction.photo_paths
+                    for delete_photo in delete_photos:
+                        if delete_photo in current_photos:
+                            current_photos.remove(delete_photo)  # MutableList markiert die Änderung
+                            file_path = os.path.join(upload_folder, delete_photo.split('/')[-1])
+                            if os.path.exists(file_path):
+                                try:
+                                    os.remove(file_path)
+                                except:
+                                    pass
+                    
+                    if not current_photos:
+                        work_instruction.photo_paths = None
+                    work_instruction.has_photos = bool(current_photos)
                 
                 if request.form.get('delete_plan') == 'true':
                     if work_instruction.plan_path:
@@ -3131,10 +3430,7 @@ def get_work_step_by_category_and_name(category, name):
         work_steps = []
         if work_instruction and work_instruction.work_steps_data:
             # Verwende gespeicherte Arbeitsschritte
-            try:
-                work_steps = json.loads(work_instruction.work_steps_data)
-            except:
-                work_steps = []
+            work_steps = list(work_instruction.work_steps_data)
         
         # Falls keine gespeicherten Arbeitsschritte vorhanden, lade aus Quote
         if not work_steps and order.quote:
@@ -3153,10 +3449,7 @@ def get_work_step_by_category_and_name(category, name):
         work_parts = []
         if work_instruction and work_instruction.work_parts_data:
             # Verwende gespeicherte Teile
-            try:
-                work_parts = json.loads(work_instruction.work_parts_data)
-            except:
-                work_parts = []
+            work_parts = list(work_instruction.work_parts_data)
         
         # Falls keine gespeicherten Teile vorhanden, lade aus Quote
         if not work_parts and order.quote:
@@ -3298,9 +3591,12 @@ def get_work_step_by_category_and_name(category, name):
         customer = Customer.query.get_or_404(id)
         form = CustomerWorkflowForm(obj=customer)
         
-        # Automatische Status-Updates prüfen
+        # Automatische Status-Updates prüfen (wie der Status-Job mit source='auto' protokolliert)
+        old_status = customer.status
         auto_updated = customer.check_auto_status_update()
         if auto_updated:
+            db.session.add(CustomerStatusChange(customer_id=customer.id, old_status=old_status,
+                                                new_status=customer.status, source='auto'))
             db.session.commit()
             flash(f'Status wurde automatisch auf "{customer.status}" aktualisiert!', 'info')
         
@@ -3424,8 +3720,13 @@ def get_work_step_by_category_and_name(category, name):
     @app.route('/customer/<int:id>/detail')
     @login_required
     def customer_detail(id):
+        from sqlalchemy.orm import load_only
+        
         customer = Customer.query.get_or_404(id)
-        quotes = Quote.query.filter_by(customer_id=id).order_by(Quote.created_at.desc()).all()
+        # Nur die Spalten der Angebotsliste laden (ohne lange Angebotstexte)
+        quotes = Quote.query.options(
+            load_only(*Quote.list_columns())
+        ).filter_by(customer_id=id).order_by(Quote.created_at.desc()).all()
         
         return render_template('customer_detail.html', customer=customer, quotes=quotes, title=f'Kunde: {customer.full_name}')
 
@@ -3465,12 +3766,11 @@ def get_work_step_by_category_and_name(category, name):
                     enable_volume='enable_volume' in request.form
                 )
                 
-                print(f"DEBUG: Template object created:")
-                print(f"  enable_length: {template.enable_length}")
-                print(f"  enable_width: {template.enable_width}")
-                print(f"  enable_height: {template.enable_height}")
-                print(f"  enable_area: {template.enable_area}")
-                print(f"  enable_volume: {template.enable_volume}")
+                logger.debug(
+                    "Positionsvorlage angelegt: length=%s width=%s height=%s area=%s volume=%s",
+                    template.enable_length, template.enable_width, template.enable_height,
+                    template.enable_area, template.enable_volume
+                )
                 db.session.add(template)
                 db.session.flush()  # Um ID zu bekommen
                 
@@ -3707,15 +4007,22 @@ def process_sub_items(form_data):
 
 def create_sub_items(quote_item_id, position_number, sub_items_data):
     """Erstellt Unterpositionen in der Datenbank"""
+    last_position = 0
     for i, sub_data in enumerate(sub_items_data, 1):
         # Verwende benutzerdefinierte sub_number oder generiere automatisch
         sub_number = sub_data.get('sub_number', '').strip()
         if not sub_number:
             sub_number = f"{position_number}.{i}"
+        # Sortierschlüssel aus der Nummer; Nummern ohne Zahl am Ende (z.B. "1.2a") hinter die vorherige
+        sub_position = sub_position_from_number(sub_number)
+        if sub_position is None:
+            sub_position = last_position + 1
+        last_position = max(last_position, sub_position)
         
         sub_item = QuoteSubItem(
             quote_item_id=quote_item_id,
             sub_number=sub_number,
+            sub_position=sub_position,
             description=sub_data['description'],
             item_type=sub_data['item_type'],
             requires_order=sub_data['requires_order'],
@@ -3742,6 +4049,8 @@ def update_quote_status(quote_id, new_status):
 
     try:
         quote.status = new_status
+        if new_status == 'Angenommen':
+            write_quote_snapshot(quote)
         
         # Wenn Angebot auf "Gesendet" gesetzt wird, Kunden-Status aktualisieren
         if new_status == 'Gesendet':
@@ -3890,9 +4199,7 @@ def test_new_invoice():
                              available_orders_json=available_orders_json)
                              
     except Exception as e:
-        print(f"Error in test_new_invoice: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Fehler in test_new_invoice")
         return f"Error: {str(e)}", 500
 
 @app.route('/invoices/new', methods=['GET'])
@@ -3902,22 +4209,15 @@ def new_invoice():
     from models import Order, Customer
     
     try:
-        print("Loading new invoice page...")
-        
         # Verfügbare Aufträge holen
-        print("Fetching available orders...")
         available_orders = db.session.query(Order).join(Order.quote).filter(
             Order.status.in_(['Angenommen', 'Geplant', 'In Arbeit', 'Abgeschlossen'])
         ).order_by(Order.created_at.desc()).all()
-        print(f"Found {len(available_orders)} orders")
         
         # Alle Kunden für allgemeine Rechnungen
-        print("Fetching customers...")
         customers = Customer.query.order_by(Customer.last_name, Customer.first_name).all()
-        print(f"Found {len(customers)} customers")
         
         # JSON-Daten für JavaScript vorbereiten
-        print("Preparing JSON data...")
         available_orders_json = json.dumps([
             {
                 "id": order.id,
@@ -3939,9 +4239,9 @@ def new_invoice():
             }
             for customer in customers
         ])
-        print(f"JSON data prepared, orders: {len(available_orders_json)}, customers: {len(customers_json)}")
+        logger.debug("Rechnungserstellung geladen",
+                     extra={'orders': len(available_orders), 'customers': len(customers)})
         
-        print("Rendering template...")
         return render_template('create_invoice_new.html',
                              available_orders=available_orders,
                              customers=customers,
@@ -3949,13 +4249,12 @@ def new_invoice():
                              customers_json=customers_json)
                              
     except Exception as e:
-        print(f"Error in new_invoice: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Fehler beim Laden der Rechnungserstellung")
         return f"Error loading invoice page: {str(e)}", 500
 
 @app.route('/api/order/<int:order_id>/details')
 @login_required
+@conditional_get('order', 'quote', 'invoice', 'company_settings')
 def get_order_details(order_id):
     """API-Endpoint für Auftragsdetails"""
     from models import Order
@@ -4037,6 +4336,7 @@ def get_order_downpayment_info(order_id):
 
 @app.route('/api/order/<int:order_id>/quote_details')
 @login_required
+@conditional_get('order', 'quote', 'company_settings')
 def get_order_quote_details(order_id):
     """API-Endpoint für Angebotsdaten eines Auftrags (Materialkosten, Arbeitsstunden, etc.)"""
     from models import Order, QuoteSubItem, CompanySettings
@@ -4044,7 +4344,7 @@ def get_order_quote_details(order_id):
     try:
         order = Order.query.get_or_404(order_id)
         
-        if not order.quote or not order.quote.quote_items:
+        if not order.quote or not quote_positions(order.quote):
             return jsonify({
                 'success': True,
                 'material_costs': 0.0,
@@ -4053,21 +4353,13 @@ def get_order_quote_details(order_id):
                 'default_hourly_rate': 95.0
             })
         
-        # Berechne Materialkosten und Arbeitsstunden aus dem Angebot
-        material_costs = 0.0
-        labor_hours = 0.0
-        labor_costs = 0.0
-        
-        # Durchlaufe alle QuoteItems und deren SubItems
-        for item in order.quote.quote_items:
-            for sub_item in item.sub_items:
-                if sub_item.item_type in ['bestellteil', 'sonstiges']:
-                    # Materialkosten: Bestellteile + Sonstiges
-                    material_costs += sub_item.price or 0.0
-                elif sub_item.item_type == 'arbeitsvorgang':
-                    # Arbeitsstunden und -kosten
-                    labor_hours += sub_item.hours or 0.0
-                    labor_costs += sub_item.price or 0.0
+        # Kosten nach Typ - bei angenommenen Angeboten eine Zeile aus dem Snapshot
+        costs = quote_costs(order.quote)
+        # Materialkosten: Bestellteile + Sonstiges
+        material_costs = costs['bestellteil']['price'] + costs['sonstiges']['price']
+        # Arbeitsstunden und -kosten
+        labor_hours = costs['arbeitsvorgang']['hours']
+        labor_costs = costs['arbeitsvorgang']['price']
         
         # Aufschlag anwenden (falls vorhanden)
         markup_factor = 1.0
@@ -4366,6 +4658,11 @@ def create_invoice():
         
         db.session.add(invoice)
         db.session.commit()
+        logger.info("Rechnung erstellt", extra={
+            'invoice_number': invoice.invoice_number,
+            'invoice_type': invoice.invoice_type,
+            'order_id': invoice.order_id
+        })
         
         # Bei Erfolg: Weiterleitung zur Rechnungsübersicht mit Erfolgsmeldung
         flash(f'Rechnung {invoice.invoice_number} wurde erfolgreich erstellt!', 'success')
@@ -4373,12 +4670,14 @@ def create_invoice():
         
     except Exception as e:
         db.session.rollback()
+        logger.exception("Fehler beim Erstellen der Rechnung")
         # Bei Fehler: Zurück zur Erstellungsseite mit Fehlermeldung
         flash(f'Fehler beim Erstellen der Rechnung: {str(e)}', 'error')
         return redirect(url_for('new_invoice'))
 
 @app.route('/invoices/<int:id>')
 @login_required
+@conditional_get('invoice', 'order', 'quote', 'customer', 'company_settings', html=True)
 def invoice_details(id):
     """Zeigt die Details einer Rechnung an"""
     from models import Invoice
@@ -4797,13 +5096,10 @@ def download_backup(format):
 def backup_manager():
     """CSV/Excel Backup-Manager Interface - nur Download/Upload"""
     try:
-        print("🔄 Backup-Manager wird geladen...")        
         return render_template('backup_manager.html')
         
     except Exception as e:
-        print(f"❌ Fehler im Backup-Manager: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Fehler im Backup-Manager")
         flash(f'Fehler beim Laden des Backup-Managers: {str(e)}', 'error')
         return redirect(url_for('index'))
 
@@ -4821,29 +5117,24 @@ def upload_backup():
         return redirect(url_for('backup_manager'))
     
     try:
-        print("🔄 Upload-Backup gestartet...")
-        
         if 'backupFile' not in request.files:
-            print("❌ Keine Datei im Request")
+            logger.warning("Backup-Upload ohne Datei")
             flash('Keine Datei ausgewählt!', 'error')
             return redirect(url_for('backup_manager'))
         
         file = request.files['backupFile']
         if file.filename == '':
-            print("❌ Leerer Dateiname")
+            logger.warning("Backup-Upload mit leerem Dateinamen")
             flash('Keine Datei ausgewählt!', 'error')
             return redirect(url_for('backup_manager'))
         
-        print(f"📁 Datei erhalten: {file.filename}")
-        
         # Datei temporär speichern
         try:
             temp_dir = tempfile.mkdtemp()
             temp_path = os.path.join(temp_dir, file.filename)
             file.save(temp_path)
-            print(f"💾 Datei gespeichert: {temp_path}")
         except Exception as save_error:
-            print(f"❌ Fehler beim Speichern: {str(save_error)}")
+            logger.exception("Backup-Datei konnte nicht gespeichert werden", extra={'backup_file': file.filename})
             flash(f'Fehler beim Speichern der Datei: {str(save_error)}', 'error')
             return redirect(url_for('backup_manager'))
         
@@ -4852,22 +5143,18 @@ def upload_backup():
         error_details = ""
         
         try:
-            print(f"🔄 Starte Wiederherstellung für: {file.filename}")
+            logger.info("Starte Wiederherstellung", extra={'backup_file': file.filename})
             if file.filename.endswith('.zip'):
-                print("📦 ZIP-Wiederherstellung...")
                 success = backup_system.restore_from_csv(temp_path)
             elif file.filename.endswith('.xlsx'):
-                print("📊 Excel-Wiederherstellung...")
                 success = backup_system.restore_from_excel(temp_path)
             else:
-                print("❌ Ungültiges Dateiformat")
+                logger.warning("Ungültiges Backup-Dateiformat", extra={'backup_file': file.filename})
                 flash('Ungültiges Dateiformat! Nur .zip und .xlsx werden unterstützt.', 'error')
                 return redirect(url_for('backup_manager'))
-            print(f"✅ Wiederherstellung abgeschlossen: {success}")
+            logger.info("Wiederherstellung abgeschlossen", extra={'backup_file': file.filename, 'success': success})
         except Exception as restore_error:
-            print(f"❌ Restore-Fehler: {str(restore_error)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Fehler bei der Wiederherstellung", extra={'backup_file': file.filename})
             error_details = str(restore_error)
             success = False
         
@@ -4880,7 +5167,6 @@ def upload_backup():
         
         if success:
             flash(f'✅ Backup "{file.filename}" erfolgreich wiederhergestellt!', 'success')
-            print("🎉 Upload-Restore erfolgreich!")
         else:
             error_msg = f'❌ Fehler beim Wiederherstellen von "{file.filename}"!'
             if error_details:
@@ -4891,16 +5177,11 @@ def upload_backup():
         return redirect(url_for('backup_manager'))
         
     except Exception as e:
-        print(f"❌ Upload-Fehler: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Fehler beim Backup-Upload")
         flash(f'Fehler beim Upload: {str(e)}', 'error')
         return redirect(url_for('backup_manager'))
 
 # restore_backup Route entfernt - nur noch upload_backup wird verwendet
-        traceback.print_exc()
-        flash(f'Unerwarteter Fehler beim Wiederherstellen: {str(e)}', 'error')
-        return redirect(url_for('backup_manager'))
 
 
 
@@ -4982,12 +5263,11 @@ def delete_article_form(id):
 
 @app.route('/api/articles/active')
 @login_required
+@conditional_get('article', max_age=60)
 def get_active_articles_api():
     """API-Endpunkt für aktive Artikel (für Dropdown-Listen)"""
-    from models import Article
-    
     try:
-        articles = Article.query.order_by(Article.name).all()
+        articles = get_articles()
         return jsonify([{
             'id': article.id,
             'name': article.name,
@@ -5004,6 +5284,7 @@ def get_active_articles_api():
 
 @app.route('/api/order/<int:order_id>/invoice-summary')
 @login_required
+@conditional_get('order', 'quote', 'invoice')
 def get_order_invoice_summary(order_id):
     """API-Endpunkt für Auftragsübersicht mit Rechnungsdetails"""
     from models import Order, Invoice, Quote
@@ -5075,8 +5356,6 @@ def new_general_invoice():
     from models import Order, Customer
     
     try:
-        print("Loading new general invoice page...")
-        
         # Verfügbare Aufträge holen
         available_orders = db.session.query(Order).join(Order.quote).filter(
             Order.status.in_(['Angenommen', 'Geplant', 'In Arbeit', 'Abgeschlossen'])
@@ -5139,9 +5418,7 @@ def new_general_invoice():
                              default_closing_text=default_closing_text)
                              
     except Exception as e:
-        print(f"Error in new_general_invoice: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Fehler beim Laden der allgemeinen Rechnungserstellung")
         flash(f'Fehler beim Laden der Seite: {str(e)}', 'error')
         return redirect(url_for('invoices'))
 
@@ -5154,8 +5431,6 @@ def create_general_invoice():
     import json
     
     try:
-        print("Creating new general invoice...")
-        
         # Basis-Daten aus Form
         customer_id = request.form.get('customer_id')
         order_id = request.form.get('order_id') if request.form.get('order_id') else None
@@ -5350,9 +5625,7 @@ def create_general_invoice():
         
     except Exception as e:
         db.session.rollback()
-        print(f"Error creating general invoice: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Fehler beim Erstellen der allgemeinen Rechnung")
         flash(f'Fehler beim Erstellen der Rechnung: {str(e)}', 'error')
         
         # Formulardaten für erneute Anzeige vorbereiten
@@ -5531,6 +5804,7 @@ def update_general_invoice(id):
 
 @app.route('/api/invoices/existing')
 @login_required
+@conditional_get('invoice', query_args=('customer_id', 'order_id'))
 def get_existing_invoices_api():
     """API-Endpunkt für bestehende Rechnungen eines Kunden/Auftrags"""
     from models import Invoice
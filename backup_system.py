@@ -5,6 +5,7 @@ Erstellt vollständige Backups aller Datentabellen und ermöglicht Wiederherstel
 import os
 import csv
 import json
+import logging
 import shutil
 import tempfile
 import zipfile
@@ -19,13 +20,17 @@ from models import (
     Supplier, SupplierOrder, SupplierOrderItem, PositionTemplate, 
     AcquisitionChannel, CompanySettings, WorkInstruction, 
     InvoiceReminder, QuoteRejection, PositionTemplateSubItem,
-    Article, InvoicePosition, LoginAdmin
+    Article, InvoicePosition, LoginAdmin, TextBlock, QuoteSnapshot, WorkStep,
+    CustomerStatusChange, clear_text_block_cache
 )
+from metrics import track_backup
+
+logger = logging.getLogger(__name__)
 
 BACKUP_MODELS = [
-    CompanySettings, AcquisitionChannel, Supplier, Article,
-    PositionTemplate, PositionTemplateSubItem, Customer,
-    Quote, QuoteItem, QuoteSubItem, QuoteRejection,
+    CompanySettings, AcquisitionChannel, Supplier, Article, WorkStep,
+    PositionTemplate, PositionTemplateSubItem, TextBlock, Customer, CustomerStatusChange,
+    Quote, QuoteItem, QuoteSubItem, QuoteRejection, QuoteSnapshot,
     Order, WorkInstruction, SupplierOrder, SupplierOrderItem,
     Invoice, InvoicePosition, InvoiceReminder,
 ]
@@ -38,7 +43,6 @@ class CSVBackupSystem:
     def get_model_data(self, model_class):
         """Extrahiert alle Daten aus einem Model als Liste von Dictionaries"""
         try:
-            print(f"📊 Extrahiere Daten aus {model_class.__name__}...")
             records = model_class.query.all()
             columns = [column.name for column in inspect(model_class).columns]
             data = []
@@ -48,16 +52,20 @@ class CSVBackupSystem:
                     value = getattr(record, column)
                     if hasattr(value, 'isoformat'):
                         value = value.isoformat()
+                    elif isinstance(value, (list, dict)):
+                        # JSON-Spalten als JSON-Text exportieren
+                        value = json.dumps(value, ensure_ascii=False)
                     elif value is None:
                         value = ''
                     row_data[column] = value
                 data.append(row_data)
-            print(f"   ✓ {len(data)} Datensätze gefunden")
+            logger.debug("%s: %d Datensätze extrahiert", model_class.__name__, len(data))
             return data, columns
         except Exception as e:
-            print(f"   ❌ Fehler beim Laden der Daten für {model_class.__name__}: {str(e)}")
+            logger.error("Fehler beim Laden der Daten für %s: %s", model_class.__name__, e)
             return [], []
 
+    @track_backup('csv')
     def create_csv_backup(self):
         """Erstellt CSV-Backup aller Tabellen in einem ZIP-Archiv als temporäre Datei"""
         import tempfile
@@ -65,8 +73,7 @@ class CSVBackupSystem:
         backup_filename = f'InnSAN_CSV_Backup_{timestamp}.zip'
         # Erstelle temporäre Datei
         backup_path = os.path.join(tempfile.gettempdir(), backup_filename)
-        print(f"🚀 Erstelle CSV-Backup: {backup_filename}")
-        print("=" * 60)
+        logger.info("Erstelle CSV-Backup: %s", backup_filename)
         try:
             with zipfile.ZipFile(backup_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
                 metadata = {
@@ -93,7 +100,7 @@ class CSVBackupSystem:
                             'columns': len(columns)
                         })
                     except Exception as e:
-                        print(f"   ❌ Fehler bei Tabelle {table_name}: {str(e)}")
+                        logger.error("Fehler bei Tabelle %s: %s", table_name, e)
                         metadata['tables'].append({
                             'name': table_name,
                             'records': 0,
@@ -102,15 +109,15 @@ class CSVBackupSystem:
                         })
                 metadata_json = json.dumps(metadata, indent=2)
                 zipf.writestr('backup_metadata.json', metadata_json)
-            print("=" * 60)
-            print(f"✅ CSV-Backup erfolgreich erstellt: {backup_filename}")
+            logger.info("CSV-Backup erfolgreich erstellt: %s", backup_filename)
             return backup_path
         except Exception as e:
-            print(f"❌ Fehler beim CSV-Backup: {str(e)}")
+            logger.error("Fehler beim CSV-Backup: %s", e)
             if os.path.exists(backup_path):
                 os.remove(backup_path)
             raise e
 
+    @track_backup('excel')
     def create_excel_backup(self):
         """Erstellt Excel-Backup mit allen Tabellen in separaten Sheets als temporäre Datei"""
         import tempfile
@@ -118,8 +125,7 @@ class CSVBackupSystem:
         backup_filename = f'InnSAN_Excel_Backup_{timestamp}.xlsx'
         # Erstelle temporäre Datei
         backup_path = os.path.join(tempfile.gettempdir(), backup_filename)
-        print(f"📊 Erstelle Excel-Backup: {backup_filename}")
-        print("=" * 60)
+        logger.info("Erstelle Excel-Backup: %s", backup_filename)
         try:
             all_data = {}
             for model_class in self.models:
@@ -129,7 +135,7 @@ class CSVBackupSystem:
                     df = pd.DataFrame(data)
                     all_data[table_name] = df
                 else:
-                    print(f"   ⚪ {table_name}: Keine Daten")
+                    logger.debug("%s: Keine Daten", table_name)
             with pd.ExcelWriter(backup_path, engine='openpyxl') as writer:
                 for table_name, df in all_data.items():
                     df.to_excel(writer, sheet_name=table_name, index=False)
@@ -147,19 +153,18 @@ class CSVBackupSystem:
                     info_data['Backup Info'].append(f'- {table_name}: {len(df)} Datensätze')
                 info_df = pd.DataFrame(info_data)
                 info_df.to_excel(writer, sheet_name='Backup_Info', index=False)
-            print("=" * 60)
-            print(f"✅ Excel-Backup erfolgreich erstellt: {backup_filename}")
+            logger.info("Excel-Backup erfolgreich erstellt: %s", backup_filename)
             return backup_path
         except Exception as e:
-            print(f"❌ Fehler beim Excel-Backup: {str(e)}")
+            logger.error("Fehler beim Excel-Backup: %s", e)
             if os.path.exists(backup_path):
                 os.remove(backup_path)
             raise e
 
+    @track_backup('restore_csv')
     def restore_from_csv(self, zip_file_path):
         """Stellt Daten aus CSV-Backup wieder her"""
-        print(f"🔄 Beginne CSV-Wiederherstellung aus: {os.path.basename(zip_file_path)}")
-        print("=" * 70)
+        logger.info("Beginne CSV-Wiederherstellung aus: %s", os.path.basename(zip_file_path))
         try:
             temp_dir = tempfile.mkdtemp()
             with zipfile.ZipFile(zip_file_path, 'r') as zipf:
@@ -170,11 +175,11 @@ class CSVBackupSystem:
                     metadata = json.load(f)
                     timestamp = metadata.get('backup_timestamp', 'Unbekannt')
                     table_count = metadata.get('total_tables', 0)
-                    print(f"📋 Backup-Info: {timestamp} ({table_count} Tabellen)")
+                    logger.info("Backup-Info: %s (%s Tabellen)", timestamp, table_count)
             
             # PostgreSQL: Alle Triggers temporär deaktivieren (inklusive FK-Constraints)
             if 'postgresql' in str(db.engine.url):
-                print("🔧 PostgreSQL: Deaktiviere alle Triggers...")
+                logger.info("PostgreSQL: Deaktiviere alle Triggers...")
                 # Alle Tabellen-Trigger deaktivieren (inkl. Foreign Key Constraints)
                 for model_class in self.models:
                     try:
@@ -184,17 +189,17 @@ class CSVBackupSystem:
                         pass  # Ignore errors for tables that don't exist yet
                 db.session.commit()
             
-            print("🗑️  Lösche bestehende Daten...")
+            logger.info("Lösche bestehende Daten...")
             for model_class in reversed(self.models):
                 try:
                     count = model_class.query.count()
                     if count > 0:
                         model_class.query.delete()
-                        print(f"   🗑️  {model_class.__tablename__}: {count} Datensätze gelöscht")
+                        logger.debug("%s: %s Datensätze gelöscht", model_class.__tablename__, count)
                 except Exception as e:
-                    print(f"   ⚠️ Fehler beim Löschen {model_class.__tablename__}: {str(e)}")
+                    logger.warning("Fehler beim Löschen %s: %s", model_class.__tablename__, e)
             db.session.commit()
-            print("📥 Stelle Daten wieder her...")
+            logger.info("Stelle Daten wieder her...")
             restored_count = 0
             for model_class in self.models:
                 table_name = model_class.__tablename__
@@ -205,53 +210,52 @@ class CSVBackupSystem:
                         if len(df) > 0:
                             count = self._restore_model_data(model_class, df)
                             restored_count += count
-                            print(f"   ✓ {table_name}: {count} Datensätze wiederhergestellt")
+                            logger.debug("%s: %s Datensätze wiederhergestellt", table_name, count)
                         else:
-                            print(f"   ⚪ {table_name}: Keine Daten")
+                            logger.debug("%s: Keine Daten", table_name)
                     except Exception as e:
-                        print(f"   ✗ Fehler bei {table_name}: {str(e)}")
+                        logger.error("Fehler bei %s: %s", table_name, e)
                 else:
-                    print(f"   ⚠️ {table_name}: CSV-Datei nicht gefunden")
+                    logger.warning("%s: CSV-Datei nicht gefunden", table_name)
             
             # Erst alle Daten committen
             db.session.commit()
             
             # PostgreSQL: Alle Triggers wieder aktivieren (nach dem Commit)
             if 'postgresql' in str(db.engine.url):
-                print("🔧 PostgreSQL: Aktiviere alle Triggers wieder...")
+                logger.info("PostgreSQL: Aktiviere alle Triggers wieder...")
                 # Alle Tabellen-Trigger wieder aktivieren
                 for model_class in self.models:
                     try:
                         table_name = model_class.__tablename__
                         db.session.execute(text(f"ALTER TABLE {table_name} ENABLE TRIGGER ALL;"))
                     except Exception as trigger_error:
-                        print(f"⚠️ Trigger-Fehler bei {table_name}: {str(trigger_error)}")
+                        logger.warning("Trigger-Fehler bei %s: %s", table_name, trigger_error)
                 # Separater Commit für die Trigger-Aktivierung
                 try:
                     db.session.commit()
                 except:
                     db.session.rollback()  # Falls Trigger-Aktivierung fehlschlägt
             shutil.rmtree(temp_dir)
-            print("=" * 70)
-            print(f"✅ Wiederherstellung abgeschlossen: {restored_count} Datensätze insgesamt")
+            logger.info("Wiederherstellung abgeschlossen: %s Datensätze insgesamt", restored_count)
+            # Andere Worker verwerfen ihren Cache über die Version 'text_block'
+            clear_text_block_cache()
             return True
         except Exception as e:
-            print(f"❌ Kritischer Fehler bei der CSV-Wiederherstellung: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Kritischer Fehler bei der CSV-Wiederherstellung: %s", e)
             db.session.rollback()
             return False
 
+    @track_backup('restore_excel')
     def restore_from_excel(self, excel_file_path):
         """Stellt Daten aus Excel-Backup wieder her"""
-        print(f"🔄 Beginne Excel-Wiederherstellung aus: {os.path.basename(excel_file_path)}")
-        print("=" * 70)
+        logger.info("Beginne Excel-Wiederherstellung aus: %s", os.path.basename(excel_file_path))
         try:
             xl_file = pd.ExcelFile(excel_file_path)
             
             # PostgreSQL: Alle Triggers temporär deaktivieren (inklusive FK-Constraints)  
             if 'postgresql' in str(db.engine.url):
-                print("🔧 PostgreSQL: Deaktiviere alle Triggers...")
+                logger.info("PostgreSQL: Deaktiviere alle Triggers...")
                 # Alle Tabellen-Trigger deaktivieren (inkl. Foreign Key Constraints)
                 for model_class in self.models:
                     try:
@@ -261,17 +265,17 @@ class CSVBackupSystem:
                         pass  # Ignore errors for tables that don't exist yet
                 db.session.commit()
             
-            print("🗑️  Lösche bestehende Daten...")
+            logger.info("Lösche bestehende Daten...")
             for model_class in reversed(self.models):
                 try:
                     count = model_class.query.count()
                     if count > 0:
                         model_class.query.delete()
-                        print(f"   🗑️  {model_class.__tablename__}: {count} Datensätze gelöscht")
+                        logger.debug("%s: %s Datensätze gelöscht", model_class.__tablename__, count)
                 except Exception as e:
-                    print(f"   ⚠️ Fehler beim Löschen {model_class.__tablename__}: {str(e)}")
+                    logger.warning("Fehler beim Löschen %s: %s", model_class.__tablename__, e)
             db.session.commit()
-            print("📥 Stelle Daten wieder her...")
+            logger.info("Stelle Daten wieder her...")
             restored_count = 0
             for model_class in self.models:
                 table_name = model_class.__tablename__
@@ -281,39 +285,38 @@ class CSVBackupSystem:
                         if len(df) > 0:
                             count = self._restore_model_data(model_class, df)
                             restored_count += count
-                            print(f"   ✓ {table_name}: {count} Datensätze wiederhergestellt")
+                            logger.debug("%s: %s Datensätze wiederhergestellt", table_name, count)
                         else:
-                            print(f"   ⚪ {table_name}: Keine Daten")
+                            logger.debug("%s: Keine Daten", table_name)
                     except Exception as e:
-                        print(f"   ✗ Fehler bei {table_name}: {str(e)}")
+                        logger.error("Fehler bei %s: %s", table_name, e)
                 else:
-                    print(f"   ⚠️ {table_name}: Excel-Sheet nicht gefunden")
+                    logger.warning("%s: Excel-Sheet nicht gefunden", table_name)
             
             # Erst alle Daten committen
             db.session.commit()
             
             # PostgreSQL: Alle Triggers wieder aktivieren (nach dem Commit)
             if 'postgresql' in str(db.engine.url):
-                print("🔧 PostgreSQL: Aktiviere alle Triggers wieder...")
+                logger.info("PostgreSQL: Aktiviere alle Triggers wieder...")
                 # Alle Tabellen-Trigger wieder aktivieren
                 for model_class in self.models:
                     try:
                         table_name = model_class.__tablename__
                         db.session.execute(text(f"ALTER TABLE {table_name} ENABLE TRIGGER ALL;"))
                     except Exception as trigger_error:
-                        print(f"⚠️ Trigger-Fehler bei {table_name}: {str(trigger_error)}")
+                        logger.warning("Trigger-Fehler bei %s: %s", table_name, trigger_error)
                 # Separater Commit für die Trigger-Aktivierung
                 try:
                     db.session.commit()
                 except:
                     db.session.rollback()  # Falls Trigger-Aktivierung fehlschlägt
-            print("=" * 70)
-            print(f"✅ Excel-Wiederherstellung abgeschlossen: {restored_count} Datensätze insgesamt")
+            logger.info("Excel-Wiederherstellung abgeschlossen: %s Datensätze insgesamt", restored_count)
+            # Andere Worker verwerfen ihren Cache über die Version 'text_block'
+            clear_text_block_cache()
             return True
         except Exception as e:
-            print(f"❌ Kritischer Fehler bei der Excel-Wiederherstellung: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Kritischer Fehler bei der Excel-Wiederherstellung: %s", e)
             db.session.rollback()
             return False
 
@@ -341,7 +344,7 @@ class CSVBackupSystem:
                             from models import Order
                             existing_order = Order.query.filter_by(id=int(order_id)).first()
                             if not existing_order:
-                                print(f"⚠️ Überspringe work_instruction: order_id {order_id} existiert nicht")
+                                logger.warning("Überspringe work_instruction: order_id %s existiert nicht", order_id)
                                 skip_record = True
                                 skipped += 1
                     
@@ -352,7 +355,7 @@ class CSVBackupSystem:
                             from models import Order
                             existing_order = Order.query.filter_by(id=int(order_id)).first()
                             if not existing_order:
-                                print(f"⚠️ Überspringe invoice_reminder: order_id {order_id} existiert nicht")
+                                logger.warning("Überspringe invoice_reminder: order_id %s existiert nicht", order_id)
                                 skip_record = True
                                 skipped += 1
                     
@@ -363,7 +366,7 @@ class CSVBackupSystem:
                             from models import SupplierOrder
                             existing_supplier_order = SupplierOrder.query.filter_by(id=int(supplier_order_id)).first()
                             if not existing_supplier_order:
-                                print(f"⚠️ Überspringe supplier_order_item: supplier_order_id {supplier_order_id} existiert nicht")
+                                logger.warning("Überspringe supplier_order_item: supplier_order_id %s existiert nicht", supplier_order_id)
                                 skip_record = True
                                 skipped += 1
                     
@@ -374,7 +377,7 @@ class CSVBackupSystem:
                             from models import QuoteItem
                             existing_quote_item = QuoteItem.query.filter_by(id=int(quote_item_id)).first()
                             if not existing_quote_item:
-                                print(f"⚠️ Überspringe quote_sub_item: quote_item_id {quote_item_id} existiert nicht")
+                                logger.warning("Überspringe quote_sub_item: quote_item_id %s existiert nicht", quote_item_id)
                                 skip_record = True
                                 skipped += 1
                     
@@ -385,7 +388,7 @@ class CSVBackupSystem:
                             from models import Invoice
                             existing_invoice = Invoice.query.filter_by(id=int(invoice_id)).first()
                             if not existing_invoice:
-                                print(f"⚠️ Überspringe invoice_position: invoice_id {invoice_id} existiert nicht")
+                                logger.warning("Überspringe invoice_position: invoice_id %s existiert nicht", invoice_id)
                                 skip_record = True
                                 skipped += 1
                 
@@ -419,6 +422,12 @@ class CSVBackupSystem:
                                         value = float(value)
                                     except (ValueError, TypeError):
                                         value = None
+                                elif 'JSON' in column_type:
+                                    if isinstance(value, str):
+                                        try:
+                                            value = json.loads(value)
+                                        except ValueError:
+                                            value = None
                                 elif 'BOOLEAN' in column_type:
                                     if isinstance(value, str):
                                         value = value.lower() in ('true', '1', 'yes', 'on')
@@ -446,11 +455,11 @@ class CSVBackupSystem:
                 count += 1
             
             if skipped > 0:
-                print(f"⚠️ {model_class.__tablename__}: {skipped} Datensätze übersprungen (FK-Konflikte)")
+                logger.warning("%s: %s Datensätze übersprungen (FK-Konflikte)", model_class.__tablename__, skipped)
             
             return count
         except Exception as e:
-            print(f"❌ Fehler beim Wiederherstellen von {model_class.__name__}: {str(e)}")
+            logger.error("Fehler beim Wiederherstellen von %s: %s", model_class.__name__, e)
             raise e
 
 
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Prüft die Ausführungspläne der wichtigsten Listen- und Dashboard-Abfragen.
+
+Führt für jede Abfrage EXPLAIN (PostgreSQL) bzw. EXPLAIN QUERY PLAN (SQLite)
+aus und meldet Full Table Scans, d.h. Abfragen, für die kein passender Index
+existiert. Unterstützt sowohl SQLite als auch PostgreSQL.
+
+Aufruf:  python check_query_plans.py
+Exit-Code 1, wenn mindestens ein Full Scan gefunden wurde.
+"""
+import sys
+from datetime import date, timedelta
+
+from app import app
+from models import db, Customer, Quote, QuoteItem, QuoteSubItem, Order, SupplierOrder, Invoice, InvoiceReminder
+
+
+def get_list_queries():
+    """Liefert die zu prüfenden Abfragen als Liste von (Bezeichnung, Query)"""
+    today = date.today()
+    return [
+        # Dashboard
+        ('Dashboard: offene Angebote', Quote.query.filter_by(status='Entwurf')),
+        ('Dashboard: aktive Aufträge', Order.query.filter(Order.status.in_(['Geplant', 'In Arbeit']))),
+        ('Dashboard: letzte Angebote', Quote.query.order_by(Quote.created_at.desc()).limit(3)),
+        ('Dashboard: letzte Aufträge', Order.query.order_by(Order.created_at.desc()).limit(3)),
+        ('Dashboard: anstehende Aufträge', Order.query.filter(
+            Order.start_date >= today,
+            Order.start_date <= today + timedelta(days=7),
+            Order.status.in_(['Geplant', 'In Arbeit'])
+        ).order_by(Order.start_date)),
+        ('Dashboard: offene Lieferungen', SupplierOrder.query.filter(
+            SupplierOrder.status.in_(['Bestellt', 'Bestätigt'])
+        )),
+        ('Dashboard: Rechnungs-Reminder', InvoiceReminder.query.filter(
+            InvoiceReminder.due_date <= today,
+            InvoiceReminder.is_dismissed == False
+        ).join(Order).filter(Order.status.in_(['Geplant', 'In Arbeit', 'Abgeschlossen']))),
+        # Kunden
+        ('Kunden: automatische Status-Updates', Customer.query.filter(
+            db.or_(
+                db.and_(Customer.status == '1. Termin vereinbart', Customer.appointment_date < today),
+                db.and_(Customer.status == '2. Termin vereinbart', Customer.second_appointment_date < today)
+            )
+        )),
+        ('Kunden: Liste', Customer.query.order_by(Customer.last_name.asc()).limit(30)),
+        ('Kunden: Statusfilter', Customer.query.filter(Customer.status == 'Angebot erstellen')),
+        ('Kunden: Angebote im Kundendetail', Quote.query.filter_by(customer_id=1).order_by(Quote.created_at.desc())),
+        # Angebote
+        ('Angebote: Liste', Quote.query.order_by(Quote.created_at.desc()).limit(30)),
+        ('Angebote: Positionen', QuoteItem.query.filter_by(quote_id=1).order_by(QuoteItem.position_number)),
+        ('Angebote: Unterpositionen', QuoteSubItem.query.filter_by(quote_item_id=1).order_by(QuoteSubItem.sub_position)),
+        # Aufträge und Lieferantenbestellungen
+        ('Aufträge: Liste', Order.query.order_by(Order.created_at.desc()).limit(30)),
+        ('Lieferantenbestellungen: Statusfilter', SupplierOrder.query.filter(
+            SupplierOrder.status == 'Noch nicht bestellt'
+        ).order_by(SupplierOrder.order_date.desc())),
+        ('Lieferantenbestellungen: pro Auftrag', SupplierOrder.query.filter_by(order_id=1)),
+        # Rechnungen
+        ('Rechnungen: Liste', Invoice.query.order_by(Invoice.created_at.desc()).limit(30)),
+        ('Rechnungen: Statusfilter', Invoice.query.filter(Invoice.status == 'bezahlt')),
+        ('Rechnungen: überfällig', Invoice.query.filter(
+            Invoice.status.in_(['erstellt', 'versendet', 'teilweise_bezahlt']),
+            Invoice.due_date < today
+        )),
+        ('Rechnungen: vorhandene Rechnung je Reminder', Invoice.query.filter_by(order_id=1, invoice_type='anzahlung')),
+    ]
+
+
+def explain(connection, query, is_postgresql):
+    """Gibt die Zeilen des Ausführungsplans einer Query zurück"""
+    compiled = query.statement.compile(
+        dialect=connection.dialect,
+        compile_kwargs={'render_postcompile': True}
+    )
+    if compiled.positiontup:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+
+    if is_postgresql:
+        rows = connection.exec_driver_sql('EXPLAIN ' + str(compiled), params).fetchall()
+        return [row[0] for row in rows]
+
+    rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + str(compiled), params).fetchall()
+    return [row[-1] for row in rows]
+
+
+def find_full_scans(plan_lines, is_postgresql):
+    """Sucht im Ausführungsplan nach Full Table Scans"""
+    full_scans = []
+    for line in plan_lines:
+        text = line.strip()
+        if is_postgresql:
+            # "Seq Scan on quote  (cost=...)"
+            if 'Seq Scan on ' in text:
+                full_scans.append(text)
+        else:
+            # "SCAN quote" ohne "USING INDEX" = Full Scan, "SEARCH ..." = Indexzugriff
+            if text.startswith('SCAN ') and 'USING' not in text:
+                full_scans.append(text)
+    return full_scans
+
+
+def check_query_plans():
+    """Prüft alle Listenabfragen und gibt einen Bericht aus"""
+    with app.app_context():
+        is_postgresql = 'postgresql' in db.engine.url.drivername
+
+        print("=" * 70)
+        print(f"QUERY-PLAN CHECK ({db.engine.url.drivername})")
+        print("=" * 70)
+
+        problems = 0
+        with db.engine.connect() as connection:
+            if is_postgresql:
+                # Bei kleinen Tabellen bevorzugt PostgreSQL Seq Scans auch wenn ein
+                # Index existiert - so bleibt ein Seq Scan nur übrig, wenn kein Index passt
+                connection.exec_driver_sql('SET enable_seqscan = off')
+
+            for label, query in get_list_queries():
+                try:
+                    plan_lines = explain(connection, query, is_postgresql)
+                except Exception as e:
+                    print(f"⚠️  {label}: EXPLAIN fehlgeschlagen: {str(e)}")
+                    problems += 1
+                    continue
+
+                full_scans = find_full_scans(plan_lines, is_postgresql)
+                if full_scans:
+                    problems += 1
+                    print(f"❌ {label}")
+                    for line in full_scans:
+                        print(f"     {line}")
+                else:
+                    print(f"✓ {label}")
+
+            if is_postgresql:
+                connection.exec_driver_sql('RESET enable_seqscan')
+
+        print("=" * 70)
+        if problems:
+            print(f"❌ {problems} Abfrage(n) ohne passenden Index gefunden")
+        else:
+            print("✓ Alle Abfragen verwenden einen Index")
+        return problems == 0
+
+
+if __name__ == '__main__':
+    sys.exit(0 if check_query_plans() else 1)
@@ -0,0 +1,77 @@
+"""
+Komprimierung der Antworten (gzip, Brotli wenn installiert)
+Große HTML-Listen (Kunden, Angebote, Bestellungen, Rechnungserstellung mit eingebettetem JSON)
+und JSON-APIs gehen komprimiert raus - bei Textinhalten meist nur 10-20 % der Größe.
+
+Komprimiert wird nur, wenn
+    - der Browser das Verfahren per Accept-Encoding anbietet (Brotli bevorzugt)
+    - der Inhaltstyp in COMPRESSIBLE_MIMETYPES steht (Bilder/PDFs sind bereits komprimiert)
+    - die Antwort mindestens COMPRESS_MIN_SIZE Bytes hat und im Speicher liegt
+      (keine Streams / send_file, keine Teilantworten)
+Ein starker ETag wird dabei zu einem schwachen (wie bei nginx): der komprimierte Inhalt ist
+nicht byte-gleich, bedingte GET-Anfragen vergleichen ETags ohnehin schwach.
+"""
+import gzip
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # optional, siehe requirements.txt
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = frozenset({
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/xml', 'text/javascript',
+    'application/javascript', 'application/json', 'application/xml', 'image/svg+xml',
+})
+
+
+def _choose_encoding():
+    """Bestes vom Browser akzeptiertes Verfahren ('br', 'gzip' oder None)"""
+    accept = request.accept_encodings
+    if brotli is not None and accept['br']:
+        return 'br'
+    if accept['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compress_response(response):
+    """after_request: komprimiert passende Antworten"""
+    config = current_app.config
+    if (
+        not config['COMPRESS_ENABLED']
+        or response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or 'Content-Encoding' in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = _choose_encoding()
+    if encoding is None:
+        return response
+    data = response.get_data()
+    if len(data) < config['COMPRESS_MIN_SIZE']:
+        return response
+
+    if encoding == 'br':
+        compressed = brotli.compress(data, quality=config['COMPRESS_BROTLI_QUALITY'])
+    else:
+        compressed = gzip.compress(data, compresslevel=config['COMPRESS_GZIP_LEVEL'])
+    if len(compressed) >= len(data):
+        return response
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    """Registriert die Komprimierung als after_request-Hook"""
+    app.after_request(_compress_response)
@@ -2,6 +2,14 @@
 Konfigurationsdatei für die InstallationApp
 """
 import os
+import tempfile
+import logging
+
+from logging_config import setup_logging
+
+# Logging vor allem anderen einrichten, damit auch Meldungen beim Import erfasst werden
+setup_logging()
+logger = logging.getLogger(__name__)
 
 def get_database_url():
     """Ermittelt die korrekte Datenbank-URL für lokale und Railway-Umgebung"""
@@ -13,7 +21,7 @@ def get_database_url():
         if database_url.startswith('postgres://'):
             database_url = database_url.replace('postgres://', 'postgresql://', 1)
         
-        print(f"✓ Using Railway PostgreSQL Database")
+        logger.info("Using Railway PostgreSQL Database")
         return database_url
     else:
         # Lokale SQLite Entwicklung - sicherstellen dass instance-Ordner existiert
@@ -21,7 +29,7 @@ def get_database_url():
         os.makedirs(instance_dir, exist_ok=True)
         
         sqlite_path = os.path.join(instance_dir, 'installation_business.db')
-        print(f"✓ Using Local SQLite Database: {sqlite_path}")
+        logger.info("Using Local SQLite Database: %s", sqlite_path)
         return f'sqlite:///{sqlite_path}'
 
 class Config:
@@ -47,6 +55,49 @@ class Config:
     # PDF-Konfiguration
     PDF_TEMP_DIR = 'temp_pdfs'
     
+    # SQL-Monitoring (Abfragen pro Request, N+1-Erkennung, Slow-Query-Log)
+    QUERY_MONITOR_ENABLED = os.environ.get('QUERY_MONITOR_ENABLED', '1') == '1'
+    SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', '200'))
+    N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', '10'))
+    
+    # Metriken (/metrics): Zugriff per Bearer-Token für Prometheus oder mit Admin-Login
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    
+    # Automatische Kunden-Status-Updates: Intervall des Hintergrund-Jobs in Sekunden (0 = aus)
+    CUSTOMER_STATUS_JOB_INTERVAL = int(os.environ.get('CUSTOMER_STATUS_JOB_INTERVAL', '900'))
+    
+    # Ausgehende E-Mails (Lieferantenbestellungen): ohne SMTP_HOST werden Bestellungen wie bisher
+    # manuell verschickt. Lokal z.B. mit einem SMTP-Testserver auf localhost:1025 testen.
+    SMTP_HOST = os.environ.get('SMTP_HOST')
+    SMTP_PORT = int(os.environ.get('SMTP_PORT', '587'))
+    SMTP_USERNAME = os.environ.get('SMTP_USERNAME')
+    SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD')
+    SMTP_USE_TLS = os.environ.get('SMTP_USE_TLS', '1') == '1'  # STARTTLS
+    SMTP_USE_SSL = os.environ.get('SMTP_USE_SSL', '0') == '1'  # SMTPS (Port 465)
+    SMTP_TIMEOUT = int(os.environ.get('SMTP_TIMEOUT', '30'))
+    MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER', 'bestellung@innsan.at')
+    # Warteschlange: Abfrage-Intervall des Hintergrund-Versands in Sekunden (0 = aus), Versuche und Wartezeit
+    MAIL_QUEUE_INTERVAL = int(os.environ.get('MAIL_QUEUE_INTERVAL', '30'))
+    MAIL_QUEUE_BATCH_SIZE = int(os.environ.get('MAIL_QUEUE_BATCH_SIZE', '50'))
+    MAIL_MAX_ATTEMPTS = int(os.environ.get('MAIL_MAX_ATTEMPTS', '5'))
+    MAIL_RETRY_DELAY = int(os.environ.get('MAIL_RETRY_DELAY', '60'))  # verdoppelt sich mit jedem Versuch
+    MAIL_RETENTION_DAYS = int(os.environ.get('MAIL_RETENTION_DAYS', '30'))  # gesendete/fehlgeschlagene E-Mails aufheben (0 = nie löschen)
+
+    # Komprimierung der Antworten (compression.py): Mindestgröße in Bytes und Stufen
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', '1') == '1'
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', '1024'))
+    COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', '6'))
+    COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', '5'))
+    # Statische Dateien mit Fingerprint-URL (?v=<Hash>): Cache-Dauer in Sekunden (1 Jahr)
+    STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', str(365 * 24 * 3600)))
+
+    # Worker-Start (worker_startup.py): Jinja-Bytecode-Cache (leer = aus) und gunicorn preload_app
+    # (PRELOAD_APP wird von gunicorn.conf.py gesetzt; dann starten Hintergrund-Jobs erst nach dem Fork)
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get(
+        'JINJA_BYTECODE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'innsan_jinja_cache')
+    )
+    PRELOAD_APP = os.environ.get('PRELOAD_APP', '0') == '1'
+    
     # Standard-Werte
     DEFAULT_HOURLY_RATE = 95.0
     DEFAULT_VAT_RATE = 0.20  # 20% USt
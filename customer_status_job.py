@@ -0,0 +1,131 @@
+"""
+Automatische Status-Übergänge für Kunden
+Statt bei jedem Aufruf der Kundenliste alle Kunden zu prüfen, läuft ein Job in festen
+Abständen: pro Regel aus Customer.AUTO_STATUS_RULES ein INSERT ... SELECT ins Protokoll
+(customer_status_change) und ein UPDATE ... WHERE auf die Kundentabelle - in einer Transaktion.
+
+Ausführung:
+    - im Hintergrund-Thread alle CUSTOMER_STATUS_JOB_INTERVAL Sekunden (0 = aus)
+    - manuell per "flask --app app update-customer-status"
+
+Jeder gunicorn-Worker startet den Job. Damit das Protokoll keine doppelten Zeilen bekommt,
+läuft er nur unter einem Transaktions-Lock (PostgreSQL: Advisory-Lock, ein zweiter Worker
+überspringt den Lauf; SQLite serialisiert Schreibzugriffe ohnehin). Ein späterer Lauf findet
+keine passenden Kunden mehr.
+"""
+import time
+import logging
+import threading
+from datetime import date, datetime
+
+from sqlalchemy import insert, literal, select, text
+
+logger = logging.getLogger(__name__)
+
+# Erster Lauf kurz nach dem Start, damit die DB-Initialisierung abgeschlossen ist
+STARTUP_DELAY = 10
+
+# Schlüssel für pg_try_advisory_xact_lock (beliebig, aber fest)
+JOB_LOCK_KEY = 740031
+
+_scheduler_thread = None
+
+
+def _acquire_job_lock(session):
+    """Lock bis zum Ende der Transaktion - False, wenn der Job gerade in einem anderen Worker läuft"""
+    if session.get_bind().dialect.name != 'postgresql':
+        return True
+    return bool(session.execute(
+        text('SELECT pg_try_advisory_xact_lock(:key)'), {'key': JOB_LOCK_KEY}
+    ).scalar())
+
+
+def _rule_condition(customer_model, from_status, date_column, today):
+    """WHERE-Bedingung einer Regel: Status passt und Termin liegt vor heute"""
+    appointment = getattr(customer_model, date_column)
+    return (customer_model.status == from_status) & (appointment < today)
+
+
+def apply_customer_status_transitions(today=None):
+    """Führt alle Status-Regeln set-basiert aus und gibt die Anzahl Änderungen pro Regel zurück"""
+    from models import db, Customer, CustomerStatusChange
+
+    today = today or date.today()
+    changed_at = datetime.utcnow()
+    results = []
+    try:
+        if not _acquire_job_lock(db.session):
+            db.session.rollback()
+            logger.debug("Status-Job läuft bereits in einem anderen Worker - übersprungen")
+            return results
+        for from_status, date_column, to_status in Customer.AUTO_STATUS_RULES:
+            condition = _rule_condition(Customer, from_status, date_column, today)
+
+            # Änderungen protokollieren, bevor der Status überschrieben wird
+            db.session.execute(
+                insert(CustomerStatusChange).from_select(
+                    ['customer_id', 'old_status', 'new_status', 'source', 'changed_at'],
+                    select(
+                        Customer.id,
+                        Customer.status,
+                        literal(to_status),
+                        literal('auto'),
+                        literal(changed_at),
+                    ).where(condition)
+                )
+            )
+            updated = Customer.query.filter(condition).update(
+                {Customer.status: to_status}, synchronize_session=False
+            )
+            results.append({'from_status': from_status, 'to_status': to_status, 'count': updated})
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        logger.exception("Automatische Status-Updates fehlgeschlagen")
+        raise
+
+    total = sum(result['count'] for result in results)
+    if total:
+        logger.info("Automatische Status-Updates: %d Kunden aktualisiert", total,
+                    extra={'status_changes': results})
+    return results
+
+
+def _scheduler_loop(app, interval):
+    """Führt den Job in festen Abständen aus (läuft als Daemon-Thread)"""
+    time.sleep(STARTUP_DELAY)
+    while True:
+        try:
+            with app.app_context():
+                apply_customer_status_transitions()
+        except Exception:
+            # Fehler sind bereits geloggt - beim nächsten Intervall erneut versuchen
+            pass
+        time.sleep(interval)
+
+
+def init_customer_status_job(app):
+    """Registriert den CLI-Befehl und startet den Intervall-Job"""
+
+    @app.cli.command('update-customer-status')
+    def update_customer_status_command():
+        """Automatische Kunden-Status-Updates einmalig ausführen"""
+        for result in apply_customer_status_transitions():
+            print(f"{result['from_status']} -> {result['to_status']}: {result['count']} Kunden")
+
+    # Bei gunicorn mit preload_app erst im Worker nach dem Fork (siehe worker_startup.py)
+    if not app.config.get('PRELOAD_APP'):
+        start_customer_status_job(app)
+
+
+def start_customer_status_job(app):
+    """Startet den Intervall-Job als Daemon-Thread (einmal pro Prozess)"""
+    global _scheduler_thread
+    interval = app.config.get('CUSTOMER_STATUS_JOB_INTERVAL', 0)
+    if interval <= 0 or app.config.get('TESTING') or _scheduler_thread is not None:
+        return
+    _scheduler_thread = threading.Thread(
+        target=_scheduler_loop, args=(app, interval),
+        name='customer-status-job', daemon=True,
+    )
+    _scheduler_thread.start()
@@ -0,0 +1,57 @@
+"""
+gunicorn-Konfiguration für Railway
+Wird von gunicorn automatisch aus dem Arbeitsverzeichnis geladen (siehe Procfile).
+"""
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# App einmal im Master laden und an die Worker vererben (Copy-on-Write, siehe worker_startup.py).
+# Die App liest PRELOAD_APP, um Hintergrund-Jobs erst im Worker zu starten. PRELOAD_APP=0 schaltet ab.
+preload_app = os.environ.get('PRELOAD_APP', '1') == '1'
+os.environ['PRELOAD_APP'] = '1' if preload_app else '0'
+
+# Prometheus-Metriken über alle Worker aggregieren: jeder Worker schreibt seine
+# Werte in dieses Verzeichnis. Muss gesetzt sein (und existieren), bevor die App importiert
+# wird - mit preload_app geschieht das im Master noch vor on_starting.
+os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR',
+    os.path.join(tempfile.gettempdir(), 'innsan_prometheus_multiproc')
+)
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+
+def on_starting(server):
+    """Alte Metrik-Dateien vom letzten Start entfernen (die des Masters selbst bleiben)"""
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    for filename in os.listdir(metrics_dir):
+        if not filename.endswith(f'_{server.pid}.db'):
+            os.remove(os.path.join(metrics_dir, filename))
+
+
+def when_ready(server):
+    """preload_app: Templates vorkompilieren, DB-Verbindungen schließen, gc.freeze() - vor dem ersten Fork"""
+    if server.cfg.preload_app:
+        from worker_startup import prepare_for_fork
+        prepare_for_fork(server.app.wsgi())
+
+
+def post_fork(server, worker):
+    """preload_app: geerbte DB-Verbindungen verwerfen und Hintergrund-Jobs im Worker starten"""
+    if server.cfg.preload_app:
+        from worker_startup import after_fork
+        after_fork(server.app.wsgi())
+
+
+def post_worker_init(worker):
+    """Ohne preload_app lädt jeder Worker die App selbst - Templates dann hier vorkompilieren"""
+    if not worker.cfg.preload_app:
+        from worker_startup import warm_up_templates
+        warm_up_templates(worker.wsgi)
+
+
+def child_exit(server, worker):
+    """Live-Gauges eines beendeten Workers aus der Aggregation entfernen"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,164 @@
+"""
+HTTP-Caching für lesende Seiten und JSON-APIs (bedingte GET-Anfragen)
+
+ETag und Last-Modified werden nur aus den Versionsstempeln der betroffenen Datengruppen
+(master_data_version, siehe master_data_cache.py) und den Request-Parametern gebildet.
+Stimmt If-None-Match (bzw. If-Modified-Since), geht ein 304 ohne Inhalt zurück, bevor
+Angebot, Auftrag oder Rechnung überhaupt geladen werden - eine kleine Abfrage pro Request.
+
+Verwendung (unter @login_required, damit die Anmeldung zuerst geprüft wird):
+
+    @app.route('/api/order/<int:order_id>/details')
+    @login_required
+    @conditional_get('order', 'quote', 'invoice')
+    def get_order_details(order_id):
+        ...
+
+Statische Dateien: url_for('static', ...) hängt einen Inhalts-Hash an (?v=<hash>). Passt der Hash
+zur aktuellen Datei, darf der Browser sie ein Jahr lang ohne Nachfrage verwenden - ändert sich
+die Datei, ändert sich auch die URL.
+"""
+import hashlib
+import os
+import threading
+from datetime import date, timezone
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+from werkzeug.security import safe_join
+
+from master_data_cache import get_version_stamps
+from metrics import record_cache_lookup
+
+
+def version_etag(entities, *parts):
+    """Starker ETag aus den Versionen der Datengruppen und weiteren Teilen (Route, Parameter, ...)"""
+    stamps = get_version_stamps()
+    versions = [(entity, stamps.get(entity, (0, None))[0]) for entity in entities]
+    raw = ':'.join(str(part) for part in [versions, *parts])
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:20]
+
+
+def version_last_modified(entities):
+    """Zeitpunkt der letzten Änderung in einer der Datengruppen (UTC, None wenn unbekannt)"""
+    stamps = get_version_stamps()
+    times = [stamps[entity][1] for entity in entities if entity in stamps and stamps[entity][1]]
+    if not times:
+        return None
+    return max(times).replace(microsecond=0, tzinfo=timezone.utc)
+
+
+def conditional_get(*entities, query_args=(), html=False, max_age=None):
+    """
+    Decorator für GET-Routen, deren Antwort nur von den Datengruppen `entities` abhängt.
+
+    Args:
+        query_args: Request-Parameter, die in den ETag eingehen (z.B. customer_id)
+        html: HTML-Seite - ETag zusätzlich pro Benutzer und Tag (base.html zeigt den Benutzer,
+            Vorlagen rechnen mit today()); mit anstehenden Flash-Meldungen kein 304
+        max_age: Sekunden, die der Browser ohne Nachfrage wiederverwenden darf
+            (ohne Angabe: no-cache, d.h. vor jeder Verwendung per ETag nachfragen)
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or (html and session.get('_flashes')):
+                return view(*args, **kwargs)
+
+            parts = [request.endpoint, sorted(kwargs.items())]
+            parts += [(name, request.args.getlist(name)) for name in query_args]
+            if html:
+                parts += [session.get('login_admin_id'), date.today()]
+            etag = version_etag(entities, *parts)
+            last_modified = version_last_modified(entities)
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)  # gzip-Antworten haben W/-ETags
+            else:
+                # If-Modified-Since nur ohne If-None-Match (RFC 9110) und nicht für HTML (Benutzer/Tag)
+                not_modified = bool(
+                    not html and last_modified and request.if_modified_since
+                    and last_modified <= request.if_modified_since
+                )
+            record_cache_lookup(f'http.{request.endpoint}', not_modified)
+
+            if not_modified:
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response  # Fehler und Weiterleitungen nicht cachen
+
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified
+            response.cache_control.private = True
+            if max_age:
+                response.cache_control.max_age = max_age
+            else:
+                response.cache_control.no_cache = True
+            response.vary.add('Cookie')
+            return response
+        return wrapper
+    return decorator
+
+
+# ===============================
+# STATISCHE DATEIEN (FINGERPRINT-URLS)
+# ===============================
+
+_static_hashes = {}  # Pfad -> (mtime, Größe, Hash)
+_static_lock = threading.Lock()
+
+
+def static_file_hash(filename):
+    """Inhalts-Hash einer statischen Datei (None, wenn es sie nicht gibt); neu berechnet nur bei Änderung"""
+    path = safe_join(current_app.static_folder, filename)
+    try:
+        stat = os.stat(path) if path else None
+    except OSError:
+        stat = None
+    if stat is None or not os.path.isfile(path):
+        return None
+    entry = _static_hashes.get(path)
+    if entry and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+        return entry[2]
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(65536), b''):
+            digest.update(chunk)
+    value = digest.hexdigest()[:12]
+    with _static_lock:
+        _static_hashes[path] = (stat.st_mtime_ns, stat.st_size, value)
+    return value
+
+
+def _add_static_fingerprint(endpoint, values):
+    """url_defaults: url_for('static', filename=...) bekommt ?v=<Inhalts-Hash>"""
+    if endpoint == 'static' and 'filename' in values and 'v' not in values:
+        digest = static_file_hash(values['filename'])
+        if digest:
+            values['v'] = digest
+
+
+def _cache_static_files(response):
+    """after_request: Fingerprint-URLs mit passendem Hash lange cachen"""
+    if request.endpoint != 'static' or response.status_code not in (200, 304):
+        return response
+    version = request.args.get('v')
+    if version and version == static_file_hash(request.view_args.get('filename', '')):
+        response.cache_control.no_cache = None
+        response.cache_control.max_age = current_app.config['STATIC_MAX_AGE']
+        response.cache_control.immutable = True
+        # Hochgeladene Fotos und Pläne gehören zu Kundenprojekten - nur im Browser speichern
+        if request.view_args['filename'].startswith('uploads/'):
+            response.cache_control.private = True
+        else:
+            response.cache_control.public = True
+    return response
+
+
+def init_static_fingerprints(app):
+    """Registriert Fingerprint-URLs und langes Caching für statische Dateien"""
+    app.url_defaults(_add_static_fingerprint)
+    app.after_request(_cache_static_files)
@@ -12,8 +12,12 @@ from reportlab.platypus import Image
 from io import BytesIO
 from datetime import datetime
 import os
+import logging
 from models import CompanySettings
 from utils import format_currency_de, format_number_de, get_customer_manager_contact
+from metrics import track_pdf_render
+
+logger = logging.getLogger(__name__)
 
 class InvoicePDFGenerator:
     def __init__(self):
@@ -34,9 +38,10 @@ class InvoicePDFGenerator:
                 logo_height = logo_width / 2.81  # Berechne Höhe basierend auf Original-Seitenverhältnis
                 self.logo_element = Image(self.logo_path, width=logo_width, height=logo_height)
             except Exception as e:
-                print(f"Fehler beim Laden des Logos: {e}")
+                logger.warning("Fehler beim Laden des Logos: %s", e)
                 self.logo_element = None
         
+    @track_pdf_render('rechnung')
     def generate_invoice_pdf(self, invoice):
         """Generiert eine PDF-Rechnung"""
         buffer = BytesIO()
@@ -62,7 +67,7 @@ class InvoicePDFGenerator:
             return buffer
             
         except Exception as e:
-            print(f"Fehler bei PDF-Generierung: {e}")
+            logger.exception("Fehler bei PDF-Generierung")
             # Fallback: Leeres PDF mit Fehlermeldung
             c = canvas.Canvas(buffer, pagesize=A4)
             c.drawString(100, 750, f"Fehler bei der PDF-Generierung: {str(e)}")
@@ -78,7 +83,7 @@ class InvoicePDFGenerator:
                 # Logo direkt als Image-Element zeichnen
                 self.logo_element.drawOn(c, self.margin, self.height - 3*cm)
             except Exception as e:
-                print(f"Fehler beim Zeichnen des Logos: {e}")
+                logger.warning("Fehler beim Zeichnen des Logos: %s", e)
         
         # Zahlungsinfos oben rechts in Schriftgröße 9
         c.setFont("Helvetica", 9)
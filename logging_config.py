@@ -0,0 +1,152 @@
+"""
+Logging-Konfiguration für die InstallationApp
+Nicht-blockierendes Logging über QueueHandler/QueueListener: der Request-Thread legt
+Log-Records nur in eine Queue, geschrieben wird in einem eigenen Listener-Thread.
+
+Umgebungsvariablen:
+    LOG_LEVEL   Standard-Level (Standard: INFO)
+    LOG_LEVELS  Level pro Modul, z.B. "backup_system=DEBUG,invoices=WARNING"
+    LOG_FORMAT  "json" (strukturiert, Standard auf Railway) oder "text"
+"""
+import os
+import sys
+import json
+import uuid
+import queue
+import atexit
+import logging
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+
+# Felder, die jeder LogRecord besitzt - alles andere stammt aus extra={...}
+_RESERVED_ATTRS = set(logging.LogRecord('', 0, '', 0, '', (), None).__dict__) | {'message', 'asctime', 'request_id'}
+
+# Standard-Level für gesprächige Bibliotheken (per LOG_LEVELS überschreibbar)
+DEFAULT_MODULE_LEVELS = {
+    'alembic': 'WARNING',
+}
+
+_log_queue = None
+_output_handlers = []  # Handler, die im Listener-Thread schreiben
+_listener = None
+_listener_pid = None  # Prozess, in dem der Listener-Thread läuft
+
+
+class RequestIdFilter(logging.Filter):
+    """Hängt die Request-ID des aktuellen Requests an jeden Log-Record"""
+
+    def filter(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = g.get('request_id', '-') if has_request_context() else '-'
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatiert Log-Records als einzeilige JSON-Objekte"""
+
+    def format(self, record):
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', '-'),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _parse_module_levels(value):
+    """Zerlegt "modul=LEVEL,modul2=LEVEL" in ein Dictionary"""
+    levels = {}
+    for part in (value or '').split(','):
+        if '=' in part:
+            name, level = part.split('=', 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def _start_listener():
+    """Startet den Listener-Thread, der die Queue abarbeitet (einer pro Prozess)"""
+    global _listener, _listener_pid
+    _listener = QueueListener(_log_queue, *_output_handlers, respect_handler_level=True)
+    _listener.start()
+    _listener_pid = os.getpid()
+
+
+def _stop_listener():
+    """Schreibt beim Beenden die restlichen Records (nur im Prozess, dem der Thread gehört)"""
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+
+
+def setup_logging():
+    """Richtet das Queue-basierte Logging einmalig pro Prozess ein"""
+    global _log_queue
+    if _listener is not None:
+        # Threads überleben kein fork (z.B. gunicorn preload_app): im Kindprozess neu starten
+        if _listener_pid != os.getpid():
+            _start_listener()
+        return
+
+    log_format = os.environ.get('LOG_FORMAT') or ('json' if os.environ.get('DATABASE_URL') else 'text')
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if log_format == 'json':
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(
+            '%(asctime)s %(levelname)-7s [%(request_id)s] %(name)s: %(message)s'
+        ))
+
+    _log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(_log_queue)
+    # Filter läuft im aufrufenden Thread, dort ist der Request-Kontext noch verfügbar
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+
+    module_levels = dict(DEFAULT_MODULE_LEVELS)
+    module_levels.update(_parse_module_levels(os.environ.get('LOG_LEVELS')))
+    for module_name, level in module_levels.items():
+        logging.getLogger(module_name).setLevel(level)
+
+    _output_handlers.append(stream_handler)
+    _start_listener()
+    atexit.register(_stop_listener)
+    os.register_at_fork(after_in_child=setup_logging)
+
+
+def add_log_handler(handler, logger_name):
+    """
+    Zusätzlicher Ausgabe-Handler (z.B. Log-Datei) für die Records eines Loggers.
+    Schreibt im Listener-Thread, die Records laufen wie alle anderen über die Queue.
+    """
+    handler.addFilter(logging.Filter(logger_name))
+    if _listener is None:
+        # Logging nicht eingerichtet (z.B. Skripte): direkt am Logger schreiben
+        logging.getLogger(logger_name).addHandler(handler)
+        return
+    _output_handlers.append(handler)
+    _listener.handlers = tuple(_output_handlers)
+
+
+def init_request_logging(app):
+    """Vergibt pro Request eine Request-ID (übernimmt X-Request-ID vom Proxy)"""
+
+    @app.before_request
+    def assign_request_id():
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex[:12]
+
+    @app.after_request
+    def add_request_id_header(response):
+        if 'request_id' in g:
+            response.headers['X-Request-ID'] = g.request_id
+        return response
@@ -0,0 +1,388 @@
+"""
+Warteschlange für ausgehende E-Mails (Lieferantenbestellungen)
+Requests legen E-Mails nur in der Tabelle outbound_email ab, verschickt wird im Hintergrund:
+    - fällige E-Mails werden blockweise übernommen (Status 'Wird gesendet'; auf PostgreSQL mit
+      FOR UPDATE SKIP LOCKED, damit sich mehrere gunicorn-Worker nicht in die Quere kommen)
+    - ein Block wird über eine einzige SMTP-Verbindung verschickt
+    - vorübergehende Fehler: neuer Versuch nach MAIL_RETRY_DELAY × 2^(Versuch-1) Sekunden,
+      bis MAIL_MAX_ATTEMPTS erreicht ist; dauerhafte Fehler (5xx, abgelehnte Empfänger) sofort
+    - das Ergebnis wird in die zugehörigen Lieferantenbestellungen geschrieben
+      (gesendet: Status 'Bestellt', email_status 'Gesendet' - sonst 'Fehlgeschlagen')
+    - gesendete und fehlgeschlagene E-Mails werden nach MAIL_RETENTION_DAYS Tagen gelöscht
+
+Ausführung:
+    - im Hintergrund-Thread alle MAIL_QUEUE_INTERVAL Sekunden und direkt nach dem Einreihen (0 = aus)
+    - manuell per "flask --app app send-queued-emails" bzw. "flask --app app purge-outbound-emails"
+
+Lokal testen: python smtp_test_server.py starten und
+SMTP_HOST=localhost SMTP_PORT=1025 SMTP_USE_TLS=0 setzen.
+"""
+import time
+import smtplib
+import logging
+import threading
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid
+
+from flask import current_app
+from sqlalchemy import case, or_
+
+from metrics import record_email_result
+
+logger = logging.getLogger(__name__)
+
+# Erster Lauf kurz nach dem Start, damit die DB-Initialisierung abgeschlossen ist
+STARTUP_DELAY = 10
+
+# Übernommene E-Mails gelten nach dieser Zeit wieder als fällig (z.B. nach Absturz eines Workers)
+LOCK_TIMEOUT = timedelta(minutes=10)
+
+# Alte E-Mails löscht der Hintergrund-Versand höchstens einmal in diesem Abstand
+PURGE_INTERVAL = timedelta(hours=1)
+
+EMAIL_STATUS_QUEUED = 'In Warteschlange'
+EMAIL_STATUS_SENT = 'Gesendet'
+EMAIL_STATUS_FAILED = 'Fehlgeschlagen'
+
+_sender_thread = None
+_wakeup = threading.Event()
+_last_purge = None
+
+
+def mail_enabled():
+    """E-Mails werden nur verschickt, wenn ein SMTP-Server konfiguriert ist"""
+    return bool(current_app.config.get('SMTP_HOST'))
+
+
+# ===============================
+# EINREIHEN
+# ===============================
+
+def enqueue_email(recipient, subject, plain_body, html_body=None, supplier_order_ids=()):
+    """
+    Reiht eine E-Mail ein und markiert die Bestellungen als 'In Warteschlange'. Der Aufrufer committet.
+    ValueError, wenn eine der Bestellungen bereits in der Warteschlange steht (Aufrufer rollt zurück).
+    """
+    from models import db, OutboundEmail, SupplierOrder
+
+    supplier_order_ids = list(supplier_order_ids)
+    if supplier_order_ids:
+        # Bedingtes UPDATE statt vorheriger Prüfung: von zwei gleichzeitigen Requests
+        # übernimmt nur einer die Bestellungen, der andere trifft keine Zeile mehr
+        claimed = SupplierOrder.query.filter(
+            SupplierOrder.id.in_(supplier_order_ids),
+            or_(SupplierOrder.email_status.is_(None), SupplierOrder.email_status != EMAIL_STATUS_QUEUED),
+        ).update({SupplierOrder.email_status: EMAIL_STATUS_QUEUED}, synchronize_session=False)
+        if claimed != len(set(supplier_order_ids)):
+            raise ValueError('Die Bestellung wird bereits per E-Mail verschickt')
+    email = OutboundEmail(
+        recipient=recipient,
+        subject=subject,
+        plain_body=plain_body,
+        html_body=html_body,
+        supplier_order_ids=supplier_order_ids,
+        status=OutboundEmail.STATUS_PENDING,
+        attempts=0,
+        next_attempt_at=datetime.utcnow(),
+    )
+    db.session.add(email)
+    return email
+
+
+def enqueue_supplier_order_email(supplier_name, supplier_orders):
+    """
+    Reiht die Bestell-E-Mail für eine oder mehrere Bestellungen eines Lieferanten ein
+    (mehrere = Sammelbestellung). ValueError, wenn keine E-Mail-Adresse hinterlegt ist.
+    """
+    from purchasing import generate_purchase_run_email
+    from utils import get_supplier_email
+
+    recipient = get_supplier_email(supplier_name)
+    if not recipient:
+        raise ValueError(f'Für {supplier_name} ist keine E-Mail-Adresse hinterlegt')
+    subject, html_body, plain_body = generate_purchase_run_email(supplier_name, supplier_orders)
+    return enqueue_email(
+        recipient, subject, plain_body, html_body,
+        supplier_order_ids=[supplier_order.id for supplier_order in supplier_orders]
+    )
+
+
+def wake_mail_sender():
+    """Weckt den Hintergrund-Versand (nach dem Commit aufrufen)"""
+    _wakeup.set()
+
+
+# ===============================
+# VERSAND
+# ===============================
+
+def _connect(config):
+    """Öffnet eine SMTP-Verbindung (SMTPS oder SMTP mit optionalem STARTTLS) und meldet sich an"""
+    host, port, timeout = config['SMTP_HOST'], config.get('SMTP_PORT', 587), config.get('SMTP_TIMEOUT', 30)
+    if config.get('SMTP_USE_SSL'):
+        smtp = smtplib.SMTP_SSL(host, port, timeout=timeout)
+    else:
+        smtp = smtplib.SMTP(host, port, timeout=timeout)
+        if config.get('SMTP_USE_TLS'):
+            smtp.starttls()
+    if config.get('SMTP_USERNAME'):
+        smtp.login(config['SMTP_USERNAME'], config.get('SMTP_PASSWORD') or '')
+    return smtp
+
+
+def _build_message(email, sender):
+    """MIME-Nachricht mit Text- und (falls vorhanden) HTML-Teil"""
+    message = EmailMessage()
+    message['Subject'] = email['subject']
+    message['From'] = sender
+    message['To'] = email['recipient']
+    message['Date'] = formatdate(localtime=True)
+    message['Message-ID'] = make_msgid(domain=sender.rpartition('@')[2] or None)
+    message.set_content(email['plain_body'])
+    if email['html_body']:
+        # Der HTML-Text der Bestell-E-Mails nutzt Zeilenumbrüche wie die Vorschau (white-space: pre-line)
+        message.add_alternative(
+            '<html><body><div style="white-space: pre-line; font-family: Arial, sans-serif;">'
+            f"{email['html_body']}</div></body></html>",
+            subtype='html'
+        )
+    return message
+
+
+def _claim_batch(batch_size):
+    """Übernimmt fällige E-Mails zum Versand (committet) und gibt ihre Daten zurück"""
+    from models import db, OutboundEmail
+
+    now = datetime.utcnow()
+    query = OutboundEmail.query.filter(
+        OutboundEmail.status.in_([OutboundEmail.STATUS_PENDING, OutboundEmail.STATUS_SENDING]),
+        OutboundEmail.next_attempt_at <= now,
+    ).order_by(OutboundEmail.next_attempt_at, OutboundEmail.id).limit(batch_size)
+    if db.engine.dialect.name == 'postgresql':
+        query = query.with_for_update(skip_locked=True)
+
+    batch = []
+    for email in query.all():
+        email.status = OutboundEmail.STATUS_SENDING
+        email.next_attempt_at = now + LOCK_TIMEOUT
+        email.attempts = (email.attempts or 0) + 1
+        batch.append({
+            'id': email.id,
+            'recipient': email.recipient,
+            'subject': email.subject,
+            'plain_body': email.plain_body,
+            'html_body': email.html_body,
+            'supplier_order_ids': list(email.supplier_order_ids or []),
+            'attempts': email.attempts,
+        })
+    db.session.commit()
+    return batch
+
+
+def _reset(smtp):
+    """Setzt die Verbindung nach einer abgelehnten E-Mail zurück (None, wenn sie unbrauchbar ist)"""
+    try:
+        smtp.rset()
+        return smtp
+    except (smtplib.SMTPException, OSError):
+        smtp.close()
+        return None
+
+
+def _send_batch(batch, config):
+    """Verschickt einen Block über eine SMTP-Verbindung; gibt (E-Mail, Fehler, dauerhaft) pro E-Mail zurück"""
+    sender = config.get('MAIL_DEFAULT_SENDER') or 'bestellung@innsan.at'
+    outcomes = []
+    smtp = None
+    try:
+        for index, email in enumerate(batch):
+            if smtp is None:
+                try:
+                    smtp = _connect(config)
+                except (smtplib.SMTPException, OSError) as e:
+                    # Server nicht erreichbar bzw. Anmeldung fehlgeschlagen - Rest des Blocks später erneut
+                    outcomes.extend((rest, f'Verbindung fehlgeschlagen: {e}', False) for rest in batch[index:])
+                    break
+            try:
+                smtp.send_message(_build_message(email, sender))
+                outcomes.append((email, None, False))
+            except smtplib.SMTPRecipientsRefused as e:
+                outcomes.append((email, f'Empfänger abgelehnt: {e.recipients}', True))
+                smtp = _reset(smtp)
+            except smtplib.SMTPServerDisconnected as e:
+                outcomes.append((email, str(e), False))
+                smtp = None  # nächste E-Mail mit neuer Verbindung
+            except smtplib.SMTPResponseException as e:
+                outcomes.append((email, f'{e.smtp_code} {e.smtp_error!r}', e.smtp_code >= 500))
+                smtp = _reset(smtp)
+            except (smtplib.SMTPException, OSError) as e:
+                outcomes.append((email, str(e), False))
+                smtp.close()
+                smtp = None
+    finally:
+        if smtp is not None:
+            try:
+                smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                smtp.close()
+    return outcomes
+
+
+def _record_outcomes(outcomes, config):
+    """Schreibt die Ergebnisse in die Warteschlange und die Lieferantenbestellungen (ein Commit)"""
+    from models import db, OutboundEmail, SupplierOrder
+    from purchasing import STATUS_OPEN, STATUS_ORDERED
+
+    now = datetime.utcnow()
+    max_attempts = config.get('MAIL_MAX_ATTEMPTS', 5)
+    retry_delay = config.get('MAIL_RETRY_DELAY', 60)
+    mappings = []
+    sent_order_ids = []
+    failed_order_ids = []
+    results = {'sent': 0, 'retry': 0, 'failed': 0}
+    for email, error, permanent in outcomes:
+        if error is None:
+            result = 'sent'
+            mappings.append({'id': email['id'], 'status': OutboundEmail.STATUS_SENT, 'sent_at': now, 'last_error': None})
+            sent_order_ids.extend(email['supplier_order_ids'])
+        elif permanent or email['attempts'] >= max_attempts:
+            result = 'failed'
+            mappings.append({'id': email['id'], 'status': OutboundEmail.STATUS_FAILED, 'last_error': error})
+            failed_order_ids.extend(email['supplier_order_ids'])
+            logger.warning("E-Mail an %s endgültig fehlgeschlagen: %s", email['recipient'], error)
+        else:
+            result = 'retry'
+            mappings.append({
+                'id': email['id'],
+                'status': OutboundEmail.STATUS_PENDING,
+                'next_attempt_at': now + timedelta(seconds=retry_delay * 2 ** (email['attempts'] - 1)),
+                'last_error': error,
+            })
+            logger.info("E-Mail an %s wird erneut versucht (Versuch %d): %s",
+                        email['recipient'], email['attempts'], error)
+        results[result] += 1
+        record_email_result(result)
+
+    if mappings:
+        db.session.bulk_update_mappings(OutboundEmail, mappings)
+    if sent_order_ids:
+        # Nur offene Bestellungen wechseln auf 'Bestellt' - bereits bestätigte/gelieferte bleiben
+        SupplierOrder.query.filter(SupplierOrder.id.in_(sent_order_ids)).update({
+            SupplierOrder.email_status: EMAIL_STATUS_SENT,
+            SupplierOrder.status: case(
+                (SupplierOrder.status == STATUS_OPEN, STATUS_ORDERED), else_=SupplierOrder.status
+            ),
+        }, synchronize_session=False)
+    if failed_order_ids:
+        SupplierOrder.query.filter(SupplierOrder.id.in_(failed_order_ids)).update(
+            {SupplierOrder.email_status: EMAIL_STATUS_FAILED}, synchronize_session=False
+        )
+    db.session.commit()
+    return results
+
+
+def send_queued_emails():
+    """Verschickt alle fälligen E-Mails blockweise; gibt {'sent', 'retry', 'failed'} zurück"""
+    from models import db
+
+    config = current_app.config
+    totals = {'sent': 0, 'retry': 0, 'failed': 0}
+    if not config.get('SMTP_HOST'):
+        return totals
+    batch_size = config.get('MAIL_QUEUE_BATCH_SIZE', 50)
+    try:
+        while True:
+            batch = _claim_batch(batch_size)
+            if not batch:
+                break
+            results = _record_outcomes(_send_batch(batch, config), config)
+            for key, count in results.items():
+                totals[key] += count
+            if len(batch) < batch_size:
+                break
+    except Exception:
+        db.session.rollback()
+        logger.exception("Versand der E-Mail-Warteschlange fehlgeschlagen")
+        raise
+    if any(totals.values()):
+        logger.info("E-Mail-Warteschlange: %d gesendet, %d erneut, %d fehlgeschlagen",
+                    totals['sent'], totals['retry'], totals['failed'], extra={'outbound_emails': totals})
+    return totals
+
+
+def purge_old_emails():
+    """Löscht gesendete und fehlgeschlagene E-Mails älter als MAIL_RETENTION_DAYS; gibt die Anzahl zurück"""
+    from models import db, OutboundEmail
+
+    retention_days = current_app.config.get('MAIL_RETENTION_DAYS', 30)
+    if retention_days <= 0:
+        return 0
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    try:
+        count = OutboundEmail.query.filter(
+            OutboundEmail.status.in_([OutboundEmail.STATUS_SENT, OutboundEmail.STATUS_FAILED]),
+            OutboundEmail.created_at < cutoff,
+        ).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        logger.exception("Aufräumen der E-Mail-Warteschlange fehlgeschlagen")
+        raise
+    if count:
+        logger.info("E-Mail-Warteschlange: %d alte E-Mails gelöscht", count)
+    return count
+
+
+# ===============================
+# HINTERGRUND-VERSAND
+# ===============================
+
+def _sender_loop(app, interval):
+    """Verschickt fällige E-Mails in festen Abständen bzw. nach dem Wecken (läuft als Daemon-Thread)"""
+    global _last_purge
+    time.sleep(STARTUP_DELAY)
+    while True:
+        _wakeup.clear()
+        try:
+            with app.app_context():
+                send_queued_emails()
+                if _last_purge is None or datetime.utcnow() - _last_purge >= PURGE_INTERVAL:
+                    _last_purge = datetime.utcnow()
+                    purge_old_emails()
+        except Exception:
+            # Fehler sind bereits geloggt - beim nächsten Durchlauf erneut versuchen
+            pass
+        _wakeup.wait(interval)
+
+
+def init_mail_queue(app):
+    """Registriert den CLI-Befehl und startet den Hintergrund-Versand"""
+
+    @app.cli.command('send-queued-emails')
+    def send_queued_emails_command():
+        """Fällige E-Mails der Warteschlange einmalig verschicken"""
+        results = send_queued_emails()
+        print(f"{results['sent']} gesendet, {results['retry']} erneut eingeplant, {results['failed']} fehlgeschlagen")
+
+    @app.cli.command('purge-outbound-emails')
+    def purge_outbound_emails_command():
+        """Gesendete und fehlgeschlagene E-Mails älter als MAIL_RETENTION_DAYS löschen"""
+        print(f"{purge_old_emails()} E-Mails gelöscht")
+
+    # Bei gunicorn mit preload_app erst im Worker nach dem Fork (siehe worker_startup.py)
+    if not app.config.get('PRELOAD_APP'):
+        start_mail_sender(app)
+
+
+def start_mail_sender(app):
+    """Startet den Hintergrund-Versand als Daemon-Thread (einmal pro Prozess)"""
+    global _sender_thread
+    interval = app.config.get('MAIL_QUEUE_INTERVAL', 0)
+    if interval <= 0 or not app.config.get('SMTP_HOST') or app.config.get('TESTING') or _sender_thread is not None:
+        return
+    _sender_thread = threading.Thread(
+        target=_sender_loop, args=(app, interval),
+        name='mail-queue-sender', daemon=True,
+    )
+    _sender_thread.start()
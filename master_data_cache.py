@@ -0,0 +1,317 @@
+"""
+Stammdaten-Cache für Lieferanten, Positionsvorlagen, Akquisekanäle, Artikel und Arbeitsschritte
+Die Daten ändern sich selten, werden aber auf vielen Seiten für Dropdowns und Listen gebraucht.
+
+Jeder Worker hält die Listen als einfache Objekte (ohne Session-Bindung) im Speicher.
+Gültigkeit über Versionszähler in der Tabelle master_data_version:
+    - jede Änderung (Insert/Update/Delete, auch Bulk) erhöht beim Flush die Version der
+      betroffenen Art - in derselben Transaktion wie die Änderung selbst
+    - pro Request werden alle Versionen einmal gelesen (eine kleine Abfrage); weicht die
+      Version vom Cache-Eintrag ab, wird die Liste neu geladen
+So sehen alle gunicorn-Worker eine Änderung sofort nach dem Commit.
+
+Dieselben Zähler gibt es auch für Bewegungsdaten (Kunden, Angebote, Aufträge, Rechnungen,
+Einstellungen, siehe CHANGE_TRACKED_MODELS). Die werden nicht gecacht, dienen aber als
+Versionsstempel für bedingte GET-Anfragen (http_cache.py) - und für den Textbaustein-Cache in models.py.
+"""
+import hashlib
+import threading
+from types import SimpleNamespace
+
+from flask import g, has_request_context
+from sqlalchemy import event, func, update
+from sqlalchemy.orm import Session, selectinload
+
+from metrics import record_cache_lookup
+from models import (
+    db, MasterDataVersion, Supplier, PositionTemplate, PositionTemplateSubItem,
+    AcquisitionChannel, Article, WorkStep, Customer, Quote, QuoteItem, QuoteSubItem,
+    QuoteRejection, QuoteSnapshot, Order, WorkInstruction, SupplierOrder, SupplierOrderItem,
+    Invoice, InvoicePosition, InvoiceReminder, CompanySettings, TextBlock
+)
+
+# Stammdaten-Art -> Modelle, deren Änderungen die Art ungültig machen
+MASTER_DATA_MODELS = {
+    'supplier': (Supplier,),
+    'position_template': (PositionTemplate, PositionTemplateSubItem),
+    'acquisition_channel': (AcquisitionChannel,),
+    'article': (Article,),
+    'work_step': (WorkStep,),
+}
+# Bewegungsdaten: nur Versionsstempel (ETag/Last-Modified), kein Cache.
+# Ein Zähler pro Gruppe - Bulk-Updates (Query.update, Core-Inserts) ändern keine Zeitstempel pro Zeile.
+CHANGE_TRACKED_MODELS = {
+    'customer': (Customer,),
+    'quote': (Quote, QuoteItem, QuoteSubItem, QuoteRejection, QuoteSnapshot),
+    'order': (Order, WorkInstruction, SupplierOrder, SupplierOrderItem),
+    'invoice': (Invoice, InvoicePosition, InvoiceReminder),
+    'company_settings': (CompanySettings,),
+    'text_block': (TextBlock,),  # Gültigkeit des Textbaustein-Caches (models.TextBlock.get_content)
+}
+_ENTITY_BY_MODEL = {
+    model: entity
+    for groups in (MASTER_DATA_MODELS, CHANGE_TRACKED_MODELS)
+    for entity, models in groups.items()
+    for model in models
+}
+_ENTITY_BY_TABLE = {model.__table__: entity for model, entity in _ENTITY_BY_MODEL.items()}
+
+_cache = {}  # (Art, Schlüssel) -> (Version, Wert)
+_lock = threading.Lock()
+
+
+def _snapshot(instance, **extra):
+    """Kopie aller Spaltenwerte als einfaches Objekt (unabhängig von der DB-Session)"""
+    values = {column.key: getattr(instance, column.key) for column in instance.__mapper__.column_attrs}
+    values.update(extra)
+    return SimpleNamespace(**values)
+
+
+def _load_version_stamps():
+    """Aktuelle Versionen aller Arten mit Zeitpunkt der letzten Änderung: {Art: (Version, updated_at)}"""
+    return {
+        entity: (version, updated_at)
+        for entity, version, updated_at in db.session.query(
+            MasterDataVersion.entity, MasterDataVersion.version, MasterDataVersion.updated_at
+        )
+    }
+
+
+def get_version_stamps():
+    """Versionen samt Änderungszeitpunkt - innerhalb eines Requests nur einmal aus der DB gelesen"""
+    if not has_request_context():
+        return _load_version_stamps()
+    if 'master_data_stamps' not in g:
+        g.master_data_stamps = _load_version_stamps()
+        g.master_data_versions = {entity: version for entity, (version, _) in g.master_data_stamps.items()}
+    return g.master_data_stamps
+
+
+def get_versions():
+    """Versionen aller Arten: {Art: Version}"""
+    if not has_request_context():
+        return {entity: version for entity, (version, _) in _load_version_stamps().items()}
+    get_version_stamps()
+    return g.master_data_versions
+
+
+def _cached(entity, key, loader):
+    """Liefert den Cache-Eintrag oder lädt ihn neu, wenn sich die Version geändert hat
+    
+    None (nicht gefunden) wird nicht gecacht - sonst legt jede unbekannte ID einen Eintrag an.
+    """
+    version = get_versions().get(entity, 0)
+    entry = _cache.get((entity, key))
+    hit = entry is not None and entry[0] == version
+    record_cache_lookup(f'master_data.{entity}', hit)
+    if hit:
+        return entry[1]
+    value = loader()
+    if value is None:
+        return None
+    with _lock:
+        # Einträge älterer Versionen derselben Art verwerfen (z.B. gelöschte Vorlagen)
+        for cache_key in [k for k, (v, _) in _cache.items() if k[0] == entity and v != version]:
+            del _cache[cache_key]
+        _cache[(entity, key)] = (version, value)
+    return value
+
+
+# ===============================
+# ZUGRIFFSFUNKTIONEN
+# ===============================
+
+def get_suppliers():
+    """Alle Lieferanten, alphabetisch sortiert"""
+    return _cached('supplier', 'all', lambda: [
+        _snapshot(supplier) for supplier in Supplier.query.order_by(Supplier.name).all()
+    ])
+
+
+def get_supplier_categories():
+    """Alle verwendeten Lieferanten-Kategorien"""
+    return _cached('supplier', 'categories', lambda: sorted({
+        supplier.category for supplier in get_suppliers() if supplier.category
+    }))
+
+
+def get_supplier_email(supplier_name):
+    """E-Mail-Adresse eines Lieferanten (Nachschlagen per Name in O(1))"""
+    emails = _cached('supplier', 'email_by_name', lambda: {
+        supplier.name: supplier.email for supplier in reversed(get_suppliers()) if supplier.email
+    })
+    return emails.get(supplier_name)
+
+
+def get_position_templates():
+    """Alle Positionsvorlagen samt Unterpositionen, sortiert nach Reihenfolge"""
+    def load():
+        templates = PositionTemplate.query.options(
+            selectinload(PositionTemplate.subitems)
+        ).order_by(PositionTemplate.sort_order, PositionTemplate.id).all()
+        return [
+            _snapshot(template, subitems=[_snapshot(subitem) for subitem in template.subitems])
+            for template in templates
+        ]
+    return _cached('position_template', 'all', load)
+
+
+# Kalkulationsfelder einer Positionsvorlage (Reihenfolge wie im Formular)
+TEMPLATE_CALC_FIELDS = ('length', 'width', 'height', 'area', 'volume')
+
+
+def get_position_template_catalog():
+    """Schlanke Übersicht aller Positionsvorlagen für den Vorlagen-Katalog (ohne Unterpositionen)"""
+    def load():
+        subitem_stats = db.session.query(
+            PositionTemplateSubItem.template_id.label('template_id'),
+            func.count(PositionTemplateSubItem.id).label('subitem_count'),
+            func.sum(PositionTemplateSubItem.price_per_unit).label('base_price'),
+        ).group_by(PositionTemplateSubItem.template_id).subquery()
+        rows = db.session.query(
+            PositionTemplate, subitem_stats.c.subitem_count, subitem_stats.c.base_price
+        ).outerjoin(
+            subitem_stats, subitem_stats.c.template_id == PositionTemplate.id
+        ).order_by(PositionTemplate.sort_order, PositionTemplate.id).all()
+        return [{
+            'id': template.id,
+            'name': template.name,
+            'description': template.description or '',
+            'calc_fields': [field for field in TEMPLATE_CALC_FIELDS if getattr(template, f'enable_{field}')],
+            'subitem_count': subitem_count or 0,
+            'base_price': round(base_price or 0, 2),
+        } for template, subitem_count, base_price in rows]
+    return _cached('position_template', 'catalog', load)
+
+
+def get_position_template(template_id):
+    """Eine Positionsvorlage samt Unterpositionen (None, wenn es sie nicht gibt)"""
+    def load():
+        template = PositionTemplate.query.options(
+            selectinload(PositionTemplate.subitems)
+        ).filter_by(id=template_id).first()
+        if template is None:
+            return None
+        return _snapshot(template, subitems=[_snapshot(subitem) for subitem in template.subitems])
+    return _cached('position_template', ('detail', template_id), load)
+
+
+def get_acquisition_channels(active_only=False):
+    """Akquisekanäle (optional nur aktive)"""
+    channels = _cached('acquisition_channel', 'all', lambda: [
+        _snapshot(channel) for channel in AcquisitionChannel.query.order_by(AcquisitionChannel.id).all()
+    ])
+    if active_only:
+        return [channel for channel in channels if channel.is_active]
+    return channels
+
+
+def get_articles():
+    """Alle Artikel, alphabetisch sortiert"""
+    return _cached('article', 'all', lambda: [
+        _snapshot(article) for article in Article.query.order_by(Article.name).all()
+    ])
+
+
+def get_work_step_catalog():
+    """
+    Arbeitsschritte-Katalog: {'by_category': {Kategorie: [{'name', 'default_hours'}, ...]},
+    'by_key': {(Kategorie, Name): Arbeitsschritt}} - Nachschlagen per Kategorie und Name in O(1)
+    """
+    def load():
+        rows = db.session.query(WorkStep.category, WorkStep.name, WorkStep.default_hours).order_by(
+            WorkStep.category_order, WorkStep.category, WorkStep.sort_order, WorkStep.id
+        ).all()
+        by_category = {}
+        if rows:
+            for category, name, default_hours in rows:
+                by_category.setdefault(category, []).append({'name': name, 'default_hours': default_hours})
+        elif get_versions().get('work_step', 0) == 0:
+            # Katalog wurde noch nie gespeichert (z.B. neue lokale Datenbank): Ausgangsbestand
+            from work_steps import DEFAULT_WORK_STEPS
+            by_category = {category: [dict(step) for step in steps] for category, steps in DEFAULT_WORK_STEPS.items()}
+        by_key = {}
+        for category, steps in by_category.items():
+            for step in steps:
+                by_key.setdefault((category, step['name']), step)  # bei doppelten Namen gilt der erste
+        return {'by_category': by_category, 'by_key': by_key}
+    return _cached('work_step', 'catalog', load)
+
+
+def master_data_etag(entity, *parts):
+    """ETag für Antworten, die nur von einer Stammdaten-Art (und den übergebenen Parametern) abhängen"""
+    raw = ':'.join(str(part) for part in (entity, get_versions().get(entity, 0)) + parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:20]
+
+
+# ===============================
+# INVALIDIERUNG
+# ===============================
+
+def _bump_versions(session, entities):
+    """Erhöht die Versionen der geänderten Arten in der laufenden Transaktion"""
+    connection = session.connection()
+    for entity in entities:
+        result = connection.execute(
+            update(MasterDataVersion.__table__)
+            .where(MasterDataVersion.__table__.c.entity == entity)
+            .values(version=MasterDataVersion.__table__.c.version + 1)
+        )
+        if result.rowcount == 0:
+            connection.execute(MasterDataVersion.__table__.insert().values(entity=entity, version=1))
+    # Gilt auch für den restlichen Request: Versionen beim nächsten Zugriff neu lesen
+    if has_request_context():
+        g.pop('master_data_stamps', None)
+        g.pop('master_data_versions', None)
+
+
+def _invalidate_after_flush(session, flush_context):
+    """Insert/Update/Delete von Stammdaten erhöht die Version der betroffenen Art"""
+    entities = set()
+    for instance in list(session.new) + list(session.deleted):
+        entity = _ENTITY_BY_MODEL.get(type(instance))
+        if entity:
+            entities.add(entity)
+    for instance in session.dirty:
+        entity = _ENTITY_BY_MODEL.get(type(instance))
+        if entity and session.is_modified(instance, include_collections=False):
+            entities.add(entity)
+    if entities:
+        _bump_versions(session, entities)
+
+
+def _invalidate_after_bulk_update(update_context):
+    """Query.update() auf Stammdaten (ohne getroffene Zeilen keine neue Version)"""
+    entity = _ENTITY_BY_MODEL.get(update_context.mapper.class_)
+    if entity and update_context.result.rowcount != 0:
+        _bump_versions(update_context.session, {entity})
+
+
+def _invalidate_after_bulk_delete(delete_context):
+    """Query.delete() auf Stammdaten (z.B. beim Restore)"""
+    entity = _ENTITY_BY_MODEL.get(delete_context.mapper.class_)
+    if entity and delete_context.result.rowcount != 0:
+        _bump_versions(delete_context.session, {entity})
+
+
+def _invalidate_core_statement(orm_execute_state):
+    """Core-Statements über die Session (z.B. session.execute(Model.__table__.insert(), rows))"""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    if orm_execute_state.statement._propagate_attrs.get('compile_state_plugin') == 'orm':
+        return  # ORM-Statements laufen über after_flush / after_bulk_update / after_bulk_delete
+    entity = _ENTITY_BY_TABLE.get(orm_execute_state.statement.table)
+    if entity:
+        _bump_versions(orm_execute_state.session, {entity})
+
+
+def init_master_data_cache(app):
+    """Registriert die Invalidierungs-Hooks für alle Sessions"""
+    for event_name, listener in (
+        ('after_flush', _invalidate_after_flush),
+        ('after_bulk_update', _invalidate_after_bulk_update),
+        ('after_bulk_delete', _invalidate_after_bulk_delete),
+        ('do_orm_execute', _invalidate_core_statement),
+    ):
+        if not event.contains(Session, event_name, listener):
+            event.listen(Session, event_name, listener)
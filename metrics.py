@@ -0,0 +1,236 @@
+"""
+Laufzeit-Metriken für die InstallationApp im Prometheus-Textformat
+Request-Latenzen und DB-Abfragen pro Endpoint, Connection-Pool, PDF-Erstellung, Backups, Cache-Trefferquoten und E-Mail-Versand.
+
+Unter gunicorn laufen mehrere Worker-Prozesse: ist PROMETHEUS_MULTIPROC_DIR gesetzt
+(siehe gunicorn.conf.py), schreibt jeder Worker seine Werte in dieses Verzeichnis und
+/metrics liefert die über alle Worker aggregierten Werte.
+"""
+import os
+import time
+from functools import wraps
+
+from flask import g, request
+from sqlalchemy import event
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+    CONTENT_TYPE_LATEST, generate_latest, multiprocess
+)
+
+# ===============================
+# METRIK-DEFINITIONEN
+# ===============================
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Dauer der HTTP-Requests pro Endpoint und Statuscode',
+    ['endpoint', 'method', 'status'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+DB_POOL_SIZE = Gauge(
+    'db_pool_size', 'Konfigurierte Größe des Connection-Pools', multiprocess_mode='livesum'
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    'db_pool_checked_out', 'Aktuell ausgeliehene Datenbankverbindungen', multiprocess_mode='livesum'
+)
+DB_POOL_OVERFLOW = Gauge(
+    'db_pool_overflow', 'Verbindungen über der Pool-Größe (Overflow)', multiprocess_mode='livesum'
+)
+DB_POOL_CHECKOUTS = Counter(
+    'db_pool_checkouts_total', 'Ausgeliehene Datenbankverbindungen'
+)
+DB_POOL_SATURATED_CHECKOUTS = Counter(
+    'db_pool_saturated_checkouts_total',
+    'Ausleihen bei voll ausgelastetem Pool (weitere Requests müssen warten)'
+)
+
+PDF_RENDER_SECONDS = Histogram(
+    'pdf_render_duration_seconds',
+    'Dauer der PDF-Erstellung pro Dokumenttyp',
+    ['document'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+)
+PDF_SIZE_BYTES = Histogram(
+    'pdf_size_bytes',
+    'Größe der erstellten PDFs pro Dokumenttyp',
+    ['document'],
+    buckets=(10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 2_500_000, 5_000_000, 10_000_000)
+)
+
+BACKUP_SECONDS = Histogram(
+    'backup_duration_seconds',
+    'Dauer von Backup und Wiederherstellung',
+    ['kind', 'result'],
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+)
+
+CACHE_REQUESTS = Counter(
+    'cache_requests_total',
+    'Cache-Zugriffe pro Cache (result=hit|miss)',
+    ['cache', 'result']
+)
+
+DB_QUERIES_PER_REQUEST = Histogram(
+    'db_queries_per_request',
+    'Datenbankabfragen pro Request und Endpoint',
+    ['endpoint'],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 250, 500)
+)
+DB_QUERY_SECONDS = Counter(
+    'db_query_seconds_total',
+    'Summierte Datenbankzeit der Requests pro Endpoint',
+    ['endpoint']
+)
+DB_SLOW_QUERIES = Counter(
+    'db_slow_queries_total',
+    'Abfragen über SLOW_QUERY_THRESHOLD_MS pro Endpoint',
+    ['endpoint']
+)
+DB_N_PLUS_ONE_REQUESTS = Counter(
+    'db_n_plus_one_requests_total',
+    'Requests mit N+1-Verdacht pro Endpoint',
+    ['endpoint']
+)
+
+EMAILS_SENT = Counter(
+    'outbound_emails_total',
+    'Versandversuche ausgehender E-Mails (result=sent|retry|failed)',
+    ['result']
+)
+
+
+# ===============================
+# HILFSFUNKTIONEN
+# ===============================
+
+def _get_size(result):
+    """Ermittelt die Größe eines PDF-Ergebnisses (BytesIO, bytes oder Response)"""
+    if hasattr(result, 'getbuffer'):
+        return result.getbuffer().nbytes
+    if isinstance(result, (bytes, bytearray)):
+        return len(result)
+    return getattr(result, 'content_length', None)
+
+
+def track_pdf_render(document_type):
+    """Decorator: misst Dauer und Größe einer PDF-Erstellung"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            PDF_RENDER_SECONDS.labels(document_type).observe(time.perf_counter() - start)
+            size = _get_size(result)
+            if size:
+                PDF_SIZE_BYTES.labels(document_type).observe(size)
+            return result
+        return wrapper
+    return decorator
+
+
+def track_backup(kind):
+    """Decorator: misst die Dauer eines Backups bzw. einer Wiederherstellung"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result_label = 'error'
+            try:
+                result = func(*args, **kwargs)
+                # Wiederherstellungen melden Fehler über den Rückgabewert False
+                result_label = 'error' if result is False else 'success'
+                return result
+            finally:
+                BACKUP_SECONDS.labels(kind, result_label).observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def record_cache_lookup(cache_name, hit):
+    """Zählt einen Cache-Zugriff (Treffer oder Fehlzugriff)"""
+    CACHE_REQUESTS.labels(cache_name, 'hit' if hit else 'miss').inc()
+
+
+def record_request_queries(endpoint, queries, db_time, slow_queries, n_plus_one):
+    """Erfasst die Abfragen eines Requests (Werte aus query_monitor)"""
+    DB_QUERIES_PER_REQUEST.labels(endpoint).observe(queries)
+    DB_QUERY_SECONDS.labels(endpoint).inc(db_time)
+    if slow_queries:
+        DB_SLOW_QUERIES.labels(endpoint).inc(slow_queries)
+    if n_plus_one:
+        DB_N_PLUS_ONE_REQUESTS.labels(endpoint).inc()
+
+
+def record_email_result(result):
+    """Zählt einen Versandversuch der E-Mail-Warteschlange (sent, retry oder failed)"""
+    EMAILS_SENT.labels(result).inc()
+
+
+def _update_pool_gauges(pool):
+    """Aktualisiert die Pool-Gauges (nur für Pools mit fester Größe, z.B. QueuePool)"""
+    if not hasattr(pool, 'checkedout'):
+        return
+    DB_POOL_SIZE.set(pool.size())
+    DB_POOL_CHECKED_OUT.set(pool.checkedout())
+    DB_POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+
+def _register_pool_events(engine):
+    """
+    Hängt die Pool-Metriken an die Checkout/Checkin-Events des Engines.
+
+    engine.dispose() (z.B. vor und nach dem Fork, siehe worker_startup.py) ersetzt den Pool;
+    die Events gehen auf den neuen Pool über, deshalb wird engine.pool erst im Handler gelesen.
+    Die Wartezeit auf eine freie Verbindung misst SQLAlchemy nicht (kein Event vor dem Checkout) -
+    db_pool_saturated_checkouts_total ist nur ein Näherungswert: ab diesem Zustand müssen weitere
+    Requests warten.
+    """
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool = engine.pool
+        DB_POOL_CHECKOUTS.inc()
+        if hasattr(pool, 'checkedout') and pool.checkedout() >= pool.size() + max(getattr(pool, '_max_overflow', 0), 0):
+            DB_POOL_SATURATED_CHECKOUTS.inc()
+        _update_pool_gauges(pool)
+
+    def on_checkin(dbapi_connection, connection_record):
+        _update_pool_gauges(engine.pool)
+
+    event.listen(engine.pool, 'checkout', on_checkout)
+    event.listen(engine.pool, 'checkin', on_checkin)
+
+
+def _start_timer():
+    """Merkt sich den Startzeitpunkt des Requests"""
+    g.metrics_start = time.perf_counter()
+
+
+def _observe_request(response):
+    """Erfasst die Request-Dauer im Latenz-Histogramm"""
+    start = g.pop('metrics_start', None)
+    if start is None or request.endpoint == 'static':
+        return response
+    REQUEST_LATENCY.labels(
+        request.endpoint or 'unbekannt', request.method, str(response.status_code)
+    ).observe(time.perf_counter() - start)
+    return response
+
+
+def generate_metrics():
+    """Erzeugt die Metriken im Prometheus-Textformat (über alle Worker aggregiert)"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def init_metrics(app, db):
+    """Registriert Request-Timing und Pool-Events für die App"""
+    with app.app_context():
+        _register_pool_events(db.engine)
+
+    app.before_request(_start_timer)
+    app.after_request(_observe_request)
@@ -0,0 +1,56 @@
+"""Add composite and foreign key indexes for list queries
+
+Revision ID: 4b7e2c91d3a0
+Revises: 39087d8d45d2
+Create Date: 2026-10-19 09:12:41.315207
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '4b7e2c91d3a0'
+down_revision = '39087d8d45d2'
+branch_labels = None
+depends_on = None
+
+
+# (Indexname, Tabelle, Spalten) - identisch mit den __table_args__ in models.py
+INDEXES = [
+    ('ix_customer_status_appointment_date', 'customer', ['status', 'appointment_date']),
+    ('ix_customer_status_second_appointment_date', 'customer', ['status', 'second_appointment_date']),
+    ('ix_customer_last_name_first_name', 'customer', ['last_name', 'first_name']),
+    ('ix_quote_status_created_at', 'quote', ['status', 'created_at']),
+    ('ix_quote_created_at', 'quote', ['created_at']),
+    ('ix_quote_customer_id_created_at', 'quote', ['customer_id', 'created_at']),
+    ('ix_quote_item_quote_id_position_number', 'quote_item', ['quote_id', 'position_number']),
+    ('ix_quote_sub_item_quote_item_id_sub_number', 'quote_sub_item', ['quote_item_id', 'sub_number']),
+    ('ix_quote_rejection_quote_id', 'quote_rejection', ['quote_id']),
+    ('ix_order_status_start_date', 'order', ['status', 'start_date']),
+    ('ix_order_created_at', 'order', ['created_at']),
+    ('ix_order_quote_id', 'order', ['quote_id']),
+    ('ix_supplier_order_status_order_date', 'supplier_order', ['status', 'order_date']),
+    ('ix_supplier_order_quote_id', 'supplier_order', ['quote_id']),
+    ('ix_supplier_order_order_id', 'supplier_order', ['order_id']),
+    ('ix_supplier_order_item_supplier_order_id', 'supplier_order_item', ['supplier_order_id']),
+    ('ix_work_instruction_order_id', 'work_instruction', ['order_id']),
+    ('ix_invoice_status_due_date', 'invoice', ['status', 'due_date']),
+    ('ix_invoice_created_at', 'invoice', ['created_at']),
+    ('ix_invoice_order_id_invoice_type', 'invoice', ['order_id', 'invoice_type']),
+    ('ix_invoice_customer_id', 'invoice', ['customer_id']),
+    ('ix_invoice_reminder_is_dismissed_due_date', 'invoice_reminder', ['is_dismissed', 'due_date']),
+    ('ix_invoice_reminder_order_id', 'invoice_reminder', ['order_id']),
+    ('ix_invoice_position_invoice_id_position_number', 'invoice_position', ['invoice_id', 'position_number']),
+]
+
+
+def upgrade():
+    # if_not_exists: Datenbanken, die per db.create_all() angelegt wurden,
+    # haben die Indizes bereits (SQLite und PostgreSQL unterstützen beide IF NOT EXISTS)
+    for index_name, table_name, columns in INDEXES:
+        op.create_index(index_name, table_name, columns, unique=False, if_not_exists=True)
+
+
+def downgrade():
+    for index_name, table_name, columns in reversed(INDEXES):
+        op.drop_index(index_name, table_name=table_name, if_exists=True)
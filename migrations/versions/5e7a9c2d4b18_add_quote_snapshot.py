@@ -0,0 +1,36 @@
+"""Add quote_snapshot table for accepted quotes
+
+Revision ID: 5e7a9c2d4b18
+Revises: d8b2e5f1a6c3
+Create Date: 2026-10-19 19:48:21.407316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '5e7a9c2d4b18'
+down_revision = 'd8b2e5f1a6c3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Bereits angenommene Angebote haben keinen Snapshot - sie werden weiter live gelesen
+    op.create_table('quote_snapshot',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('quote_id', sa.Integer(), nullable=False),
+    sa.Column('schema_version', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('document', sa.JSON().with_variant(postgresql.JSONB(), 'postgresql'), nullable=False),
+    sa.ForeignKeyConstraint(['quote_id'], ['quote.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_quote_snapshot_quote_id', 'quote_snapshot', ['quote_id'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_quote_snapshot_quote_id', table_name='quote_snapshot')
+    op.drop_table('quote_snapshot')
@@ -0,0 +1,38 @@
+"""Add master_data_version table for the master-data cache
+
+Revision ID: 7f3c1e8a2b56
+Revises: e2b64d0c9a18
+Create Date: 2026-10-19 16:55:12.664021
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7f3c1e8a2b56'
+down_revision = 'e2b64d0c9a18'
+branch_labels = None
+depends_on = None
+
+
+ENTITIES = ['supplier', 'position_template', 'acquisition_channel', 'article']
+
+
+def upgrade():
+    master_data_version = op.create_table('master_data_version',
+    sa.Column('entity', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('entity')
+    )
+    now = datetime.utcnow()
+    op.bulk_insert(master_data_version, [
+        {'entity': entity, 'version': 1, 'updated_at': now} for entity in ENTITIES
+    ])
+
+
+def downgrade():
+    op.drop_table('master_data_version')
@@ -0,0 +1,39 @@
+"""Add customer_status_change table for the automatic status job
+
+Revision ID: 8d1f5a3c6e27
+Revises: 4b7e2c91d3a0
+Create Date: 2026-10-19 11:02:17.482913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d1f5a3c6e27'
+down_revision = '4b7e2c91d3a0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('customer_status_change',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('customer_id', sa.Integer(), nullable=False),
+    sa.Column('old_status', sa.String(length=50), nullable=True),
+    sa.Column('new_status', sa.String(length=50), nullable=False),
+    sa.Column('source', sa.String(length=20), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['customer_id'], ['customer.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_customer_status_change_customer_id_changed_at', 'customer_status_change',
+                    ['customer_id', 'changed_at'], unique=False)
+    op.create_index('ix_customer_status_change_changed_at', 'customer_status_change',
+                    ['changed_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_customer_status_change_changed_at', table_name='customer_status_change')
+    op.drop_index('ix_customer_status_change_customer_id_changed_at', table_name='customer_status_change')
+    op.drop_table('customer_status_change')
@@ -0,0 +1,75 @@
+"""Add numeric quantity columns to quote_sub_item and backfill them from the text columns
+
+Revision ID: a3d9f1c27b84
+Revises: 7f3c1e8a2b56
+Create Date: 2026-10-19 18:02:47.319552
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3d9f1c27b84'
+down_revision = '7f3c1e8a2b56'
+branch_labels = None
+depends_on = None
+
+
+# (Textspalte, Zahlenspalte)
+QUANTITY_COLUMNS = [
+    ('quantity', 'quantity_value'),
+    ('part_quantity', 'part_quantity_value'),
+]
+BATCH_SIZE = 1000
+
+_QUANTITY_PREFIX = re.compile(r'^([\d,\.]+)')
+
+
+def _parse_quantity(text):
+    """Wie models.parse_quantity (Stand dieser Migration)"""
+    text = (text or '').strip()
+    if not text:
+        return None
+    try:
+        return float(text.replace(',', '.'))
+    except ValueError:
+        pass
+    match = _QUANTITY_PREFIX.match(text)
+    if match:
+        try:
+            return float(match.group(1).replace(',', '.'))
+        except ValueError:
+            pass
+    return None
+
+
+def upgrade():
+    with op.batch_alter_table('quote_sub_item', schema=None) as batch_op:
+        for _, value_column in QUANTITY_COLUMNS:
+            batch_op.add_column(sa.Column(value_column, sa.Float(), nullable=True))
+
+    # Texte einmal parsen und in Blöcken zurückschreiben
+    connection = op.get_bind()
+    rows = connection.execute(sa.text('SELECT id, quantity, part_quantity FROM quote_sub_item')).fetchall()
+    update = sa.text(
+        'UPDATE quote_sub_item SET quantity_value = :quantity_value, '
+        'part_quantity_value = :part_quantity_value WHERE id = :id'
+    )
+    for start in range(0, len(rows), BATCH_SIZE):
+        connection.execute(update, [
+            {
+                'id': row_id,
+                'quantity_value': _parse_quantity(quantity),
+                'part_quantity_value': _parse_quantity(part_quantity),
+            }
+            for row_id, quantity, part_quantity in rows[start:start + BATCH_SIZE]
+        ])
+
+
+def downgrade():
+    with op.batch_alter_table('quote_sub_item', schema=None) as batch_op:
+        for _, value_column in QUANTITY_COLUMNS:
+            batch_op.drop_column(value_column)
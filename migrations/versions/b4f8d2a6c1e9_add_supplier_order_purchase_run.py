@@ -0,0 +1,31 @@
+"""Add purchase_run to supplier_order for consolidated purchase runs
+
+Revision ID: b4f8d2a6c1e9
+Revises: 5e7a9c2d4b18
+Create Date: 2026-10-19 21:12:37.584120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4f8d2a6c1e9'
+down_revision = '5e7a9c2d4b18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Bestehende Bestellungen gehören zu keiner Sammelbestellung
+    with op.batch_alter_table('supplier_order', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('purchase_run', sa.String(length=30), nullable=True))
+        batch_op.create_index('ix_supplier_order_purchase_run', ['purchase_run'], unique=False)
+        batch_op.create_index('ix_supplier_order_supplier_name_status', ['supplier_name', 'status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('supplier_order', schema=None) as batch_op:
+        batch_op.drop_index('ix_supplier_order_supplier_name_status')
+        batch_op.drop_index('ix_supplier_order_purchase_run')
+        batch_op.drop_column('purchase_run')
@@ -0,0 +1,110 @@
+"""Add text block library and deduplicate quote boilerplate texts
+
+Revision ID: c5a9e0b7f412
+Revises: 8d1f5a3c6e27
+Create Date: 2026-10-19 14:21:05.903117
+
+"""
+import hashlib
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5a9e0b7f412'
+down_revision = '8d1f5a3c6e27'
+branch_labels = None
+depends_on = None
+
+
+# (Tabelle, Textspalte, Baustein-Spalte, Art des Bausteins)
+TEXT_COLUMNS = [
+    ('quote', 'leistungsumfang', 'leistungsumfang_block_id', 'leistungsumfang'),
+    ('quote', 'objektinformationen', 'objektinformationen_block_id', 'objektinformationen'),
+    ('quote', 'installationsleistungen', 'installationsleistungen_block_id', 'installationsleistungen'),
+    ('work_instruction', 'created_by', 'created_by_block_id', 'installationsleistungen'),
+]
+
+text_block = sa.table(
+    'text_block',
+    sa.column('id', sa.Integer),
+    sa.column('kind', sa.String),
+    sa.column('version', sa.Integer),
+    sa.column('content', sa.Text),
+    sa.column('content_hash', sa.String),
+    sa.column('created_at', sa.DateTime),
+)
+
+
+def upgrade():
+    op.create_table('text_block',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('kind', 'content_hash', name='uq_text_block_kind_content_hash')
+    )
+
+    for table, _, block_column, _ in TEXT_COLUMNS:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column(block_column, sa.Integer(), nullable=True))
+            batch_op.create_foreign_key(f'fk_{table}_{block_column}', 'text_block', [block_column], ['id'])
+
+    # Jeden unterschiedlichen Text genau einmal als Baustein anlegen
+    connection = op.get_bind()
+    seen = set()
+    versions = {}
+    now = datetime.utcnow()
+    for table, text_column, _, kind in TEXT_COLUMNS:
+        rows = connection.execute(sa.text(
+            f'SELECT DISTINCT {text_column} FROM {table} WHERE {text_column} IS NOT NULL'
+        ))
+        for (content,) in rows:
+            content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+            if (kind, content_hash) in seen:
+                continue
+            seen.add((kind, content_hash))
+            versions[kind] = versions.get(kind, 0) + 1
+            connection.execute(text_block.insert().values(
+                kind=kind, version=versions[kind], content=content,
+                content_hash=content_hash, created_at=now,
+            ))
+
+    # Verweise set-basiert setzen, danach die kopierten Texte entfernen
+    for table, text_column, block_column, kind in TEXT_COLUMNS:
+        connection.execute(sa.text(
+            f'UPDATE {table} SET {block_column} = ('
+            f'SELECT text_block.id FROM text_block '
+            f'WHERE text_block.kind = :kind AND text_block.content = {table}.{text_column}) '
+            f'WHERE {text_column} IS NOT NULL'
+        ), {'kind': kind})
+
+    for table, text_column, _, _ in TEXT_COLUMNS:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column(text_column)
+
+
+def downgrade():
+    for table, text_column, _, _ in TEXT_COLUMNS:
+        column_type = sa.String(length=5000) if text_column == 'created_by' else sa.Text()
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column(text_column, column_type, nullable=True))
+
+    connection = op.get_bind()
+    for table, text_column, block_column, _ in TEXT_COLUMNS:
+        connection.execute(sa.text(
+            f'UPDATE {table} SET {text_column} = ('
+            f'SELECT text_block.content FROM text_block WHERE text_block.id = {table}.{block_column})'
+        ))
+
+    for table, _, block_column, _ in TEXT_COLUMNS:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_constraint(f'fk_{table}_{block_column}', type_='foreignkey')
+            batch_op.drop_column(block_column)
+
+    op.drop_table('text_block')
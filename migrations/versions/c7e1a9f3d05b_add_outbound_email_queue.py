@@ -0,0 +1,48 @@
+"""Add outbound_email queue and supplier_order.email_status
+
+Revision ID: c7e1a9f3d05b
+Revises: b4f8d2a6c1e9
+Create Date: 2026-10-19 22:03:55.218406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e1a9f3d05b'
+down_revision = 'b4f8d2a6c1e9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('outbound_email',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('recipient', sa.String(length=200), nullable=False),
+    sa.Column('subject', sa.String(length=255), nullable=False),
+    sa.Column('html_body', sa.Text(), nullable=True),
+    sa.Column('plain_body', sa.Text(), nullable=False),
+    sa.Column('supplier_order_ids', sa.JSON().with_variant(postgresql.JSONB(), 'postgresql'), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_outbound_email_status_next_attempt_at', 'outbound_email', ['status', 'next_attempt_at'], unique=False)
+
+    # Bisher manuell verschickte Bestellungen haben keinen Versandstatus
+    with op.batch_alter_table('supplier_order', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('email_status', sa.String(length=20), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('supplier_order', schema=None) as batch_op:
+        batch_op.drop_column('email_status')
+
+    op.drop_index('ix_outbound_email_status_next_attempt_at', table_name='outbound_email')
+    op.drop_table('outbound_email')
@@ -0,0 +1,51 @@
+"""Add integer sort position to quote_sub_item and backfill it from the sub numbers
+
+Revision ID: d8b2e5f1a6c3
+Revises: a3d9f1c27b84
+Create Date: 2026-10-19 19:14:05.862731
+
+"""
+from itertools import groupby
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8b2e5f1a6c3'
+down_revision = 'a3d9f1c27b84'
+branch_labels = None
+depends_on = None
+
+
+BATCH_SIZE = 1000
+
+
+def _natural_key(sub_number):
+    """Sortierung nach Zahlenteilen ("1.2" vor "1.10"), Texte nach den Zahlen"""
+    return [(0, int(part), '') if part.isdigit() else (1, 0, part) for part in (sub_number or '').split('.')]
+
+
+def upgrade():
+    with op.batch_alter_table('quote_sub_item', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('sub_position', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.create_index('ix_quote_sub_item_quote_item_id_sub_position', ['quote_item_id', 'sub_position'], unique=False)
+
+    # Pro Position in natürlicher Reihenfolge der Nummern durchzählen (1, 2, ...)
+    connection = op.get_bind()
+    rows = connection.execute(sa.text(
+        'SELECT quote_item_id, id, sub_number FROM quote_sub_item ORDER BY quote_item_id, id'
+    )).fetchall()
+    values = []
+    for _, item_rows in groupby(rows, key=lambda row: row[0]):
+        ordered = sorted(item_rows, key=lambda row: (_natural_key(row[2]), row[1]))
+        values.extend({'id': row[1], 'sub_position': index} for index, row in enumerate(ordered, start=1))
+    update = sa.text('UPDATE quote_sub_item SET sub_position = :sub_position WHERE id = :id')
+    for start in range(0, len(values), BATCH_SIZE):
+        connection.execute(update, values[start:start + BATCH_SIZE])
+
+
+def downgrade():
+    with op.batch_alter_table('quote_sub_item', schema=None) as batch_op:
+        batch_op.drop_index('ix_quote_sub_item_quote_item_id_sub_position')
+        batch_op.drop_column('sub_position')
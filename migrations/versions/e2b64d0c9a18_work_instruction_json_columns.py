@@ -0,0 +1,63 @@
+"""Convert work instruction JSON text columns to native JSON/JSONB
+
+Revision ID: e2b64d0c9a18
+Revises: c5a9e0b7f412
+Create Date: 2026-10-19 15:40:33.118204
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b64d0c9a18'
+down_revision = 'c5a9e0b7f412'
+branch_labels = None
+depends_on = None
+
+
+JSON_COLUMNS = ['work_steps_data', 'work_parts_data', 'photo_paths']
+
+
+def upgrade():
+    # Leere oder ungültige JSON-Texte vorher auf NULL setzen, sonst scheitert die Umwandlung
+    connection = op.get_bind()
+    for column in JSON_COLUMNS:
+        rows = connection.execute(sa.text(
+            f'SELECT id, {column} FROM work_instruction WHERE {column} IS NOT NULL'
+        ))
+        invalid_ids = []
+        for row_id, value in rows:
+            try:
+                json.loads(value)
+            except (TypeError, ValueError):
+                invalid_ids.append(row_id)
+        for row_id in invalid_ids:
+            connection.execute(sa.text(
+                f'UPDATE work_instruction SET {column} = NULL WHERE id = :id'
+            ), {'id': row_id})
+
+    # SQLite speichert JSON ohnehin als Text (JSON1-Funktionen arbeiten direkt darauf);
+    # ein Batch-Umbau würde die Werte per CAST zerstören - nur PostgreSQL braucht JSONB
+    if connection.dialect.name != 'postgresql':
+        return
+    for column in JSON_COLUMNS:
+        op.alter_column('work_instruction', column,
+               existing_type=sa.Text(),
+               type_=postgresql.JSONB(),
+               existing_nullable=True,
+               postgresql_using=f'{column}::jsonb')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for column in JSON_COLUMNS:
+        op.alter_column('work_instruction', column,
+               existing_type=postgresql.JSONB(),
+               type_=sa.Text(),
+               existing_nullable=True,
+               postgresql_using=f'{column}::text')
@@ -0,0 +1,112 @@
+"""Move the work-step catalog from work_steps.py into the work_step table
+
+Revision ID: e9a4c6b2f731
+Revises: c7e1a9f3d05b
+Create Date: 2026-10-19 22:41:08.730512
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9a4c6b2f731'
+down_revision = 'c7e1a9f3d05b'
+branch_labels = None
+depends_on = None
+
+
+# Stand von work_steps.py zum Zeitpunkt der Migration
+INITIAL_WORK_STEPS = [
+    ('Abbruch', [
+        ('Wanne raus', 4.0),
+        ('Dusche raus', 4.0),
+        ('WC abbauen', 1.0),
+        ('WT abbauen je Teil', 1.0),
+        ('Duschglas abbauen', 1.0),
+        ('Sockel / Vorwand abbauen', 1.0),
+        ('Heizkörper', 2.0),
+        ('Bodenfliesen raus', 4.0),
+        ('Wandfliesen raus', 8.0),
+        ('Therme demonieren', 2.0),
+        ('Zwischenwand entfernen', 2.0),
+        ('Decke abbauen', 3.0),
+    ]),
+    ('Duschtasse', [
+        ('Abfluss stemmen Versetzen', 2.0),
+        ('Abfluss stemmen Bodengleich', 4.0),
+        ('Tasse setzen', 4.0),
+        ('Tasse zuscheiden', 2.0),
+        ('Duschkabine schwer', 6.0),
+        ('Duschkabine leicht', 2.0),
+        ('Armatur montieren', 2.0),
+        ('Klappsitz', 1.0),
+        ('Haltegriff montieren', 1.0),
+        ('Duschnische einbauen', 2.0),
+        ('Duschrinne installieren', 4.0),
+        ('geflieste Rinne setzen', 4.0),
+    ]),
+    ('Badewanne', [
+        ('setzen', 4.0),
+        ('verkleiden', 4.0),
+        ('Armatur', 2.0),
+        ('Glasaufsatz', 2.0),
+    ]),
+    ('WC', [
+        ('UP-Gestell', 6.0),
+        ('WC installieren', 2.0),
+        ('Dusch WC installieren', 4.0),
+        ('Haltegriff montieren', 1.0),
+    ]),
+    ('Waschtisch/Möbel', [
+        ('Waschtisch', 2.0),
+        ('Möbel je Teil', 2.0),
+    ]),
+    ('Heizkörper', [
+        ('Heizkörper installieren', 6.0),
+        ('Heizkörper montieren', 2.0),
+        ('Therme montieren', 4.0),
+    ]),
+    ('Entsorgung', [
+        ('Pauschale klein', 1.1),
+        ('Pauschale normal', 5.1),
+    ]),
+]
+
+
+def upgrade():
+    work_step = op.create_table('work_step',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('category', sa.String(length=100), nullable=False),
+    sa.Column('category_order', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=200), nullable=False),
+    sa.Column('default_hours', sa.Float(), nullable=False),
+    sa.Column('sort_order', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_work_step_category_sort_order', 'work_step', ['category', 'sort_order'], unique=False)
+
+    op.bulk_insert(work_step, [
+        {
+            'category': category,
+            'category_order': category_order,
+            'name': name,
+            'default_hours': default_hours,
+            'sort_order': sort_order,
+        }
+        for category_order, (category, steps) in enumerate(INITIAL_WORK_STEPS)
+        for sort_order, (name, default_hours) in enumerate(steps)
+    ])
+
+    # Versionszähler für den Stammdaten-Cache (master_data_cache.py)
+    master_data_version = sa.table('master_data_version',
+        sa.column('entity', sa.String), sa.column('version', sa.Integer), sa.column('updated_at', sa.DateTime))
+    op.bulk_insert(master_data_version, [{'entity': 'work_step', 'version': 1, 'updated_at': datetime.utcnow()}])
+
+
+def downgrade():
+    op.execute("DELETE FROM master_data_version WHERE entity = 'work_step'")
+    op.drop_index('ix_work_step_category_sort_order', table_name='work_step')
+    op.drop_table('work_step')
@@ -0,0 +1,35 @@
+"""Delete customer_status_change rows together with their customer
+
+Revision ID: f3b8d1e6a2c4
+Revises: e9a4c6b2f731
+Create Date: 2026-10-19 15:12:40.318552
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8d1e6a2c4'
+down_revision = 'e9a4c6b2f731'
+branch_labels = None
+depends_on = None
+
+# Name, den PostgreSQL dem unbenannten Fremdschlüssel aus 8d1f5a3c6e27 gegeben hat
+FK_NAME = 'customer_status_change_customer_id_fkey'
+
+
+def upgrade():
+    # SQLite prüft Fremdschlüssel in dieser App nicht - dort löscht die ORM-Cascade das Protokoll
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_constraint(FK_NAME, 'customer_status_change', type_='foreignkey')
+    op.create_foreign_key(FK_NAME, 'customer_status_change', 'customer',
+                          ['customer_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_constraint(FK_NAME, 'customer_status_change', type_='foreignkey')
+    op.create_foreign_key(FK_NAME, 'customer_status_change', 'customer',
+                          ['customer_id'], ['id'])
@@ -2,14 +2,31 @@
 """
 Datenbankmodelle für die InstallationApp
 """
+import re
+import hashlib
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.mutable import MutableList
+from sqlalchemy.orm import Session, validates
+from sqlalchemy.orm.attributes import flag_modified
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 
 db = SQLAlchemy()
 
+# JSON-Spalten: JSONB auf PostgreSQL, JSON (JSON1) auf SQLite
+JSONType = db.JSON().with_variant(JSONB(), 'postgresql')
+
 class Customer(db.Model):
+    # Indizes für Statusfilter, automatische Status-Updates und Standardsortierung
+    __table_args__ = (
+        db.Index('ix_customer_status_appointment_date', 'status', 'appointment_date'),
+        db.Index('ix_customer_status_second_appointment_date', 'status', 'second_appointment_date'),
+        db.Index('ix_customer_last_name_first_name', 'last_name', 'first_name'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     salutation = db.Column(db.String(100))  # Anrede (optional)
     first_name = db.Column(db.String(100), nullable=False)
@@ -44,6 +61,11 @@ class Customer(db.Model):
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
     
+    @classmethod
+    def list_columns(cls):
+        """Spalten für Listenansichten (für load_only)"""
+        return (cls.id, cls.first_name, cls.last_name)
+    
     def get_status_badge_class(self):
         """Gibt die Bootstrap-Badge-Klasse für den aktuellen Status zurück"""
         status_classes = {
@@ -81,23 +103,23 @@ class Customer(db.Model):
             return 'Kunde hat aktuell kein Interesse'
         return 'Unbekannter Status'
     
+    # Automatische Status-Übergänge: (Ausgangsstatus, Datumsspalte, Zielstatus)
+    # Wird vom Status-Job (customer_status_job.py) als ein UPDATE pro Regel ausgeführt
+    AUTO_STATUS_RULES = [
+        ('1. Termin vereinbart', 'appointment_date', 'Angebot erstellen'),
+        ('2. Termin vereinbart', 'second_appointment_date', 'Warten auf Rückmeldung'),
+    ]
+    
     def check_auto_status_update(self):
-        """Prüft und führt automatische Status-Updates durch"""
-        from datetime import date, timedelta
-        
-        # Automatisches Update: 1. Termin war gestern -> "Angebot erstellen"
-        if (self.status == '1. Termin vereinbart' and 
-            self.appointment_date and 
-            self.appointment_date < date.today()):
-            self.status = 'Angebot erstellen'
-            return True
+        """Prüft und führt automatische Status-Updates durch (einzelner Kunde)"""
+        from datetime import date
         
-        # Automatisches Update: 2. Termin war gestern -> "Warten auf Rückmeldung"
-        if (self.status == '2. Termin vereinbart' and 
-            self.second_appointment_date and 
-            self.second_appointment_date < date.today()):
-            self.status = 'Warten auf Rückmeldung'
-            return True
+        for from_status, date_column, to_status in self.AUTO_STATUS_RULES:
+            # Termin liegt in der Vergangenheit -> nächster Status
+            appointment = getattr(self, date_column)
+            if self.status == from_status and appointment and appointment < date.today():
+                self.status = to_status
+                return True
         
         return False
     
@@ -106,7 +128,169 @@ class Customer(db.Model):
         """Gibt die Kundennummer als 5-stellige Zahl zurück (ID + 10000)"""
         return f"{self.id + 10000}"
 
+class CustomerStatusChange(db.Model):
+    """Protokoll der automatischen (und manuellen) Status-Änderungen eines Kunden"""
+    __tablename__ = 'customer_status_change'
+    __table_args__ = (
+        db.Index('ix_customer_status_change_customer_id_changed_at', 'customer_id', 'changed_at'),
+        db.Index('ix_customer_status_change_changed_at', 'changed_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id', ondelete='CASCADE'), nullable=False)
+    old_status = db.Column(db.String(50))
+    new_status = db.Column(db.String(50), nullable=False)
+    source = db.Column(db.String(20), nullable=False, default='auto')  # 'auto' = Status-Job
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Protokoll wird mit dem Kunden gelöscht (ORM-Cascade, auf PostgreSQL zusätzlich ON DELETE CASCADE)
+    customer = db.relationship('Customer', backref=db.backref(
+        'status_changes', lazy='dynamic', cascade='all, delete-orphan'
+    ))
+
+# Standardtexte für neue Angebote (überschreibbar in den Einstellungen)
+DEFAULT_QUOTE_TEXTS = {
+    'leistungsumfang': 'Wir bedanken uns für Ihr Vertrauen und bieten Ihnen folgenden Leistungsumfang:\n*  Demontage der bestehenden Produkte inklusive/exklusive Entsorgung\n*  Montage der im Angebot angeführten Produkte\n*  Anschluss an bestehendes Gebäudeleitungssystem im unmittelbaren Umbaubereich ab Badezimmer oder in der Dusche\n*  Bei Komplettsanierung des Badezimmer werden die Abdichtungsarbeiten gemäß ÖNORM B3407 ausgeführt.\n*  Bei Teilsanierungen gilt eine Sonderkonstruktion bei der Ausführung der Verbundabdichtung als vereinbart. Auf Grund der Teilsanierung kann keine Gewährleistung für Bestandsabdichtungen übernommen werden. Die Anbindung der neu hergestellten Verbundabdichtungsbereiche an Bestandsabdichtungen kann bei der angebotenen Teilsanierung nicht  oder teilweise nicht ausgeführt werden. In kritischen Bereichen werden als technisch bestmögliche Lösung  MS-Polymerdichtstoffe anstelle von herkömmlichen Sanitärsilikonen als Sonderkonstruktion vereinbart und eingesetzt.',
+    'objektinformationen': '* Einfamilienhaus / Wohnung im __ Stock\n* Zuschnitt vor dem Gebäude möglich: ja / nein\n* Parken vor dem Gebäude möglich:  ja /  nein',
+    'installationsleistungen': '* Demontage , Vorbereitung und Entsorgung erfolgt durch Innsan/Kunde selbst\n* Die Duschtasse wird bodengleich ohne Stufe gesetzt.\n* Die Duschtasse wird auf die bestehenden Fliesen aufgelegt. Stufe von ca. 3 cm\n* Die Paneele werden im gesamten Duschbereich/Badezimmer über die bestehenden Wandfliesen (raupenförmige Kleberaufbringung) verklebt, Höhe Raum hoch/ca. ____cm . Die Wandpaneele werden im Eck- und Plattenstoßbereich mittels Aluprofilen verbunden; das Standard-Plattenformat beträgt 130 x 280 cm/150 x 255cm.\n* Die verbleibende Wandfläche außerhalb des Paneelbereiches wird gespachtelt und gemalt\n* Der Vinylboden wird über den bestehenden Fliesenboden verklebt verlegt',
+}
+
+# Prozess-Cache für Textbausteine: ID -> Text. Gültig für eine Version der Art 'text_block'
+# in master_data_version (siehe master_data_cache.py) - Schreibzugriffe und Restore erhöhen sie
+TEXT_BLOCK_CACHE_SIZE = 1024
+_text_block_cache = {}
+_text_block_cache_version = None
+
+
+def clear_text_block_cache():
+    """Leert den Textbaustein-Cache dieses Prozesses (z.B. nach einer Wiederherstellung)"""
+    global _text_block_cache_version
+    _text_block_cache.clear()
+    _text_block_cache_version = None
+
+
+class TextBlock(db.Model):
+    """Versionierter Textbaustein für Angebote und Arbeitsanweisungen
+    
+    Bausteine werden nie verändert: Angebote verweisen per ID darauf, eine Bearbeitung
+    legt eine neue Version an (Copy-on-Write). Identische Texte werden über den Hash
+    wiederverwendet, sodass z.B. der Standard-Leistungsumfang nur einmal gespeichert ist.
+    """
+    __tablename__ = 'text_block'
+    __table_args__ = (
+        db.UniqueConstraint('kind', 'content_hash', name='uq_text_block_kind_content_hash'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)  # leistungsumfang, objektinformationen, installationsleistungen
+    version = db.Column(db.Integer, nullable=False, default=1)  # Fortlaufend pro Art
+    content = db.Column(db.Text, nullable=False)
+    content_hash = db.Column(db.String(64), nullable=False)  # SHA-256 des Inhalts
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @staticmethod
+    def hash_content(content):
+        """SHA-256 eines Textes (Schlüssel für die Deduplizierung)"""
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def get_content(block_id):
+        """Text eines Bausteins - aus dem Cache oder per Primärschlüssel aus der DB"""
+        global _text_block_cache_version
+        from master_data_cache import get_versions
+        from metrics import record_cache_lookup
+        
+        if block_id is None:
+            return None
+        version = get_versions().get('text_block', 0)
+        if version != _text_block_cache_version:
+            _text_block_cache.clear()
+            _text_block_cache_version = version
+        content = _text_block_cache.get(block_id)
+        record_cache_lookup('text_block', content is not None)
+        if content is not None:
+            return content
+        
+        block = db.session.get(TextBlock, block_id)
+        if block is None:
+            return None
+        # In dieser Transaktion angelegte Bausteine erst nach dem Commit cachen
+        if block_id not in db.session.info.get('new_text_block_ids', ()):
+            if len(_text_block_cache) >= TEXT_BLOCK_CACHE_SIZE:
+                _text_block_cache.clear()
+            _text_block_cache[block_id] = block.content
+        return block.content
+    
+    @staticmethod
+    def get_or_create(session, kind, content):
+        """ID des Bausteins mit diesem Text - legt bei Bedarf eine neue Version an
+        
+        Läuft auch während eines Flushes (before_flush): der neue Baustein wird direkt
+        per INSERT angelegt statt über die Unit of Work.
+        """
+        if content is None:
+            return None
+        content_hash = TextBlock.hash_content(content)
+        block_id = session.query(TextBlock.id).filter_by(kind=kind, content_hash=content_hash).scalar()
+        if block_id is None:
+            latest_version = session.query(db.func.max(TextBlock.version)).filter_by(kind=kind).scalar()
+            result = session.execute(TextBlock.__table__.insert().values(
+                kind=kind, content=content, content_hash=content_hash,
+                version=(latest_version or 0) + 1, created_at=datetime.utcnow()
+            ))
+            block_id = result.inserted_primary_key[0]
+            session.info.setdefault('new_text_block_ids', set()).add(block_id)
+        return block_id
+
+
+def text_block_property(id_attribute, kind):
+    """Property für einen Textbaustein: liest über den Cache, schreibt per Copy-on-Write
+    
+    Der Setter merkt sich den Text nur; den Baustein legt erst der nächste Flush an
+    (_store_pending_text_blocks), bis dahin liefert der Getter den gemerkten Text.
+    """
+    
+    def getter(self):
+        pending = getattr(self, '_pending_text_blocks', None)
+        if pending and id_attribute in pending:
+            return pending[id_attribute][1]
+        return TextBlock.get_content(getattr(self, id_attribute))
+    
+    def setter(self, content):
+        if content is None:
+            getattr(self, '_pending_text_blocks', {}).pop(id_attribute, None)
+            setattr(self, id_attribute, None)
+            return
+        if getattr(self, '_pending_text_blocks', None) is None:
+            self._pending_text_blocks = {}
+        self._pending_text_blocks[id_attribute] = (kind, content)
+        if inspect(self).persistent:
+            # Als geändert markieren, damit der Flush das Objekt berücksichtigt
+            getattr(self, id_attribute)
+            flag_modified(self, id_attribute)
+    
+    return property(getter, setter)
+
+
+@event.listens_for(Session, 'before_flush')
+def _store_pending_text_blocks(session, flush_context, instances):
+    """Legt vor dem Flush die Bausteine für geänderte Texte an und setzt die IDs"""
+    for instance in list(session.new) + list(session.dirty):
+        pending = getattr(instance, '_pending_text_blocks', None)
+        if not pending:
+            continue
+        for id_attribute, (kind, content) in list(pending.items()):
+            setattr(instance, id_attribute, TextBlock.get_or_create(session, kind, content))
+        pending.clear()
+
 class Quote(db.Model):
+    # Indizes für Angebotsliste (Status/Datum) und Kundendetail
+    __table_args__ = (
+        db.Index('ix_quote_status_created_at', 'status', 'created_at'),
+        db.Index('ix_quote_created_at', 'created_at'),
+        db.Index('ix_quote_customer_id_created_at', 'customer_id', 'created_at'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     quote_number = db.Column(db.String(50), unique=True, nullable=False)
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False)
@@ -123,14 +307,32 @@ class Quote(db.Model):
     markup_percentage = db.Column(db.Float, default=15.0)  # Aufschlag in Prozent (Standard: 15%)
     discount_percentage = db.Column(db.Float, default=0.0)  # Rabatt in Prozent (Standard: 0%)
     
-    # Editierbare Zusatzinformationen für PDF
-    leistungsumfang = db.Column(db.Text, default='Wir bedanken uns für Ihr Vertrauen und bieten Ihnen folgenden Leistungsumfang:\n*  Demontage der bestehenden Produkte inklusive/exklusive Entsorgung\n*  Montage der im Angebot angeführten Produkte\n*  Anschluss an bestehendes Gebäudeleitungssystem im unmittelbaren Umbaubereich ab Badezimmer oder in der Dusche\n*  Bei Komplettsanierung des Badezimmer werden die Abdichtungsarbeiten gemäß ÖNORM B3407 ausgeführt.\n*  Bei Teilsanierungen gilt eine Sonderkonstruktion bei der Ausführung der Verbundabdichtung als vereinbart. Auf Grund der Teilsanierung kann keine Gewährleistung für Bestandsabdichtungen übernommen werden. Die Anbindung der neu hergestellten Verbundabdichtungsbereiche an Bestandsabdichtungen kann bei der angebotenen Teilsanierung nicht  oder teilweise nicht ausgeführt werden. In kritischen Bereichen werden als technisch bestmögliche Lösung  MS-Polymerdichtstoffe anstelle von herkömmlichen Sanitärsilikonen als Sonderkonstruktion vereinbart und eingesetzt.')
-    objektinformationen = db.Column(db.Text, default='* Einfamilienhaus / Wohnung im __ Stock\n* Zuschnitt vor dem Gebäude möglich: ja / nein\n* Parken vor dem Gebäude möglich:  ja /  nein')
-    installationsleistungen = db.Column(db.Text, default='* Demontage , Vorbereitung und Entsorgung erfolgt durch Innsan/Kunde selbst\n* Die Duschtasse wird bodengleich ohne Stufe gesetzt.\n* Die Duschtasse wird auf die bestehenden Fliesen aufgelegt. Stufe von ca. 3 cm\n* Die Paneele werden im gesamten Duschbereich/Badezimmer über die bestehenden Wandfliesen (raupenförmige Kleberaufbringung) verklebt, Höhe Raum hoch/ca. ____cm . Die Wandpaneele werden im Eck- und Plattenstoßbereich mittels Aluprofilen verbunden; das Standard-Plattenformat beträgt 130 x 280 cm/150 x 255cm.\n* Die verbleibende Wandfläche außerhalb des Paneelbereiches wird gespachtelt und gemalt\n* Der Vinylboden wird über den bestehenden Fliesenboden verklebt verlegt')
+    # Editierbare Zusatzinformationen für PDF - Verweise auf die Textbaustein-Bibliothek
+    leistungsumfang_block_id = db.Column(db.Integer, db.ForeignKey('text_block.id'))
+    objektinformationen_block_id = db.Column(db.Integer, db.ForeignKey('text_block.id'))
+    installationsleistungen_block_id = db.Column(db.Integer, db.ForeignKey('text_block.id'))
     
     # Beziehungen
     quote_items = db.relationship('QuoteItem', backref='quote', lazy=True, cascade='all, delete-orphan', order_by='QuoteItem.position_number')
     
+    # Texte werden über den Baustein-Cache gelesen und beim Bearbeiten neu versioniert
+    leistungsumfang = text_block_property('leistungsumfang_block_id', 'leistungsumfang')
+    objektinformationen = text_block_property('objektinformationen_block_id', 'objektinformationen')
+    installationsleistungen = text_block_property('installationsleistungen_block_id', 'installationsleistungen')
+    
+    def __init__(self, **kwargs):
+        # Standardtexte für neue Angebote (früher Spalten-Defaults) - None übernimmt keinen Standardtext
+        for kind, content in DEFAULT_QUOTE_TEXTS.items():
+            if kind not in kwargs and f'{kind}_block_id' not in kwargs:
+                kwargs[kind] = content
+        super().__init__(**kwargs)
+    
+    @classmethod
+    def list_columns(cls):
+        """Spalten für Listenansichten (für load_only)"""
+        return (cls.id, cls.quote_number, cls.customer_id, cls.project_description,
+                cls.status, cls.total_amount, cls.valid_until, cls.created_at)
+    
     def calculate_base_total(self):
         """Berechnet die Gesamtsumme ohne Aufschlag - einfach die Summe aller Gesamtpreise der Hauptpositionen"""
         return sum(item.total_price for item in self.quote_items)
@@ -150,11 +352,30 @@ class Quote(db.Model):
     
     def calculate_total(self):
         """Berechnet die Gesamtsumme aller Positionen mit Aufschlag und abzüglich Rabatt"""
-        net_total = self.calculate_net_total()
-        markup_amount = self.calculate_markup_amount()
-        total_with_markup = net_total + markup_amount
-        discount_amount = self.calculate_discount_amount()
-        return total_with_markup - discount_amount
+        return self.total_from_net(self.calculate_net_total())
+    
+    def total_from_net(self, net_total):
+        """Gesamtsumme aus einer Nettosumme: Aufschlag auf die Nettosumme, Rabatt auf die Summe inkl. Aufschlag"""
+        total_with_markup = net_total
+        if self.markup_percentage and self.markup_percentage > 0:
+            total_with_markup += net_total * (self.markup_percentage / 100)
+        if self.discount_percentage and self.discount_percentage > 0:
+            return total_with_markup - total_with_markup * (self.discount_percentage / 100)
+        return total_with_markup
+    
+    def query_net_total(self):
+        """Nettosumme per Aggregat-Abfrage - ohne Positionen und Unterpositionen zu laden (für Massenänderungen)"""
+        sub_item_total = db.session.query(db.func.sum(QuoteSubItem.price)).filter(
+            QuoteSubItem.quote_item_id == QuoteItem.id
+        ).correlate(QuoteItem).scalar_subquery()
+        has_sub_items = db.session.query(QuoteSubItem.id).filter(
+            QuoteSubItem.quote_item_id == QuoteItem.id
+        ).correlate(QuoteItem).exists()
+        net_total = db.session.query(db.func.sum(db.case(
+            (has_sub_items, sub_item_total),
+            else_=QuoteItem.quantity * QuoteItem.unit_price
+        ))).filter(QuoteItem.quote_id == self.id).scalar()
+        return net_total or 0.0
     
     def calculate_markup_amount(self):
         """Berechnet den Aufschlagsbetrag basierend auf der echten Nettosumme"""
@@ -178,6 +399,10 @@ class Quote(db.Model):
         db.session.commit()
 
 class QuoteItem(db.Model):
+    __table_args__ = (
+        db.Index('ix_quote_item_quote_id_position_number', 'quote_id', 'position_number'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     quote_id = db.Column(db.Integer, db.ForeignKey('quote.id'), nullable=False)
     quantity = db.Column(db.Float, nullable=False, default=1.0)
@@ -190,7 +415,7 @@ class QuoteItem(db.Model):
     item_type = db.Column(db.String(20), default='standard')  # standard, arbeitsposition, etc.
     
     # Beziehung
-    sub_items = db.relationship('QuoteSubItem', backref='quote_item', lazy=True, cascade='all, delete-orphan', order_by='QuoteSubItem.sub_number')
+    sub_items = db.relationship('QuoteSubItem', backref='quote_item', lazy=True, cascade='all, delete-orphan', order_by='[QuoteSubItem.sub_position, QuoteSubItem.id]')
     
     def calculate_price(self):
         """Berechnet den Preis basierend auf Menge und Einzelpreis"""
@@ -213,10 +438,48 @@ class QuoteItem(db.Model):
             return base_price * markup_factor
         return base_price
 
+_QUANTITY_PREFIX = re.compile(r'^([\d,\.]+)')
+
+
+def parse_quantity(text):
+    """Zahl aus einer Mengenangabe (z.B. "2,5" oder "2.5m²" -> 2.5); None, wenn keine Zahl erkennbar ist"""
+    if text is None:
+        return None
+    if isinstance(text, (int, float)):
+        return float(text)
+    text = str(text).strip()
+    if not text:
+        return None
+    try:
+        return float(text.replace(',', '.'))
+    except ValueError:
+        pass
+    # Zahl am Anfang des Textes (Einheit oder Zusatz dahinter)
+    match = _QUANTITY_PREFIX.match(text)
+    if match:
+        try:
+            return float(match.group(1).replace(',', '.'))
+        except ValueError:
+            pass
+    return None
+
+
+def sub_position_from_number(sub_number):
+    """Sortierschlüssel aus einer Unterpositionsnummer ("3.12" -> 12); None ohne Zahl am Ende"""
+    last_part = str(sub_number or '').strip().rsplit('.', 1)[-1]
+    return int(last_part) if last_part.isdigit() else None
+
+
 class QuoteSubItem(db.Model):
+    __table_args__ = (
+        db.Index('ix_quote_sub_item_quote_item_id_sub_number', 'quote_item_id', 'sub_number'),
+        db.Index('ix_quote_sub_item_quote_item_id_sub_position', 'quote_item_id', 'sub_position'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     quote_item_id = db.Column(db.Integer, db.ForeignKey('quote_item.id'), nullable=False)
     sub_number = db.Column(db.String(10), nullable=False)
+    sub_position = db.Column(db.Integer, nullable=False, default=0)  # Sortierschlüssel (1.10 nach 1.9)
     description = db.Column(db.Text, nullable=False)
     item_type = db.Column(db.String(20), nullable=False, default='bestellteil')
     
@@ -224,7 +487,8 @@ class QuoteSubItem(db.Model):
     requires_order = db.Column(db.Boolean, default=False)
     supplier = db.Column(db.String(200))
     part_number = db.Column(db.String(100))
-    part_quantity = db.Column(db.String(50), default='1')
+    part_quantity = db.Column(db.String(50), default='1')  # Text für die Anzeige
+    part_quantity_value = db.Column(db.Float, default=1.0)  # part_quantity als Zahl (wird beim Setzen gepflegt)
     part_price = db.Column(db.Float, default=0.0)
     
     # Felder für Arbeitsvorgang
@@ -232,29 +496,41 @@ class QuoteSubItem(db.Model):
     hourly_rate = db.Column(db.Float, default=95.0)
     
     # Felder für Sonstiges
-    quantity = db.Column(db.String(50), default='')
+    quantity = db.Column(db.String(50), default='')  # Text für die Anzeige
+    quantity_value = db.Column(db.Float)  # quantity als Zahl (wird beim Setzen gepflegt)
     unit_price = db.Column(db.Float, default=0.0)
     
     # Berechneter Preis
     price = db.Column(db.Float, default=0.0)
     
+    @validates('quantity', 'part_quantity')
+    def _store_quantity_value(self, key, value):
+        """Hält die numerischen Mengen-Spalten beim Schreiben der Mengentexte aktuell"""
+        setattr(self, f'{key}_value', parse_quantity(value))
+        return value
+    
+    @validates('sub_number')
+    def _store_sub_position(self, key, value):
+        """Übernimmt den letzten Zahlenteil der Nummer (z.B. "3.12" -> 12) als Sortierschlüssel"""
+        sub_position = sub_position_from_number(value)
+        if sub_position is not None:
+            self.sub_position = sub_position
+        return value
+    
     def calculate_price(self):
         """Berechnet den Preis basierend auf dem Typ der Unterposition"""
         if self.item_type == 'arbeitsvorgang':
             return self.hours * self.hourly_rate
         elif self.item_type == 'sonstiges':
-            try:
-                quantity_num = float(self.quantity.replace(',', '.')) if self.quantity else 0.0
-                return quantity_num * self.unit_price
-            except (ValueError, AttributeError):
-                return self.unit_price
+            if self.quantity_value is not None:
+                return self.quantity_value * self.unit_price
+            # Keine Zahl erkennbar: leere Menge zählt 0, sonstiger Text als Pauschale
+            return self.unit_price if self.quantity else 0.0
         else:  # bestellteil
-            # Berechne: Menge × Stückpreis
-            try:
-                quantity_num = float(self.part_quantity.replace(',', '.')) if self.part_quantity else 1.0
-                return quantity_num * self.part_price
-            except (ValueError, AttributeError):
-                return self.part_price
+            # Berechne: Menge × Stückpreis (leere oder unlesbare Menge zählt 1)
+            if self.part_quantity_value is not None:
+                return self.part_quantity_value * self.part_price
+            return self.part_price
     
     def update_price(self):
         """Aktualisiert den berechneten Preis"""
@@ -356,6 +632,14 @@ class PositionTemplateSubItem(db.Model):
     def supplier_part_number(self, value):
         """Setter für part_number über supplier_part_number Alias"""
         self.part_number = value
+class MasterDataVersion(db.Model):
+    """Versionszähler pro Stammdaten-Art für den Stammdaten-Cache (master_data_cache.py)"""
+    __tablename__ = 'master_data_version'
+    
+    entity = db.Column(db.String(50), primary_key=True)  # supplier, position_template, ...
+    version = db.Column(db.Integer, nullable=False, default=1)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class CompanySettings(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     setting_name = db.Column(db.String(100), unique=True, nullable=False)
@@ -403,6 +687,10 @@ class CompanySettings(db.Model):
 
 class QuoteRejection(db.Model):
     """Model für Angebots-Ablehnungen mit Grund"""
+    __table_args__ = (
+        db.Index('ix_quote_rejection_quote_id', 'quote_id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     quote_id = db.Column(db.Integer, db.ForeignKey('quote.id'), nullable=False)
     rejection_reason = db.Column(db.Text, nullable=False)
@@ -411,8 +699,49 @@ class QuoteRejection(db.Model):
     # Beziehung
     quote = db.relationship('Quote', backref=db.backref('rejection', uselist=False))
 
+# Aufbau des Snapshot-Dokuments - ältere Snapshots werden von den Lesern ignoriert
+QUOTE_SNAPSHOT_VERSION = 1
+
+class QuoteSnapshot(db.Model):
+    """Unveränderliche Kopie eines angenommenen Angebots als JSON-Dokument
+    
+    Wird beim Annehmen geschrieben (quote_snapshot.py) und enthält Positionen, Unterpositionen,
+    Summen und Kosten nach Typ. Auftragsansicht, Rechnungen und PDFs lesen angenommene Angebote
+    aus dieser einen Zeile statt aus QuoteItem/QuoteSubItem.
+    """
+    __table_args__ = (
+        db.Index('ix_quote_snapshot_quote_id', 'quote_id', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    quote_id = db.Column(db.Integer, db.ForeignKey('quote.id'), nullable=False)
+    schema_version = db.Column(db.Integer, nullable=False, default=QUOTE_SNAPSHOT_VERSION)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Eigene Typ-Instanz: JSONType ist per MutableList.as_mutable an Listen gebunden
+    document = db.Column(db.JSON().with_variant(JSONB(), 'postgresql'), nullable=False)
+    
+    # Beziehung
+    quote = db.relationship('Quote', backref=db.backref('snapshot', uselist=False, cascade='all, delete-orphan'))
+    
+    @staticmethod
+    def document_for(quote):
+        """Snapshot-Dokument eines angenommenen Angebots (None = live aus den Positionen lesen)"""
+        if quote is None or quote.status != 'Angenommen':
+            return None
+        snapshot = quote.snapshot
+        if snapshot is None or snapshot.schema_version != QUOTE_SNAPSHOT_VERSION:
+            return None
+        return snapshot.document
+
 class Order(db.Model):
     """Model für Aufträge - Realisierung von Angeboten"""
+    # Indizes für Dashboard (anstehende Aufträge) und Auftragsliste
+    __table_args__ = (
+        db.Index('ix_order_status_start_date', 'status', 'start_date'),
+        db.Index('ix_order_created_at', 'created_at'),
+        db.Index('ix_order_quote_id', 'quote_id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     order_number = db.Column(db.String(50), unique=True, nullable=False)
     quote_id = db.Column(db.Integer, db.ForeignKey('quote.id'), nullable=False)
@@ -430,6 +759,12 @@ class Order(db.Model):
     # Beziehung
     quote = db.relationship('Quote', backref=db.backref('order', uselist=False))
     
+    @classmethod
+    def list_columns(cls):
+        """Spalten für Listenansichten (für load_only)"""
+        return (cls.id, cls.order_number, cls.quote_id, cls.status,
+                cls.start_date, cls.created_at)
+    
     @property
     def customer(self):
         """Direkter Zugriff auf den Kunden über das verknüpfte Angebot"""
@@ -489,6 +824,14 @@ class Order(db.Model):
 
 class SupplierOrder(db.Model):
     """Model für Lieferantenbestellungen"""
+    __table_args__ = (
+        db.Index('ix_supplier_order_status_order_date', 'status', 'order_date'),
+        db.Index('ix_supplier_order_quote_id', 'quote_id'),
+        db.Index('ix_supplier_order_order_id', 'order_id'),
+        db.Index('ix_supplier_order_supplier_name_status', 'supplier_name', 'status'),
+        db.Index('ix_supplier_order_purchase_run', 'purchase_run'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     quote_id = db.Column(db.Integer, db.ForeignKey('quote.id'), nullable=False)
     order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=True)  # Verknüpfung zum Auftrag
@@ -498,6 +841,8 @@ class SupplierOrder(db.Model):
     confirmation_date = db.Column(db.DateTime)
     delivery_date = db.Column(db.Date)
     notes = db.Column(db.Text)
+    purchase_run = db.Column(db.String(30))  # Sammelbestellung: gemeinsam an den Lieferanten geschickte Bestellungen
+    email_status = db.Column(db.String(20))  # E-Mail-Versand: In Warteschlange, Gesendet, Fehlgeschlagen
     
     # Beziehungen
     quote = db.relationship('Quote', backref='supplier_orders')
@@ -506,6 +851,10 @@ class SupplierOrder(db.Model):
 
 class SupplierOrderItem(db.Model):
     """Model für einzelne Positionen einer Lieferantenbestellung"""
+    __table_args__ = (
+        db.Index('ix_supplier_order_item_supplier_order_id', 'supplier_order_id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     supplier_order_id = db.Column(db.Integer, db.ForeignKey('supplier_order.id'), nullable=False)
     sub_number = db.Column(db.String(10), nullable=False)
@@ -517,14 +866,42 @@ class SupplierOrderItem(db.Model):
     # Beziehung zu ursprünglicher Unterposition
     quote_sub_item = db.relationship('QuoteSubItem', backref='supplier_order_items')
 
+class OutboundEmail(db.Model):
+    """Ausgehende E-Mail in der Warteschlange (Versand im Hintergrund, siehe mail_queue.py)"""
+    __table_args__ = (
+        db.Index('ix_outbound_email_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+    
+    STATUS_PENDING = 'Wartend'
+    STATUS_SENDING = 'Wird gesendet'
+    STATUS_SENT = 'Gesendet'
+    STATUS_FAILED = 'Fehlgeschlagen'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(200), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    html_body = db.Column(db.Text)
+    plain_body = db.Column(db.Text, nullable=False)
+    supplier_order_ids = db.Column(JSONType, default=list)  # Bestellungen, deren Status nach dem Versand aktualisiert wird
+    status = db.Column(db.String(20), nullable=False, default='Wartend')  # Wartend, Wird gesendet, Gesendet, Fehlgeschlagen
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)  # nächster Versuch bzw. Ende der Sperre beim Senden
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
 class WorkInstruction(db.Model):
     """Model für Arbeitsanweisungen"""
+    __table_args__ = (
+        db.Index('ix_work_instruction_order_id', 'order_id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
     instruction_number = db.Column(db.String(50), unique=True, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    created_by = db.Column(db.String(5000))  # Wer hat die Anweisung erstellt
+    created_by_block_id = db.Column(db.Integer, db.ForeignKey('text_block.id'))  # Installationsleistungen (Textbaustein)
     status = db.Column(db.String(20), default='Erstellt')  # Erstellt, In Bearbeitung, Abgeschlossen
     
     # Arbeitsinhalt
@@ -541,7 +918,7 @@ class WorkInstruction(db.Model):
     pdf_path = db.Column(db.String(255))  # Pfad zur gespeicherten PDF-Datei
     has_photos = db.Column(db.Boolean, default=False)  # Wurden Fotos eingefügt
     has_3d_plan = db.Column(db.Boolean, default=False)  # Wurde 3D-Plan eingefügt
-    photo_paths = db.Column(db.Text)  # JSON-Array mit Foto-Pfaden
+    photo_paths = db.deferred(db.Column(MutableList.as_mutable(JSONType)), group='work_instruction_data')  # Liste der Foto-Pfade
     plan_path = db.Column(db.String(255))  # Pfad zum 3D-Plan oder technischen Plan
     
     # Ausführung/Dokumentation
@@ -552,13 +929,17 @@ class WorkInstruction(db.Model):
     quality_check = db.Column(db.Boolean, default=False)  # Qualitätskontrolle durchgeführt
     customer_signature = db.Column(db.Boolean, default=False)  # Kunde hat abgenommen
     
-    # Gespeicherte Arbeitsschritte und Teile (als JSON)
-    work_steps_data = db.Column(db.Text)  # JSON-Array mit bearbeiteten Arbeitsschritten
-    work_parts_data = db.Column(db.Text)  # JSON-Array mit bearbeiteten Teilen
+    # Gespeicherte Arbeitsschritte und Teile (JSON-Spalten, verzögert geladen)
+    # MutableList erkennt append/remove, damit Änderungen ohne Neuzuweisung gespeichert werden
+    work_steps_data = db.deferred(db.Column(MutableList.as_mutable(JSONType)), group='work_instruction_data')  # Liste der bearbeiteten Arbeitsschritte
+    work_parts_data = db.deferred(db.Column(MutableList.as_mutable(JSONType)), group='work_instruction_data')  # Liste der bearbeiteten Teile
     
     # Beziehung
     order = db.relationship('Order', backref=db.backref('work_instruction', uselist=False))
     
+    # Installationsleistungen - übernimmt beim Anlegen den Baustein des Angebots (ohne Kopie)
+    created_by = text_block_property('created_by_block_id', 'installationsleistungen')
+    
     def generate_instruction_number(self):
         """Generiert eine eindeutige Arbeitsanweisungs-Nummer"""
         from datetime import datetime
@@ -618,6 +999,14 @@ class AcquisitionChannel(db.Model):
 
 class Invoice(db.Model):
     """Rechnungsmodell für Anzahlungs- und Schlussrechnungen"""
+    # Indizes für Rechnungsliste, Überfällig-Statistik und Reminder-Prüfung
+    __table_args__ = (
+        db.Index('ix_invoice_status_due_date', 'status', 'due_date'),
+        db.Index('ix_invoice_created_at', 'created_at'),
+        db.Index('ix_invoice_order_id_invoice_type', 'order_id', 'invoice_type'),
+        db.Index('ix_invoice_customer_id', 'customer_id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     invoice_number = db.Column(db.String(50), unique=True, nullable=False)  # z.B. "R-2025-001"
     order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=True)  # Für allgemeine Rechnungen optional
@@ -660,7 +1049,7 @@ class Invoice(db.Model):
     # Neue Felder für Teilzahlungen
     paid_amount = db.Column(db.Float, default=0.0)  # Bereits bezahlter Betrag
     payment_comment = db.Column(db.Text, nullable=True)  # Kommentar zur Teilzahlung
-    service_description = db.Column(db.Text, nullable=True)  # Leistungsbeschreibung für allgemeine Rechnungen
+    service_description = db.deferred(db.Column(db.Text, nullable=True), group='invoice_texts')  # Leistungsbeschreibung für allgemeine Rechnungen
     
     # Neue Felder für erweiterte allgemeine Rechnungen
     document_title = db.Column(db.String(255))  # Dokumentbezeichnung für PDF-Header
@@ -844,6 +1233,11 @@ class Invoice(db.Model):
         if not self.order or not self.order.quote:
             return 0.0
         
+        document = QuoteSnapshot.document_for(self.order.quote)
+        if document:
+            costs = document['costs']
+            return costs['bestellteil']['calculated_price'] + costs['sonstiges']['calculated_price']
+        
         material_cost = 0.0
         for item in self.order.quote.quote_items:
             for sub_item in item.sub_items:
@@ -856,6 +1250,10 @@ class Invoice(db.Model):
         if not self.order or not self.order.quote:
             return 0.0
         
+        document = QuoteSnapshot.document_for(self.order.quote)
+        if document:
+            return document['costs']['arbeitsvorgang']['calculated_price']
+        
         labor_cost = 0.0
         for item in self.order.quote.quote_items:
             for sub_item in item.sub_items:
@@ -868,6 +1266,10 @@ class Invoice(db.Model):
         if not self.order or not self.order.quote:
             return 0.0
         
+        document = QuoteSnapshot.document_for(self.order.quote)
+        if document:
+            return document['costs']['arbeitsvorgang']['hours']
+        
         total_hours = 0.0
         for item in self.order.quote.quote_items:
             for sub_item in item.sub_items:
@@ -988,6 +1390,11 @@ class LoginAdmin(db.Model):
 
 class InvoiceReminder(db.Model):
     """Reminder für fällige Rechnungserstellung"""
+    __table_args__ = (
+        db.Index('ix_invoice_reminder_is_dismissed_due_date', 'is_dismissed', 'due_date'),
+        db.Index('ix_invoice_reminder_order_id', 'order_id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
     reminder_type = db.Column(db.String(20), nullable=False)  # 'anzahlung' oder 'schluss'
@@ -1068,8 +1475,30 @@ class Article(db.Model):
         return self.name
 
 
+class WorkStep(db.Model):
+    """Arbeitsschritt mit Standardzeit für die Angebotserstellung (Katalog, siehe work_steps.py)"""
+    __tablename__ = 'work_step'
+    __table_args__ = (
+        db.Index('ix_work_step_category_sort_order', 'category', 'sort_order'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    category = db.Column(db.String(100), nullable=False)  # z.B. Abbruch, Duschtasse, WC
+    category_order = db.Column(db.Integer, nullable=False, default=0)  # Reihenfolge der Kategorien
+    name = db.Column(db.String(200), nullable=False)
+    default_hours = db.Column(db.Float, nullable=False, default=0.0)
+    sort_order = db.Column(db.Integer, nullable=False, default=0)  # Reihenfolge innerhalb der Kategorie
+    
+    def __repr__(self):
+        return f'<WorkStep {self.category}: {self.name}>'
+
+
 class InvoicePosition(db.Model):
     """Model für Rechnungspositionen"""
+    __table_args__ = (
+        db.Index('ix_invoice_position_invoice_id_position_number', 'invoice_id', 'position_number'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     invoice_id = db.Column(db.Integer, db.ForeignKey('invoice.id'), nullable=False)
     position_number = db.Column(db.Integer, nullable=False)  # Positionsnummer
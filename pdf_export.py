@@ -12,8 +12,13 @@ from io import BytesIO
 from models import Quote
 import os
 import json
+import logging
 from pypdf import PdfWriter, PdfReader
 from utils import format_currency_de, get_customer_manager_contact
+from metrics import track_pdf_render
+from quote_snapshot import quote_positions, quote_summary
+
+logger = logging.getLogger(__name__)
 
 class PDFExporter:
     """Klasse für PDF-Export von Angeboten"""
@@ -82,6 +87,7 @@ class PDFExporter:
         
         return paragraphs if len(paragraphs) > 1 else (paragraphs[0] if paragraphs else Paragraph("-", self.styles['Normal']))
     
+    @track_pdf_render('angebot')
     def export_quote(self, quote_id):
         """Exportiert ein Angebot als PDF"""
         quote = Quote.query.get_or_404(quote_id)
@@ -160,7 +166,7 @@ class PDFExporter:
                 logo_height = logo_width / 2.81  # Berechne Höhe basierend auf Original-Seitenverhältnis
                 logo_element = Image(logo_path, width=logo_width, height=logo_height)
             except Exception as e:
-                print(f"Fehler beim Laden des Logos: {e}")
+                logger.warning("Fehler beim Laden des Logos: %s", e)
                 logo_element = None
         
         # Header-Tabelle mit Logo und Firmendaten
@@ -284,7 +290,8 @@ class PDFExporter:
             alignment=TA_RIGHT
         )
         
-        for i, item in enumerate(quote.quote_items, 1):
+        # Angenommene Angebote aus dem Snapshot, sonst live aus den Positionen
+        for i, item in enumerate(quote_positions(quote), 1):
             pos_number = item.position_number or i
             
             # Bestimme Preisanzeigemodus
@@ -364,11 +371,12 @@ class PDFExporter:
     def _build_price_summary(self, quote):
         """Erstellt die Preiszusammenfassung"""
         # Berechne detaillierte Preissummen
-        net_total = quote.calculate_net_total()  # Basis ohne Aufschlag
-        markup_amount = quote.calculate_markup_amount()  # Aufschlag
+        summary = quote_summary(quote)  # angenommene Angebote aus dem Snapshot
+        net_total = summary['net_total']  # Basis ohne Aufschlag
+        markup_amount = summary['markup_amount']  # Aufschlag
         total_with_markup = net_total + markup_amount  # Summe mit Aufschlag
-        discount_amount = quote.calculate_discount_amount()  # Rabatt
-        final_total = quote.calculate_total()  # Finale Summe nach Rabatt
+        discount_amount = summary['discount_amount']  # Rabatt
+        final_total = summary['total']  # Finale Summe nach Rabatt
         
         ust_betrag = final_total * 0.20  # 20% USt auf finale Summe
         brutto_summe = final_total + ust_betrag
@@ -567,6 +575,7 @@ Die von uns gelieferte, montierte oder sonst übergebene Ware bleibt bis zur vol
         
         return [Spacer(1, 1*cm), signature_table]
     
+    @track_pdf_render('arbeitsanweisung')
     def export_work_instruction(self, order_id):
         """Exportiert eine Arbeitsanweisung als PDF"""
         from models import Order, SupplierOrderItem, QuoteSubItem
@@ -575,6 +584,8 @@ Die von uns gelieferte, montierte oder sonst übergebene Ware bleibt bis zur vol
         work_instruction = order.work_instruction
         quote = order.quote
         customer = quote.customer
+        # Positionen einmal lesen - bei angenommenen Angeboten aus dem Snapshot
+        positions = quote_positions(quote) if quote else []
         
         if not work_instruction:
             raise ValueError("Keine Arbeitsanweisung für diesen Auftrag vorhanden")
@@ -696,18 +707,12 @@ Die von uns gelieferte, montierte oder sonst übergebene Ware bleibt bis zur vol
             story.append(Spacer(1, 0.5*cm))
         
         # 2b. Arbeitsschritte - gespeicherte Daten haben Vorrang vor Quote-Daten
-        work_steps = []
-        if work_instruction.work_steps_data:
-            # Verwende gespeicherte Arbeitsschritte
-            try:
-                work_steps = json.loads(work_instruction.work_steps_data)
-            except:
-                work_steps = []
+        work_steps = list(work_instruction.work_steps_data or [])
         
         # Falls keine gespeicherten Arbeitsschritte vorhanden, lade aus Quote
         if not work_steps and quote:
             step_number = 1
-            for item in quote.quote_items:
+            for item in positions:
                 for sub_item in item.sub_items:
                     if sub_item.item_type == 'arbeitsvorgang':
                         work_steps.append({
@@ -741,15 +746,10 @@ Die von uns gelieferte, montierte oder sonst übergebene Ware bleibt bis zur vol
             story.append(Spacer(1, 0.8*cm))
         
         # 2c. Teile/Materialien: gespeicherte Daten haben Vorrang vor Quote-Daten
-        work_parts = []
-        if work_instruction.work_parts_data:
-            try:
-                work_parts = json.loads(work_instruction.work_parts_data)
-            except:
-                work_parts = []
+        work_parts = list(work_instruction.work_parts_data or [])
         # Falls keine gespeicherten Teile vorhanden, lade aus Quote
         if not work_parts and quote:
-            for item in quote.quote_items:
+            for item in positions:
                 for sub_item in item.sub_items:
                     if sub_item.item_type == 'bestellteil':
                         work_parts.append({
@@ -786,7 +786,7 @@ Die von uns gelieferte, montierte oder sonst übergebene Ware bleibt bis zur vol
         story.append(Paragraph("3. SONSTIGE MATERIALIEN", self.heading_style))
         story.append(Spacer(1, 0.3*cm))
         sonstige = []
-        for item in quote.quote_items:
+        for item in positions:
             for sub_item in item.sub_items:
                 if sub_item.item_type == 'sonstiges':
                     sonstige.append([
@@ -816,7 +816,7 @@ Die von uns gelieferte, montierte oder sonst übergebene Ware bleibt bis zur vol
         # Tatsächliche Fotos anzeigen falls vorhanden
         if work_instruction.photo_paths:
             try:
-                photo_paths = json.loads(work_instruction.photo_paths) if isinstance(work_instruction.photo_paths, str) else work_instruction.photo_paths
+                photo_paths = work_instruction.photo_paths
                 if photo_paths:
                     # Upload-Ordner bestimmen
                     upload_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'uploads')
@@ -990,7 +990,7 @@ Die von uns gelieferte, montierte oder sonst übergebene Ware bleibt bis zur vol
                     final_buffer = self._merge_pdfs(buffer, plan_pdf_path)
                     return final_buffer
                 except Exception as e:
-                    print(f"Fehler beim Anhängen des Plans: {e}")
+                    logger.warning("Fehler beim Anhängen des Plans: %s", e)
                     # Fallback: Nur die Arbeitsanweisung zurückgeben
                     buffer.seek(0)
                     return buffer
@@ -1022,11 +1022,12 @@ Die von uns gelieferte, montierte oder sonst übergebene Ware bleibt bis zur vol
             return final_buffer
             
         except Exception as e:
-            print(f"Fehler beim Zusammenfügen der PDFs: {e}")
+            logger.warning("Fehler beim Zusammenfügen der PDFs: %s", e)
             # Fallback: Nur die Arbeitsanweisung zurückgeben
             work_instruction_buffer.seek(0)
             return work_instruction_buffer
 
+    @track_pdf_render('rechnung_einfach')
     def export_invoice(self, invoice_id):
         """Exportiert eine Rechnung als PDF"""
         from models import Invoice
@@ -0,0 +1,181 @@
+"""
+Preisberechnung für Positionsvorlagen (serverseitig, maßgeblich)
+Gleiche Regeln wie bisher im Vorlagen-Selector (JavaScript):
+    - Bestellteil: Preis = Menge × Grundpreis
+    - Sonstiges ohne Formel: Preis = Menge × Grundpreis
+    - Arbeitsvorgang ohne Formel: Preis = Stunden × Stundensatz
+    - Sonstiges/Arbeitsvorgang mit Formel: Menge = Formelergebnis / 10000, Preis = Grundpreis × Menge
+    - ungültige Formel: Menge = 1, Preis = Grundpreis
+
+Formeln werden einmal geparst, geprüft (nur Zahlen, Grundrechenarten und die Maß-Variablen)
+und als kompilierter Ausdruck zwischengespeichert; ausgewertet wird ohne Zugriff auf Builtins.
+Alle Zahlen werden als float gerechnet: Potenzen wie 9**9**7 laufen dann in einen
+OverflowError statt beliebig große Ganzzahlen zu berechnen. Formeln stammen immer aus der
+Vorlage, nie aus dem Request.
+"""
+import ast
+import math
+import re
+from functools import lru_cache
+
+# Variablen in Formeln (deutsch und englisch für Rückwärtskompatibilität)
+FORMULA_VARIABLES = {
+    'laenge': 'length', 'breite': 'width', 'hoehe': 'height', 'flaeche': 'area', 'volumen': 'volume',
+    'length': 'length', 'width': 'width', 'height': 'height', 'area': 'area', 'volume': 'volume',
+}
+# Formelergebnis (cm²-basiert) -> Menge
+FORMULA_DIVISOR = 10000
+DEFAULT_HOURLY_RATE = 95.0
+NO_FORMULA = 'Keine Formel'
+MAX_FORMULA_LENGTH = 500
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Name, ast.Load,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.UAdd, ast.USub,
+)
+_NUMBER_PATTERN = re.compile(r'\s*[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?')
+
+
+def parse_number(value, default=0.0):
+    """
+    Zahl wie parseFloat() im Browser (führende Zahl, Rest ignoriert); 0/leer/ungültig -> Standardwert.
+    NaN und Unendlich (JSON erlaubt NaN/Infinity, "1e400" läuft über) gelten als ungültig.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        number = float(value)
+    else:
+        match = _NUMBER_PATTERN.match(str(value or ''))
+        if not match:
+            return default
+        number = float(match.group(0))
+    if not math.isfinite(number):
+        return default
+    return number or default
+
+
+def has_formula(formula):
+    """Leere Formel und 'Keine Formel' bedeuten: ohne Formel rechnen"""
+    return bool(formula and formula.strip() and formula.strip() != NO_FORMULA)
+
+
+@lru_cache(maxsize=1024)
+def compile_formula(formula):
+    """Formel einmal parsen und prüfen; gibt den kompilierten Ausdruck oder None (ungültig) zurück"""
+    if len(formula) > MAX_FORMULA_LENGTH:
+        return None
+    try:
+        tree = ast.parse(formula.strip(), mode='eval')
+    except (SyntaxError, ValueError, RecursionError, MemoryError):
+        return None
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            return None
+        if isinstance(node, ast.Name) and node.id not in FORMULA_VARIABLES:
+            return None
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                return None
+            node.value = float(node.value)  # keine Ganzzahl-Arithmetik (unbegrenzte Potenzen)
+    return compile(tree, '<formel>', 'eval')
+
+
+def formula_variables(length=0.0, width=0.0, height=0.0):
+    """Maß-Variablen für die Formelauswertung (Maße in cm, Fläche in m², Volumen in m³)"""
+    values = {
+        'length': length,
+        'width': width,
+        'height': height,
+        'area': length * width / 10000,
+        'volume': length * width * height / 1000000,
+    }
+    return {name: values[key] for name, key in FORMULA_VARIABLES.items()}
+
+
+def evaluate_formula(formula, variables):
+    """Wertet eine Formel aus; None bei ungültiger Formel oder Rechenfehler (z.B. Division durch 0)"""
+    code = compile_formula(formula)
+    if code is None:
+        return None
+    try:
+        result = float(eval(code, {'__builtins__': {}}, variables))
+    except (ArithmeticError, ValueError, TypeError):  # u.a. OverflowError, komplexe Ergebnisse
+        return None
+    return result if math.isfinite(result) else None
+
+
+def price_subitem(item_type, formula, values, variables):
+    """
+    Menge und Preis einer Unterposition.
+    values: base_price, quantity, hours, hourly_rate (Eingaben aus dem Selector, Zahlen oder Texte)
+    Gibt (Menge, Preis, per_formula) zurück - per_formula: Menge stammt aus der Formel.
+    """
+    base_price = parse_number(values.get('base_price'))
+    if item_type == 'bestellteil' or (item_type == 'sonstiges' and not has_formula(formula)):
+        quantity = parse_number(values.get('quantity'), 1.0)
+        return quantity, quantity * base_price, False
+    if item_type == 'arbeitsvorgang' and not has_formula(formula):
+        hours = parse_number(values.get('hours'))
+        hourly_rate = parse_number(values.get('hourly_rate'), DEFAULT_HOURLY_RATE)
+        return hours, hours * hourly_rate, False
+    if item_type in ('sonstiges', 'arbeitsvorgang'):
+        result = evaluate_formula(formula, variables)
+        if result is None:
+            return 1.0, base_price, False
+        quantity = result / FORMULA_DIVISOR
+        return quantity, base_price * quantity, True
+    return 0.0, 0.0, False
+
+
+def _template_defaults(subitem):
+    """Eingabewerte einer Vorlagen-Unterposition, wie sie der Selector vorbelegt"""
+    return {
+        'base_price': subitem.price_per_unit or 0,
+        'quantity': (subitem.part_quantity or '1') if subitem.item_type == 'bestellteil' else (subitem.quantity or '1'),
+        'hours': subitem.hours or 0,
+        'hourly_rate': subitem.hourly_rate or DEFAULT_HOURLY_RATE,
+    }
+
+
+def price_template(template, parameters):
+    """
+    Preist eine Vorlage für einen Parametersatz.
+    parameters: length, width, height und optional subitems = [{source_index, base_price, quantity,
+    hours, hourly_rate}] (bearbeitete Zeilen; ohne Angabe alle Unterpositionen mit Vorlagenwerten)
+    """
+    variables = formula_variables(
+        parse_number(parameters.get('length')),
+        parse_number(parameters.get('width')),
+        parse_number(parameters.get('height')),
+    )
+    rows = parameters.get('subitems')
+    if rows is None:
+        rows = [{'source_index': index} for index in range(len(template.subitems))]
+
+    priced = []
+    for row in rows:
+        index = row.get('source_index')
+        if isinstance(index, bool) or not isinstance(index, int) or not 0 <= index < len(template.subitems):
+            raise ValueError(f'Unbekannte Unterposition: {index}')
+        subitem = template.subitems[index]
+        values = {**_template_defaults(subitem), **{k: v for k, v in row.items() if k != 'source_index'}}
+        quantity, price, per_formula = price_subitem(subitem.item_type, subitem.formula, values, variables)
+        priced.append({
+            'source_index': index,
+            'quantity': round(quantity, 4),
+            'price': round(price, 2),
+            'per_formula': per_formula,
+        })
+    total = sum(row['price'] for row in priced)
+    if not all(math.isfinite(value) for value in (total, variables['area'], variables['volume'])):
+        raise ValueError('Betrag außerhalb des gültigen Bereichs')
+    return {
+        'area': round(variables['area'], 4),
+        'volume': round(variables['volume'], 4),
+        'subitems': priced,
+        'total': round(total, 2),
+    }
+
+
+def price_template_batch(template, parameter_sets):
+    """Preist eine Vorlage für mehrere Parametersätze (Formeln werden nur einmal kompiliert)"""
+    return [price_template(template, parameters) for parameters in parameter_sets]
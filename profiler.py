@@ -0,0 +1,266 @@
+"""
+Request-Profiler für die Fehlersuche in Produktion
+Ein Admin aktiviert den Profiler für ein Pfad-Muster (optional nur für die eigene Session).
+Die nächsten N passenden Requests werden mit cProfile aufgezeichnet und als .prof-Dateien
+im instance-Ordner abgelegt.
+
+Der Zustand liegt in einer JSON-Datei, damit alle gunicorn-Worker ihn sehen. Jeder Worker
+prüft die Datei höchstens alle STATE_CHECK_INTERVAL Sekunden - ist der Profiler aus, kostet
+ein Request nur einen Vergleich. Sind N Profile aufgezeichnet, schaltet sich der Profiler selbst ab.
+"""
+import os
+import re
+import json
+import time
+import uuid
+import pstats
+import cProfile
+import logging
+from datetime import datetime
+
+from flask import g, request, session
+
+logger = logging.getLogger(__name__)
+
+STATE_CHECK_INTERVAL = 5.0
+STATE_FILENAME = 'profiler.json'
+
+_profile_dir = None
+_state = None
+_state_mtime = None
+_next_state_check = 0.0
+
+
+def _state_path():
+    """Pfad der Zustandsdatei im Profil-Verzeichnis"""
+    return os.path.join(_profile_dir, STATE_FILENAME)
+
+
+def _refresh_state():
+    """Lädt den Profiler-Zustand neu, wenn sich die Datei geändert hat"""
+    global _state, _state_mtime, _next_state_check
+    _next_state_check = time.monotonic() + STATE_CHECK_INTERVAL
+    try:
+        mtime = os.path.getmtime(_state_path())
+    except OSError:
+        _state, _state_mtime = None, None
+        return
+    if mtime == _state_mtime:
+        return
+    try:
+        with open(_state_path(), 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        state['pattern_re'] = re.compile(state['path_pattern'])
+        _state, _state_mtime = state, mtime
+    except (OSError, ValueError, re.error) as e:
+        logger.warning("Profiler-Zustand konnte nicht gelesen werden: %s", e)
+        _state, _state_mtime = None, None
+
+
+def _run_dir(run_id):
+    """Verzeichnis für die Profile eines Laufs"""
+    return os.path.join(_profile_dir, run_id)
+
+
+def _captured_count(run_id):
+    """Anzahl bereits aufgezeichneter Profile eines Laufs (über alle Worker)"""
+    try:
+        return sum(1 for name in os.listdir(_run_dir(run_id)) if name.endswith('.prof'))
+    except OSError:
+        return 0
+
+
+def _stop_if_complete(state):
+    """Beendet den Lauf, sobald max_requests Profile vorliegen; True, wenn er beendet ist"""
+    if _captured_count(state['run_id']) < state['max_requests']:
+        return False
+    try:
+        with open(_state_path(), 'r', encoding='utf-8') as f:
+            current = json.load(f)
+    except (OSError, ValueError):
+        current = None
+    # Nur den eigenen Lauf beenden - ein inzwischen neu gestarteter bleibt aktiv
+    if current and current.get('run_id') == state['run_id']:
+        stop_profiling()
+    else:
+        _refresh_state()
+    return True
+
+
+def _should_profile():
+    """Prüft, ob der aktuelle Request aufgezeichnet werden soll"""
+    if time.monotonic() >= _next_state_check:
+        _refresh_state()
+    state = _state
+    if not state or not state.get('enabled'):
+        return False
+    if request.endpoint == 'static' or request.path.startswith('/admin/profiler'):
+        return False
+    if state.get('admin_id') and session.get('login_admin_id') != state['admin_id']:
+        return False
+    if not state['pattern_re'].search(request.path):
+        return False
+    return not _stop_if_complete(state)
+
+
+def _start_profile():
+    """Startet cProfile, wenn der Request zum aktiven Profiler-Lauf passt"""
+    if _state is None and time.monotonic() < _next_state_check:
+        return
+    if not _should_profile():
+        return
+    g.profiler = cProfile.Profile()
+    g.profiler_run_id = _state['run_id']
+    g.profiler_started = time.perf_counter()
+    g.profiler.enable()
+
+
+def _finish_profile(response):
+    """Beendet cProfile und speichert das Profil samt Metadaten"""
+    profile = g.pop('profiler', None)
+    if profile is None:
+        return response
+    profile.disable()
+
+    duration = time.perf_counter() - g.pop('profiler_started')
+    run_id = g.pop('profiler_run_id')
+    run_dir = _run_dir(run_id)
+    os.makedirs(run_dir, exist_ok=True)
+
+    name = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+    try:
+        profile.dump_stats(os.path.join(run_dir, f'{name}.prof'))
+        with open(os.path.join(run_dir, f'{name}.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'name': name,
+                'run_id': run_id,
+                'method': request.method,
+                'path': request.full_path.rstrip('?'),
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 1),
+                'pid': os.getpid(),
+                'captured_at': datetime.now().isoformat(timespec='seconds'),
+            }, f)
+    except OSError as e:
+        logger.warning("Profil konnte nicht gespeichert werden: %s", e)
+    if _state and _state['run_id'] == run_id:
+        _stop_if_complete(_state)
+    return response
+
+
+def start_profiling(path_pattern, max_requests, admin_id=None):
+    """Aktiviert den Profiler für alle Worker"""
+    re.compile(path_pattern)  # Ungültige Muster sofort melden
+    os.makedirs(_profile_dir, exist_ok=True)
+    state = {
+        'enabled': True,
+        'run_id': datetime.now().strftime('%Y%m%d_%H%M%S'),
+        'path_pattern': path_pattern,
+        'max_requests': max_requests,
+        'admin_id': admin_id,
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+    }
+    with open(_state_path(), 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    _refresh_state()
+    return state
+
+
+def stop_profiling():
+    """Deaktiviert den Profiler für alle Worker"""
+    try:
+        os.remove(_state_path())
+    except OSError:
+        pass
+    _refresh_state()
+
+
+def get_profiler_status():
+    """Aktueller Zustand inkl. Anzahl bereits aufgezeichneter Requests"""
+    _refresh_state()
+    if not _state:
+        return None
+    status = {key: value for key, value in _state.items() if key != 'pattern_re'}
+    status['captured'] = _captured_count(_state['run_id'])
+    return status
+
+
+def list_profiles():
+    """Alle gespeicherten Profile, neueste zuerst"""
+    profiles = []
+    if not _profile_dir or not os.path.isdir(_profile_dir):
+        return profiles
+    for run_id in os.listdir(_profile_dir):
+        run_dir = _run_dir(run_id)
+        if not os.path.isdir(run_dir):
+            continue
+        for filename in os.listdir(run_dir):
+            if filename.endswith('.json'):
+                try:
+                    with open(os.path.join(run_dir, filename), 'r', encoding='utf-8') as f:
+                        profiles.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+    profiles.sort(key=lambda item: item['name'], reverse=True)
+    return profiles
+
+
+def get_profile_path(run_id, name):
+    """Pfad zur .prof-Datei (nur Namen aus list_profiles sind gültig)"""
+    if not re.fullmatch(r'[\w]+', run_id) or not re.fullmatch(r'[\w]+', name):
+        return None
+    path = os.path.join(_run_dir(run_id), f'{name}.prof')
+    return path if os.path.exists(path) else None
+
+
+def _short_filename(filename):
+    """Kürzt Pfade auf den Teil ab site-packages bzw. das Projektverzeichnis"""
+    if 'site-packages' in filename:
+        return filename.split('site-packages' + os.sep, 1)[-1]
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    if filename.startswith(project_dir):
+        return os.path.relpath(filename, project_dir)
+    return filename
+
+
+def get_top_functions(run_id, name, sort_by='cumulative', limit=40):
+    """Top-Funktionen eines Profils (wie pstats print_stats)"""
+    path = get_profile_path(run_id, name)
+    if not path:
+        return None
+    stats = pstats.Stats(path)
+    total_time = stats.total_tt
+    rows = []
+    for (filename, line, function), (cc, nc, tt, ct, callers) in stats.stats.items():
+        rows.append({
+            'function': function,
+            'location': f"{_short_filename(filename)}:{line}",
+            'calls': nc,
+            'primitive_calls': cc,
+            'tottime_ms': tt * 1000,
+            'cumtime_ms': ct * 1000,
+            'percent': ct / total_time * 100 if total_time else 0,
+        })
+    key = 'cumtime_ms' if sort_by == 'cumulative' else 'tottime_ms'
+    rows.sort(key=lambda row: row[key], reverse=True)
+    return {'total_ms': total_time * 1000, 'rows': rows[:limit]}
+
+
+def delete_profiles():
+    """Löscht alle gespeicherten Profile (der Zustand bleibt erhalten)"""
+    import shutil
+    if not os.path.isdir(_profile_dir):
+        return
+    for run_id in os.listdir(_profile_dir):
+        run_dir = _run_dir(run_id)
+        if os.path.isdir(run_dir):
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def init_profiler(app):
+    """Registriert die Profiler-Hooks für die App"""
+    global _profile_dir
+    _profile_dir = os.path.join(app.instance_path, 'profiles')
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
@@ -0,0 +1,339 @@
+"""
+Einkauf: Lieferantenbestellungen aus Angeboten erzeugen und zu Sammelbestellungen bündeln
+    - alle zu bestellenden Bestellteile eines oder mehrerer Angebote mit einer Abfrage
+      (statt Position für Position über die Beziehungen)
+    - Bestellungen je Angebot und Lieferant und ihre Positionen per Bulk-INSERT,
+      bestehende Bestellungen mit einer Abfrage erkannt
+    - offene Bestellungen desselben Lieferanten über alle Projekte als eine Sammelbestellung
+      (eine E-Mail statt einer pro Projekt), gemeinsam per UPDATE als bestellt markiert
+      bzw. über die E-Mail-Warteschlange (mail_queue.py) verschickt
+"""
+import secrets
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, or_
+from sqlalchemy.orm import joinedload, selectinload
+
+from models import db, Quote, QuoteItem, QuoteSubItem, SupplierOrder, SupplierOrderItem
+
+STATUS_OPEN = 'Noch nicht bestellt'
+STATUS_ORDERED = 'Bestellt'
+EMAIL_STATUS_QUEUED = 'In Warteschlange'  # wie mail_queue.EMAIL_STATUS_QUEUED
+
+
+# ===============================
+# BESTELLTEILE SAMMELN
+# ===============================
+
+def collect_orderable_parts(quote_ids):
+    """
+    Alle zu bestellenden Bestellteile (Bestellteil, Bestellung erforderlich, Lieferant gesetzt)
+    der Angebote mit einer Abfrage.
+    Gibt {Angebots-ID: {Lieferant: [{'sub_number', 'description', 'part_number', 'quantity',
+    'quote_sub_item_id'}, ...]}} in Positionsreihenfolge zurück.
+    """
+    quote_ids = list(quote_ids)
+    if not quote_ids:
+        return {}
+    rows = db.session.query(
+        QuoteItem.quote_id, QuoteSubItem.id, QuoteSubItem.sub_number, QuoteSubItem.description,
+        QuoteSubItem.part_number, QuoteSubItem.part_quantity, QuoteSubItem.supplier,
+    ).join(QuoteItem, QuoteSubItem.quote_item_id == QuoteItem.id).filter(
+        QuoteItem.quote_id.in_(quote_ids),
+        QuoteSubItem.item_type == 'bestellteil',
+        QuoteSubItem.requires_order.is_(True),
+        QuoteSubItem.supplier.isnot(None),
+        QuoteSubItem.supplier != '',
+    ).order_by(
+        QuoteItem.quote_id, QuoteItem.position_number, QuoteItem.id, QuoteSubItem.sub_position, QuoteSubItem.id
+    ).all()
+
+    parts = {}
+    for quote_id, sub_item_id, sub_number, description, part_number, part_quantity, supplier in rows:
+        parts.setdefault(quote_id, {}).setdefault(supplier, []).append({
+            'sub_number': sub_number,
+            'description': description,
+            'part_number': part_number or '',
+            'quantity': part_quantity or '1',
+            'quote_sub_item_id': sub_item_id,  # Für Referenz
+        })
+    return parts
+
+
+# ===============================
+# BESTELLUNGEN ANLEGEN
+# ===============================
+
+def create_supplier_orders(quote_ids, order_ids=None, reassign_order=False):
+    """
+    Legt für die Bestellteile der Angebote je Angebot und Lieferant eine Bestellung
+    (Status 'Noch nicht bestellt') samt Positionen an, sofern es noch keine gibt.
+    order_ids: {Angebots-ID: Auftrags-ID} - neue Bestellungen werden dem Auftrag zugeordnet,
+    bestehende ohne Auftrag nachträglich verknüpft (reassign_order=True: auch bereits verknüpfte,
+    z.B. bei erneuter Annahme nach einer Stornierung).
+    Gibt {'parts', 'created', 'linked'} zurück ('parts' wie collect_orderable_parts). Der Aufrufer committet.
+    """
+    order_ids = order_ids or {}
+    parts = collect_orderable_parts(quote_ids)
+    if not parts:
+        return {'parts': parts, 'created': 0, 'linked': 0}
+
+    # Bestehende Bestellungen aller Angebote mit einer Abfrage
+    existing = {}
+    for supplier_order_id, quote_id, supplier_name, order_id in db.session.query(
+        SupplierOrder.id, SupplierOrder.quote_id, SupplierOrder.supplier_name, SupplierOrder.order_id
+    ).filter(SupplierOrder.quote_id.in_(list(parts))).order_by(SupplierOrder.id):
+        existing.setdefault((quote_id, supplier_name), (supplier_order_id, order_id))
+
+    new_keys = [
+        (quote_id, supplier_name)
+        for quote_id, suppliers in parts.items()
+        for supplier_name in suppliers
+        if (quote_id, supplier_name) not in existing
+    ]
+    if new_keys:
+        now = datetime.utcnow()
+        db.session.execute(SupplierOrder.__table__.insert(), [{
+            'quote_id': quote_id,
+            'order_id': order_ids.get(quote_id),
+            'supplier_name': supplier_name,
+            'order_date': now,
+            'status': STATUS_OPEN,  # bleibt unverändert bis die E-Mail versendet wird
+        } for quote_id, supplier_name in new_keys])
+
+        # IDs der neuen Bestellungen über (Angebot, Lieferant) nachschlagen
+        known_ids = [supplier_order_id for supplier_order_id, _ in existing.values()]
+        query = db.session.query(SupplierOrder.id, SupplierOrder.quote_id, SupplierOrder.supplier_name).filter(
+            SupplierOrder.quote_id.in_({quote_id for quote_id, _ in new_keys})
+        )
+        if known_ids:
+            query = query.filter(SupplierOrder.id.notin_(known_ids))
+        new_ids = {(quote_id, supplier_name): supplier_order_id for supplier_order_id, quote_id, supplier_name in query}
+
+        item_rows = [
+            {
+                'supplier_order_id': new_ids[key],
+                'sub_number': part['sub_number'],
+                'description': part['description'],
+                'part_number': part['part_number'],
+                'quantity': part['quantity'],
+                'quote_sub_item_id': part['quote_sub_item_id'],
+            }
+            for key in new_keys
+            for part in parts[key[0]][key[1]]
+        ]
+        db.session.execute(SupplierOrderItem.__table__.insert(), item_rows)
+
+    # Bestehende Bestellungen dem Auftrag zuordnen - ein UPDATE
+    link = {
+        supplier_order_id: order_ids[quote_id]
+        for (quote_id, _), (supplier_order_id, order_id) in existing.items()
+        if quote_id in parts and order_ids.get(quote_id) and (reassign_order or not order_id)
+        and order_id != order_ids[quote_id]
+    }
+    if link:
+        SupplierOrder.query.filter(SupplierOrder.id.in_(list(link))).update({
+            SupplierOrder.order_id: case(link, value=SupplierOrder.id),
+        }, synchronize_session=False)
+
+    # Bereits geladene Bestellungen der Angebote sind veraltet
+    for quote in db.session.identity_map.values():
+        if isinstance(quote, Quote) and quote.id in parts:
+            db.session.expire(quote, ['supplier_orders'])
+    return {'parts': parts, 'created': len(new_keys), 'linked': len(link)}
+
+
+# ===============================
+# SAMMELBESTELLUNGEN
+# ===============================
+
+def _not_queued():
+    """Bestellungen, deren E-Mail nicht bereits in der Warteschlange steht (siehe mail_queue.py)"""
+    return or_(SupplierOrder.email_status.is_(None), SupplierOrder.email_status != EMAIL_STATUS_QUEUED)
+
+
+def open_purchase_runs(supplier_name=None):
+    """
+    Offene Bestellungen (Status 'Noch nicht bestellt', E-Mail nicht in der Warteschlange)
+    je Lieferant über alle Projekte.
+    Gibt OrderedDict {Lieferant: [SupplierOrder, ...]} zurück (Positionen, Angebot, Kunde und
+    Auftrag sind mitgeladen).
+    """
+    query = SupplierOrder.query.options(
+        selectinload(SupplierOrder.items),
+        # Auftrag auch über das Angebot (_project_order) - sonst eine Abfrage pro Bestellung
+        joinedload(SupplierOrder.quote).options(joinedload(Quote.customer), joinedload(Quote.order)),
+        joinedload(SupplierOrder.order),
+    ).filter(SupplierOrder.status == STATUS_OPEN, _not_queued())
+    if supplier_name is not None:
+        query = query.filter(SupplierOrder.supplier_name == supplier_name)
+    runs = OrderedDict()
+    for supplier_order in query.order_by(SupplierOrder.supplier_name, SupplierOrder.order_date, SupplierOrder.id):
+        runs.setdefault(supplier_order.supplier_name, []).append(supplier_order)
+    return runs
+
+
+def _order_items(supplier_order):
+    """Positionen einer Bestellung im Format von generate_supplier_order_email"""
+    return [{
+        'sub_number': item.sub_number,
+        'description': item.description,
+        'part_number': item.part_number or '',
+        'quantity': item.quantity,
+        'quote_sub_item_id': item.quote_sub_item_id,
+    } for item in supplier_order.items]
+
+
+def _project_order(supplier_order):
+    """Auftrag einer Bestellung (direkt zugeordnet oder über das Angebot)"""
+    return supplier_order.order or (supplier_order.quote.order if supplier_order.quote else None)
+
+
+def generate_purchase_run_email(supplier_name, supplier_orders):
+    """
+    E-Mail für eine Sammelbestellung: alle Bestellungen des Lieferanten, gegliedert nach Projekt.
+    Gibt (subject, html_body, plain_body) zurück; eine einzelne Bestellung ergibt dieselbe E-Mail
+    wie generate_supplier_order_email.
+    """
+    from utils import generate_supplier_order_email, get_customer_manager_contact
+
+    if len(supplier_orders) == 1:
+        supplier_order = supplier_orders[0]
+        order = _project_order(supplier_order)
+        return generate_supplier_order_email(
+            supplier_order.quote, supplier_name, _order_items(supplier_order),
+            order.order_number if order else None
+        )
+
+    subject = f"Sammelbestellung für {supplier_name} - {len(supplier_orders)} Projekte"
+    plain_body = """Sehr geehrte Damen und Herren,
+
+hiermit bestellen wir folgende Positionen für mehrere Projekte:
+"""
+    html_body = """
+Sehr geehrte Damen und Herren,
+
+hiermit bestellen wir folgende Positionen für mehrere Projekte:
+"""
+    for supplier_order in supplier_orders:
+        quote = supplier_order.quote
+        order = _project_order(supplier_order)
+        angestrebter_liefertermin = ""
+        if order and order.start_date:
+            zieltermin = order.start_date - timedelta(weeks=2)
+            angestrebter_liefertermin = f"KW {zieltermin.isocalendar()[1]}"
+
+        plain_body += "\n"
+        html_body += "<br>"
+        if order:
+            plain_body += f"Auftrag: {order.order_number}\n"
+            html_body += f"<br>Auftrag: {order.order_number}"
+        plain_body += f"""BVH: {quote.customer.last_name}
+Lieferort: Lager
+Angestrebter Liefertermin: {angestrebter_liefertermin}
+
+"""
+        html_body += f"""
+<br>BVH: {quote.customer.last_name}
+<br>Lieferort: Lager
+<br>Angestrebter Liefertermin: {angestrebter_liefertermin}
+<br>
+
+<table border=\"1\" cellpadding=\"8\" cellspacing=\"0\" style=\"border-collapse: collapse; width: 100%; font-family: Arial, sans-serif;\">
+    <thead>
+        <tr style=\"background-color: #f8f9fa;\">
+            <th style=\"text-align: left; padding: 10px;\">Unterposition</th>
+            <th style=\"text-align: left; padding: 10px;\">Beschreibung</th>
+            <th style=\"text-align: left; padding: 10px;\">Teilenummer</th>
+            <th style=\"text-align: center; padding: 10px;\">Anzahl</th>
+        </tr>
+    </thead>
+    <tbody>
+"""
+        for item in _order_items(supplier_order):
+            plain_body += f"{item['quantity']}x {item['part_number']}: {item['description']}\n"
+            html_body += f"        <tr>\n            <td style=\"padding: 8px; border: 1px solid #ddd;\">{item['sub_number']}</td>\n            <td style=\"padding: 8px; border: 1px solid #ddd;\">{item['description']}</td>\n            <td style=\"padding: 8px; border: 1px solid #ddd;\">{item['part_number']}</td>\n            <td style=\"padding: 8px; border: 1px solid #ddd; text-align: center;\">{item['quantity']}</td>\n        </tr>\n"
+        html_body += "    </tbody>\n</table>\n"
+
+    # Signatur des Projektleiters der ersten Bestellung
+    first_order = _project_order(supplier_orders[0])
+    project_manager = getattr(first_order, 'project_manager', None) if first_order else None
+    if not project_manager:
+        project_manager = supplier_orders[0].quote.customer.customer_manager
+    manager_contact = get_customer_manager_contact(project_manager)
+    signature = manager_contact.get('signature', manager_contact['name'])
+    signature_html = signature.replace('\n', '<br>\n')
+
+    plain_body += f"""
+Bitte bestätigen Sie den Erhalt dieser Bestellung und teilen Sie uns die Lieferzeit mit.
+
+Mit freundlichen Grüßen
+{signature}
+"""
+    html_body += f"""
+Bitte bestätigen Sie den Erhalt dieser Bestellung und teilen Sie uns die Lieferzeit mit.
+
+<br><br>
+Mit freundlichen Grüßen<br>
+{signature_html}
+"""
+    return subject, html_body, plain_body
+
+
+def generate_purchase_run_number():
+    """
+    Nummer einer Sammelbestellung, z.B. SB-20250314-153012-3FA9C1
+    Der Zufallsanteil trennt Sammelbestellungen aus derselben Sekunde (Spalte ist nicht eindeutig,
+    eine Sammelbestellung umfasst mehrere Zeilen) - bereits vergebene Nummern werden übersprungen.
+    """
+    while True:
+        purchase_run = f"SB-{datetime.now():%Y%m%d-%H%M%S}-{secrets.token_hex(3).upper()}"
+        if not db.session.query(SupplierOrder.query.filter_by(purchase_run=purchase_run).exists()).scalar():
+            return purchase_run
+
+
+def mark_purchase_run_ordered(supplier_name, supplier_order_ids):
+    """
+    Markiert die (noch offenen) Bestellungen des Lieferanten als bestellt und versieht sie mit
+    einer gemeinsamen Sammelbestellnummer - ein UPDATE. Gibt (Nummer, Anzahl) zurück. Der Aufrufer committet.
+    """
+    if not supplier_order_ids:
+        return None, 0
+    purchase_run = generate_purchase_run_number()
+    count = SupplierOrder.query.filter(
+        SupplierOrder.id.in_(list(supplier_order_ids)),
+        SupplierOrder.supplier_name == supplier_name,
+        SupplierOrder.status == STATUS_OPEN,
+        _not_queued(),
+    ).update({
+        SupplierOrder.status: STATUS_ORDERED,
+        SupplierOrder.purchase_run: purchase_run,
+    }, synchronize_session=False)
+    return purchase_run, count
+
+
+def start_purchase_run(supplier_name, supplier_order_ids):
+    """
+    Versieht die (noch offenen) Bestellungen des Lieferanten mit einer gemeinsamen Sammelbestellnummer,
+    ohne den Status zu ändern - für den Versand über die E-Mail-Warteschlange, die den Status nach dem
+    Versand setzt. Gibt (Nummer, Bestellungen) zurück. Der Aufrufer committet.
+    """
+    if not supplier_order_ids:
+        return None, []
+    purchase_run = generate_purchase_run_number()
+    SupplierOrder.query.filter(
+        SupplierOrder.id.in_(list(supplier_order_ids)),
+        SupplierOrder.supplier_name == supplier_name,
+        SupplierOrder.status == STATUS_OPEN,
+        _not_queued(),
+    ).update({SupplierOrder.purchase_run: purchase_run}, synchronize_session=False)
+    supplier_orders = SupplierOrder.query.options(
+        selectinload(SupplierOrder.items),
+        # Auftrag auch über das Angebot (_project_order) - sonst eine Abfrage pro Bestellung
+        joinedload(SupplierOrder.quote).options(joinedload(Quote.customer), joinedload(Quote.order)),
+        joinedload(SupplierOrder.order),
+    ).filter(
+        SupplierOrder.purchase_run == purchase_run, SupplierOrder.supplier_name == supplier_name
+    ).order_by(SupplierOrder.order_date, SupplierOrder.id).all()
+    return purchase_run, supplier_orders
@@ -0,0 +1,248 @@
+"""
+SQL-Instrumentierung für die InstallationApp
+Zählt pro Request die Datenbankabfragen, misst die DB-Zeit, erkennt N+1-Muster
+und schreibt langsame Abfragen in ein Slow-Query-Log.
+
+Die Admin-Seite zeigt die Werte des jeweiligen Worker-Prozesses; über alle Worker
+aggregiert stehen sie unter /metrics (db_queries_per_request, db_query_seconds_total, ...).
+"""
+import os
+import re
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+from logging_config import add_log_handler
+from metrics import record_request_queries
+
+# Normalisierung von SQL-Statements zu Fingerprints
+_STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\bIN \([^()]*\)', re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Aggregierte Werte pro Endpoint (pro Worker-Prozess seit dem Start)
+_lock = threading.Lock()
+_endpoint_stats = {}
+_recent_slow_queries = deque(maxlen=50)
+_recent_n_plus_one = deque(maxlen=50)
+_started_at = datetime.now()
+_slow_log_handler = None
+
+slow_query_logger = logging.getLogger('query_monitor.slow')
+
+
+def fingerprint_statement(statement):
+    """Reduziert ein SQL-Statement auf seine Struktur (ohne Literale und IN-Listen)"""
+    fingerprint = _STRING_LITERAL_RE.sub('?', statement)
+    fingerprint = _IN_LIST_RE.sub('IN (...)', fingerprint)
+    fingerprint = _NUMBER_LITERAL_RE.sub('?', fingerprint)
+    return _WHITESPACE_RE.sub(' ', fingerprint).strip()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_monitor_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get('query_monitor_start')
+    if not start_times:
+        return
+    duration = time.perf_counter() - start_times.pop()
+
+    if not has_request_context():
+        return
+    collector = g.get('query_monitor')
+    if collector is None:
+        return
+
+    fingerprint = fingerprint_statement(statement)
+    collector['count'] += 1
+    collector['db_time'] += duration
+    collector['fingerprints'][fingerprint] = collector['fingerprints'].get(fingerprint, 0) + 1
+
+    if duration * 1000 >= collector['slow_threshold_ms']:
+        collector['slow_queries'] += 1
+        _record_slow_query(statement, parameters, duration)
+
+
+def _handle_error(context):
+    """Fehlgeschlagene Abfrage: Startzeit verwerfen (after_cursor_execute wird nicht aufgerufen)"""
+    conn = context.connection
+    if conn is None:
+        return
+    start_times = conn.info.get('query_monitor_start')
+    if start_times:
+        start_times.pop()
+
+
+def _record_slow_query(statement, parameters, duration):
+    """Schreibt eine langsame Abfrage ins Slow-Query-Log"""
+    entry = {
+        'timestamp': datetime.now(),
+        'endpoint': request.endpoint or request.path,
+        'duration_ms': duration * 1000,
+        'statement': _WHITESPACE_RE.sub(' ', statement).strip(),
+    }
+    with _lock:
+        _recent_slow_queries.appendleft(entry)
+    slow_query_logger.warning(
+        'SLOW QUERY %.1f ms [%s %s] %s | params=%r',
+        entry['duration_ms'], request.method, request.path, entry['statement'], parameters
+    )
+
+
+def _config(key, default):
+    """Liest einen Konfigurationswert der aktuellen App"""
+    return current_app.config.get(key, default)
+
+
+def _start_request():
+    """Legt den Abfrage-Zähler für den aktuellen Request an"""
+    g.query_monitor = {
+        'count': 0,
+        'db_time': 0.0,
+        'slow_queries': 0,
+        'fingerprints': {},
+        'started': time.perf_counter(),
+        'slow_threshold_ms': _config('SLOW_QUERY_THRESHOLD_MS', 200.0),
+    }
+
+
+def _finish_request(response):
+    """Wertet die Abfragen des Requests aus und aggregiert sie pro Endpoint"""
+    collector = g.pop('query_monitor', None)
+    if collector is None or request.endpoint in (None, 'static'):
+        return response
+
+    endpoint = request.endpoint
+    request_time = time.perf_counter() - collector['started']
+    threshold = _config('N_PLUS_ONE_THRESHOLD', 10)
+
+    # N+1-Verdacht: dasselbe SELECT wird innerhalb eines Requests sehr oft ausgeführt
+    repeated = [
+        (fingerprint, count) for fingerprint, count in collector['fingerprints'].items()
+        if count >= threshold and fingerprint.upper().startswith('SELECT')
+    ]
+    repeated.sort(key=lambda item: item[1], reverse=True)
+
+    with _lock:
+        stats = _endpoint_stats.setdefault(endpoint, {
+            'endpoint': endpoint,
+            'requests': 0,
+            'queries': 0,
+            'max_queries': 0,
+            'db_time': 0.0,
+            'max_db_time': 0.0,
+            'request_time': 0.0,
+            'slow_queries': 0,
+            'n_plus_one_requests': 0,
+            'patterns': {},
+            'last_seen': None,
+        })
+        stats['requests'] += 1
+        stats['queries'] += collector['count']
+        stats['max_queries'] = max(stats['max_queries'], collector['count'])
+        stats['db_time'] += collector['db_time']
+        stats['max_db_time'] = max(stats['max_db_time'], collector['db_time'])
+        stats['request_time'] += request_time
+        stats['slow_queries'] += collector['slow_queries']
+        stats['last_seen'] = datetime.now()
+
+        if repeated:
+            stats['n_plus_one_requests'] += 1
+            for fingerprint, count in repeated:
+                pattern = stats['patterns'].setdefault(fingerprint, {'max_count': 0, 'requests': 0})
+                pattern['max_count'] = max(pattern['max_count'], count)
+                pattern['requests'] += 1
+            _recent_n_plus_one.appendleft({
+                'timestamp': datetime.now(),
+                'endpoint': endpoint,
+                'path': request.path,
+                'queries': collector['count'],
+                'fingerprint': repeated[0][0],
+                'repetitions': repeated[0][1],
+            })
+
+    record_request_queries(
+        endpoint, collector['count'], collector['db_time'], collector['slow_queries'], bool(repeated)
+    )
+    if repeated:
+        slow_query_logger.warning(
+            'N+1 VERDACHT [%s %s] %d Abfragen, %dx: %s',
+            request.method, request.path, collector['count'], repeated[0][1], repeated[0][0]
+        )
+
+    return response
+
+
+def get_query_stats():
+    """Liefert die aggregierten Werte pro Endpoint für die Admin-Seite"""
+    with _lock:
+        endpoints = []
+        for stats in _endpoint_stats.values():
+            requests = stats['requests'] or 1
+            patterns = sorted(
+                ({'fingerprint': fingerprint, **values} for fingerprint, values in stats['patterns'].items()),
+                key=lambda item: item['max_count'], reverse=True
+            )
+            endpoints.append({
+                **stats,
+                'avg_queries': stats['queries'] / requests,
+                'avg_db_time_ms': stats['db_time'] * 1000 / requests,
+                'max_db_time_ms': stats['max_db_time'] * 1000,
+                'avg_request_time_ms': stats['request_time'] * 1000 / requests,
+                'patterns': patterns,
+            })
+        endpoints.sort(key=lambda item: item['queries'], reverse=True)
+        return {
+            'started_at': _started_at,
+            'endpoints': endpoints,
+            'slow_queries': list(_recent_slow_queries),
+            'n_plus_one': list(_recent_n_plus_one),
+        }
+
+
+def reset_query_stats():
+    """Setzt alle aggregierten Werte zurück"""
+    global _started_at
+    with _lock:
+        _endpoint_stats.clear()
+        _recent_slow_queries.clear()
+        _recent_n_plus_one.clear()
+        _started_at = datetime.now()
+
+
+def init_query_monitor(app, db):
+    """Registriert die SQL-Instrumentierung für die App"""
+    global _slow_log_handler
+    if not app.config.get('QUERY_MONITOR_ENABLED', True):
+        return
+
+    # Slow-Query-Log im instance-Ordner (geschrieben im Listener-Thread des Loggings)
+    log_dir = os.path.join(app.instance_path, 'logs')
+    os.makedirs(log_dir, exist_ok=True)
+    if _slow_log_handler is None:
+        _slow_log_handler = RotatingFileHandler(
+            os.path.join(log_dir, 'slow_queries.log'),
+            maxBytes=2 * 1024 * 1024, backupCount=3, encoding='utf-8'
+        )
+        _slow_log_handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        add_log_handler(_slow_log_handler, slow_query_logger.name)
+        slow_query_logger.setLevel(logging.INFO)
+
+    with app.app_context():
+        engine = db.engine
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(engine, 'handle_error', _handle_error)
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
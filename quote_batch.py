@@ -0,0 +1,285 @@
+"""
+Sammel-Bearbeitung eines Angebots (eine Transaktion statt Commit pro Änderung)
+Der Editor schickt alle Änderungen seit dem letzten Speichern als Liste von Operationen:
+    - update_quote:     Kopfdaten (Projekt, Gültigkeit, Aufschlag, Rabatt, PDF-Texte, ...)
+    - add_item:         neue Position (optional mit Unterpositionen, 'ref' für spätere Operationen)
+    - update_item:      Felder einer Position
+    - delete_item:      Position samt Unterpositionen löschen
+    - add_sub_item:     neue Unterposition an einer Position
+    - update_sub_item:  Felder einer Unterposition
+    - delete_sub_item:  Unterposition löschen
+    - add_templates:    Positionsvorlagen anwenden (wie der Vorlagen-Selector)
+    - reorder:          neue Reihenfolge aller Positionen (wie /quotes/<id>/reorder)
+
+Positionen und Unterpositionen werden einmal geladen, alle Änderungen laufen über dieselbe
+Session; Positionspreise und Angebotssumme werden am Ende einmal neu berechnet.
+Schlägt eine Operation fehl, wird nichts gespeichert.
+"""
+from datetime import datetime
+
+from sqlalchemy.orm import selectinload
+
+from models import db, QuoteItem, QuoteSubItem
+from quote_builder import apply_templates_to_quote, reorder_quote
+from utils import get_default_hourly_rate, safe_float_conversion
+
+# Kopfdaten, die per update_quote geändert werden dürfen
+QUOTE_TEXT_FIELDS = ('project_description', 'price_display_mode')
+QUOTE_FLAG_FIELDS = ('include_additional_info', 'show_subitem_prices')
+QUOTE_PERCENT_FIELDS = ('markup_percentage', 'discount_percentage')
+# PDF-Zusatzinformationen - leer wird wie im Formular als "<keine>" gespeichert
+QUOTE_PDF_FIELDS = ('leistungsumfang', 'objektinformationen', 'installationsleistungen')
+
+SUB_ITEM_TYPES = ('bestellteil', 'arbeitsvorgang', 'sonstiges')
+SUB_ITEM_FIELDS = (
+    'description', 'sub_number', 'item_type', 'requires_order', 'supplier', 'part_number',
+    'part_quantity', 'part_price', 'hours', 'hourly_rate', 'quantity', 'unit_price',
+)
+SUB_ITEM_FLOAT_FIELDS = ('part_price', 'hours', 'hourly_rate', 'unit_price')
+
+
+class QuoteBatchEdit:
+    """Wendet eine Liste von Operationen auf ein Angebot an (der Aufrufer committet)"""
+
+    def __init__(self, quote):
+        self.quote = quote
+        self.items = {}
+        self.sub_items = {}
+        self._load_items()
+        self.refs = {}  # 'ref' neuer Positionen -> Position
+        self.touched_items = set()  # Positionen, deren Preis neu berechnet werden muss
+
+    def _load_items(self):
+        """Lädt alle (noch nicht bekannten) Positionen samt Unterpositionen mit zwei Abfragen"""
+        query = QuoteItem.query.options(selectinload(QuoteItem.sub_items)).filter_by(quote_id=self.quote.id)
+        if self.items:
+            query = query.filter(QuoteItem.id.notin_(list(self.items)))
+        for item in query.all():
+            self.items[item.id] = item
+            self.sub_items.update((sub_item.id, sub_item) for sub_item in item.sub_items)
+
+    # ===============================
+    # NACHSCHLAGEN
+    # ===============================
+
+    def _item(self, item_id):
+        """Position per ID oder per 'ref' einer in diesem Batch angelegten Position"""
+        if isinstance(item_id, str) and item_id in self.refs:
+            return self.refs[item_id]
+        try:
+            item = self.items.get(int(item_id))
+        except (TypeError, ValueError):
+            item = None
+        if item is None:
+            raise ValueError(f'Position {item_id} gehört nicht zu diesem Angebot')
+        return item
+
+    def _sub_item(self, sub_item_id):
+        try:
+            sub_item = self.sub_items.get(int(sub_item_id))
+        except (TypeError, ValueError):
+            sub_item = None
+        if sub_item is None:
+            raise ValueError(f'Unterposition {sub_item_id} gehört nicht zu diesem Angebot')
+        return sub_item
+
+    # ===============================
+    # OPERATIONEN
+    # ===============================
+
+    def update_quote(self, operation):
+        fields = operation.get('fields') or {}
+        quote = self.quote
+        for field in QUOTE_TEXT_FIELDS:
+            if fields.get(field):
+                setattr(quote, field, str(fields[field]))
+        if fields.get('valid_until'):
+            quote.valid_until = datetime.strptime(fields['valid_until'], '%Y-%m-%d').date()
+        for field in QUOTE_FLAG_FIELDS:
+            if field in fields:
+                setattr(quote, field, bool(fields[field]))
+        for field in QUOTE_PERCENT_FIELDS:
+            if field in fields:
+                setattr(quote, field, safe_float_conversion(fields[field], 0.0))
+        for field in QUOTE_PDF_FIELDS:
+            if field in fields:
+                text = str(fields[field] or '').strip()
+                setattr(quote, field, text or '<keine>')
+
+    def add_item(self, operation):
+        description = str(operation.get('description') or '').strip()
+        if not description:
+            raise ValueError('Beschreibung der Position fehlt')
+        position_number = operation.get('position_number')
+        if not position_number:
+            last_position = max((item.position_number for item in self.items.values()), default=0)
+            position_number = last_position + 1
+        quantity = safe_float_conversion(operation.get('quantity'), 1.0)
+        unit_price = safe_float_conversion(operation.get('unit_price'), 0.0)
+        item = QuoteItem(
+            quote_id=self.quote.id,
+            description=description,
+            position_number=int(position_number),
+            quantity=quantity,
+            unit_price=unit_price,
+            total_price=quantity * unit_price,
+            requires_order=False,
+            item_type=operation.get('item_type') or 'standard',
+        )
+        db.session.add(item)
+        db.session.flush()  # ID für folgende Operationen
+        self.items[item.id] = item
+        if operation.get('ref'):
+            self.refs[str(operation['ref'])] = item
+        for sub_item_data in operation.get('sub_items') or []:
+            self._add_sub_item(item, sub_item_data)
+        self.touched_items.add(item)
+        return item.id
+
+    def update_item(self, operation):
+        item = self._item(operation.get('item_id'))
+        fields = operation.get('fields') or {}
+        if 'description' in fields:
+            description = str(fields['description'] or '').strip()
+            if not description:
+                raise ValueError('Beschreibung der Position fehlt')
+            item.description = description
+        if 'quantity' in fields:
+            quantity = safe_float_conversion(fields['quantity'], 1.0)
+            if quantity <= 0:
+                raise ValueError('Menge muss größer als 0 sein')
+            item.quantity = quantity
+        if 'unit_price' in fields:
+            item.unit_price = safe_float_conversion(fields['unit_price'], 0.0)
+        if fields.get('position_number'):
+            item.position_number = int(fields['position_number'])
+            # Lückenlos in bisheriger Reihenfolge neu nummerieren (wie update_position_number)
+            ordered = sorted(item.sub_items, key=lambda sub_item: (sub_item.sub_position or 0, sub_item.id or 0))
+            for index, sub_item in enumerate(ordered, start=1):
+                sub_item.sub_number = f"{item.position_number}.{index}"
+                sub_item.sub_position = index
+        self.touched_items.add(item)
+
+    def delete_item(self, operation):
+        item = self._item(operation.get('item_id'))
+        for sub_item in item.sub_items:
+            self.sub_items.pop(sub_item.id, None)
+        self.items.pop(item.id, None)
+        self.touched_items.discard(item)
+        db.session.delete(item)
+
+    def _apply_sub_item_fields(self, sub_item, data):
+        """Übernimmt die Felder einer Unterposition und berechnet ihren Preis neu"""
+        for field in SUB_ITEM_FIELDS:
+            if field not in data:
+                continue
+            value = data[field]
+            if field in SUB_ITEM_FLOAT_FIELDS:
+                value = safe_float_conversion(value, 0.0)
+            elif field == 'requires_order':
+                value = bool(value)
+            elif field == 'item_type' and value not in SUB_ITEM_TYPES:
+                raise ValueError(f'Unbekannter Typ der Unterposition: {value}')
+            elif value is not None:
+                value = str(value)
+            setattr(sub_item, field, value)
+        if not (sub_item.description or '').strip():
+            raise ValueError('Beschreibung der Unterposition fehlt')
+        # Wie im Formular: Bestellteile brauchen einen Lieferanten
+        if sub_item.item_type == 'bestellteil' and not (sub_item.supplier or '').strip():
+            raise ValueError(f"Für Bestellteil '{sub_item.description}' muss ein Lieferant ausgewählt werden.")
+        sub_item.update_price()
+
+    def _add_sub_item(self, item, data):
+        sub_position = max((sub_item.sub_position or 0 for sub_item in item.sub_items), default=0) + 1
+        sub_item = QuoteSubItem(
+            sub_number=f"{item.position_number}.{sub_position}",
+            sub_position=sub_position,
+            item_type='bestellteil',
+            part_quantity='1',
+            quantity='',
+            hours=0.0,
+            hourly_rate=get_default_hourly_rate(),
+            part_price=0.0,
+            unit_price=0.0,
+        )
+        self._apply_sub_item_fields(sub_item, data)
+        item.sub_items.append(sub_item)
+        db.session.flush()  # ID für folgende Operationen
+        self.sub_items[sub_item.id] = sub_item
+        self.touched_items.add(item)
+        return sub_item.id
+
+    def add_sub_item(self, operation):
+        return self._add_sub_item(self._item(operation.get('item_id')), operation.get('sub_item') or {})
+
+    def update_sub_item(self, operation):
+        sub_item = self._sub_item(operation.get('sub_item_id'))
+        self._apply_sub_item_fields(sub_item, operation.get('fields') or {})
+        self.touched_items.add(sub_item.quote_item)
+
+    def delete_sub_item(self, operation):
+        sub_item = self._sub_item(operation.get('sub_item_id'))
+        item = sub_item.quote_item
+        item.sub_items.remove(sub_item)  # delete-orphan löscht die Zeile
+        self.sub_items.pop(sub_item.id, None)
+        self.touched_items.add(item)
+
+    def add_templates(self, operation):
+        db.session.flush()  # MAX(position_number) soll die bisherigen Operationen sehen
+        results = apply_templates_to_quote(self.quote, operation.get('templates') or [])
+        self._load_items()  # neue Positionen für folgende Operationen
+        return results
+
+    def reorder(self, operation):
+        counts = reorder_quote(self.quote, operation.get('items') or [])
+        # reorder_quote ändert per UPDATE an der Session vorbei - geladene Objekte neu lesen
+        for obj in list(self.items.values()) + list(self.sub_items.values()):
+            db.session.expire(obj)
+        return counts
+
+    OPERATIONS = (
+        'update_quote', 'add_item', 'update_item', 'delete_item', 'add_sub_item',
+        'update_sub_item', 'delete_sub_item', 'add_templates', 'reorder',
+    )
+
+    # ===============================
+    # AUSFÜHREN
+    # ===============================
+
+    def apply(self, operations):
+        """Führt alle Operationen aus; gibt die Ergebnisse (z.B. neue IDs) pro Operation zurück"""
+        if not isinstance(operations, list):
+            raise ValueError('operations muss eine Liste sein')
+        if not operations:
+            raise ValueError('Keine Änderungen übergeben')
+        results = []
+        for index, operation in enumerate(operations, start=1):
+            if not isinstance(operation, dict):
+                raise ValueError(f'Operation {index}: erwartet ein Objekt {{"op": ...}}')
+            name = operation.get('op')
+            if not isinstance(name, str) or name not in self.OPERATIONS:
+                raise ValueError(f'Operation {index}: unbekannte Operation {name!r}')
+            try:
+                results.append(getattr(self, name)(operation))
+            except (AttributeError, KeyError, TypeError, ValueError) as e:
+                raise ValueError(f'Operation {index} ({name}): {e}')
+
+        # Preise der geänderten Positionen - Hauptposition mit Unterpositionen = Summe der Unterpositionen
+        for item in self.touched_items:
+            if item.sub_items:
+                total_price = sum(sub_item.price or 0 for sub_item in item.sub_items)
+                item.quantity = 1
+                item.unit_price = total_price
+                item.total_price = total_price
+            else:
+                item.update_price()
+
+        db.session.flush()
+        self.quote.total_amount = self.quote.total_from_net(self.quote.query_net_total())
+        return results
+
+
+def apply_quote_operations(quote, operations):
+    """Kurzform: Operationen anwenden, Ergebnisse zurückgeben (der Aufrufer committet)"""
+    return QuoteBatchEdit(quote).apply(operations)
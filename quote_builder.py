@@ -0,0 +1,265 @@
+"""
+Positionsvorlagen auf ein Angebot anwenden und Positionen neu ordnen
+Eine oder mehrere (im Vorlagen-Selector bearbeitete) Vorlagen werden in einer Transaktion
+als Positionen mit Unterpositionen angelegt:
+    - Unterpositionen per Bulk-INSERT (executemany) statt Objekt für Objekt; die (wenigen)
+      Positionen per ORM-Flush, damit ihre IDs direkt vom INSERT kommen
+    - nächste Positionsnummer per MAX() statt alle Positionen zu laden - das Angebot ist dabei
+      gesperrt (SELECT ... FOR UPDATE), gleichzeitige Requests vergeben keine doppelten Nummern
+    - Angebotssumme einmal am Ende per Aggregat-Abfrage
+Preise werden serverseitig neu berechnet (pricing_engine) - vom Browser übermittelte
+Preise werden nicht übernommen.
+
+Eine neue Reihenfolge (Drag & Drop im Editor) wird mit je einem UPDATE ... CASE für
+Positionen und Unterpositionen übernommen.
+"""
+import math
+
+from sqlalchemy import case, func
+
+from master_data_cache import get_position_template
+from models import db, Quote, QuoteItem, QuoteSubItem, parse_quantity
+from pricing_engine import formula_variables, parse_number, price_subitem, price_template
+
+
+def _float(value, default=0.0):
+    """Zahl aus JSON-Daten (None/leer -> Standardwert); ValueError bei NaN/Unendlich"""
+    if value is None or value == '':
+        return default
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f'Ungültige Zahl: {value}')
+    return number
+
+
+def _sub_item_row(quote_item_id, position_number, sub_position, subitem_data, template, variables):
+    """Spaltenwerte einer Unterposition aus den Daten des Vorlagen-Selectors (Preis serverseitig berechnet)"""
+    # Typ und Formel kommen immer aus der Vorlage - eine Formel aus dem Request wird nie ausgewertet
+    source_index = subitem_data.get('source_index')
+    if isinstance(source_index, bool) or not isinstance(source_index, int) \
+            or not 0 <= source_index < len(template.subitems):
+        raise ValueError(f'Unbekannte Unterposition: {source_index}')
+    source = template.subitems[source_index]
+    item_type, formula = source.item_type, source.formula
+    base_price = _float(subitem_data.get('base_price'))  # Grundpreis = Preis pro Stück
+    quantity_input = subitem_data.get('part_quantity' if item_type == 'bestellteil' else 'quantity', '1')
+    quantity, price, per_formula = price_subitem(item_type, formula, {
+        'base_price': base_price,
+        'quantity': quantity_input,
+        'hours': subitem_data.get('hours'),
+        'hourly_rate': subitem_data.get('hourly_rate'),
+    }, variables)
+    if not math.isfinite(price):
+        raise ValueError(f"Preis der Unterposition außerhalb des gültigen Bereichs: {subitem_data.get('description', '')}")
+    row = {
+        'quote_item_id': quote_item_id,
+        'sub_number': f"{position_number}.{sub_position}",
+        'sub_position': sub_position,
+        'description': subitem_data.get('description', ''),
+        'item_type': item_type,
+        'price': round(price, 2),
+        # Standardwerte wie im Modell - executemany braucht für jede Zeile dieselben Spalten
+        'requires_order': False,
+        'supplier': None,
+        'part_number': None,
+        'part_quantity': '1',
+        'part_price': 0.0,
+        'hours': 0.0,
+        'hourly_rate': 95.0,
+        'quantity': '',
+        'unit_price': 0.0,
+    }
+    if item_type == 'bestellteil':
+        row.update({
+            'supplier': subitem_data.get('supplier', ''),
+            'part_number': subitem_data.get('supplier_part_number', ''),
+            'part_quantity': quantity_input,
+            'requires_order': bool(subitem_data.get('requires_order', False)),
+            'part_price': base_price,  # Stückpreis, nicht der berechnete Gesamtpreis
+        })
+    elif item_type == 'arbeitsvorgang':
+        row.update({
+            'hours': _float(subitem_data.get('hours')),
+            'hourly_rate': _float(subitem_data.get('hourly_rate'), 95.0),
+        })
+    else:  # sonstiges
+        row.update({
+            # Menge aus der Formel wie im Selector mit einer Nachkommastelle
+            'quantity': f'{quantity:.1f}' if per_formula else quantity_input,
+            'unit_price': base_price,  # Stückpreis, nicht berechneter Gesamtpreis
+        })
+    # Numerische Mengen wie beim Setzen über das Modell (Bulk-INSERT umgeht die Validierung)
+    row['part_quantity_value'] = parse_quantity(row['part_quantity'])
+    row['quantity_value'] = parse_quantity(row['quantity'])
+    return row
+
+
+def apply_templates_to_quote(quote, entries):
+    """
+    Legt für jede Vorlage eine Position samt Unterpositionen an und aktualisiert die Angebotssumme.
+    entries: Liste von {'template_id', 'calculation_parameters', 'subitems'} (Format des Vorlagen-Selectors)
+    Gibt eine Liste mit {'template_id', 'name', 'position_number', 'total_price', 'subitems_count'} zurück.
+    Der Aufrufer committet (oder macht bei Fehlern einen Rollback).
+    """
+    if not entries:
+        raise ValueError('Keine Vorlagen übergeben')
+
+    templates = {}
+    for template_id in {int(entry.get('template_id') or 0) for entry in entries}:
+        templates[template_id] = get_position_template(template_id)
+    missing = [template_id for template_id, template in templates.items() if template is None]
+    if missing:
+        raise ValueError(f'Vorlage(n) nicht gefunden: {", ".join(str(i) for i in sorted(missing))}')
+
+    # Angebot bis zum Commit sperren (Doppelklick, Batch-Editor und Vorlagen-Selector gleichzeitig)
+    db.session.query(Quote.id).filter(Quote.id == quote.id).with_for_update().scalar()
+    last_position = db.session.query(func.max(QuoteItem.position_number)).filter(
+        QuoteItem.quote_id == quote.id
+    ).scalar() or 0
+
+    # Unterpositionen zuerst berechnen - Preis der Hauptposition = Summe der Unterpositionen
+    results = []
+    item_rows = []
+    sub_item_rows = []
+    for offset, entry in enumerate(entries, start=1):
+        template = templates[int(entry['template_id'])]
+        parameters = entry.get('calculation_parameters') or {}
+        variables = formula_variables(
+            parse_number(parameters.get('length')),
+            parse_number(parameters.get('width')),
+            parse_number(parameters.get('height')),
+        )
+        position_number = last_position + offset
+        rows = [
+            _sub_item_row(None, position_number, sub_position, subitem_data, template, variables)
+            for sub_position, subitem_data in enumerate(entry.get('subitems') or [], start=1)
+        ]
+        if rows:
+            total_price = round(sum(row['price'] for row in rows), 2)
+        else:
+            # Ohne Unterpositionen wie bisher der Vorlagenpreis (serverseitig mit Vorlagenwerten berechnet)
+            total_price = price_template(template, parameters)['total']
+        sub_item_rows.append(rows)
+        item_rows.append({
+            'quote_id': quote.id,
+            'position_number': position_number,
+            'description': template.name,  # Beschreibung = Vorlagenname ohne Variablen
+            'quantity': 1.0,
+            'unit_price': total_price,
+            'total_price': total_price,
+            'requires_order': False,
+            'supplier': None,
+            'item_type': 'standard',
+        })
+        results.append({
+            'template_id': template.id,
+            'name': template.name,
+            'position_number': position_number,
+            'total_price': total_price,
+            'subitems_count': len(rows),
+        })
+
+    items = [QuoteItem(**row) for row in item_rows]
+    db.session.add_all(items)
+    db.session.flush()
+
+    all_sub_item_rows = []
+    for item, rows in zip(items, sub_item_rows):
+        for row in rows:
+            row['quote_item_id'] = item.id
+            all_sub_item_rows.append(row)
+    if all_sub_item_rows:
+        db.session.execute(QuoteSubItem.__table__.insert(), all_sub_item_rows)
+
+    # Bereits geladene Positionen des Angebots sind veraltet
+    db.session.expire(quote, ['quote_items'])
+    quote.total_amount = quote.total_from_net(quote.query_net_total())
+    return results
+
+
+def renumber_sub_items(quote_item_id, position_number):
+    """
+    Nummeriert die Unterpositionen einer Position in ihrer aktuellen Reihenfolge lückenlos neu
+    (3.1, 3.2, ...) und setzt dabei auch den Sortierschlüssel - ein UPDATE ... CASE.
+    Gibt die Anzahl der Unterpositionen zurück. Der Aufrufer committet.
+    """
+    sub_item_ids = [sub_item_id for sub_item_id, in db.session.query(QuoteSubItem.id).filter(
+        QuoteSubItem.quote_item_id == quote_item_id
+    ).order_by(QuoteSubItem.sub_position, QuoteSubItem.id)]
+    if sub_item_ids:
+        sub_positions = {sub_item_id: index for index, sub_item_id in enumerate(sub_item_ids, start=1)}
+        QuoteSubItem.query.filter(QuoteSubItem.id.in_(sub_item_ids)).update({
+            QuoteSubItem.sub_position: case(sub_positions, value=QuoteSubItem.id),
+            QuoteSubItem.sub_number: case(
+                {sub_item_id: f"{position_number}.{index}" for sub_item_id, index in sub_positions.items()},
+                value=QuoteSubItem.id
+            ),
+        }, synchronize_session=False)
+    return len(sub_item_ids)
+
+
+def reorder_quote(quote, ordering):
+    """
+    Übernimmt eine vollständige neue Reihenfolge der Positionen und Unterpositionen eines Angebots.
+    ordering: Liste von {'id': Positions-ID, 'sub_items': [Unterpositions-IDs]} in der neuen Reihenfolge
+    (ohne 'sub_items' bleibt die Reihenfolge der Unterpositionen einer Position erhalten).
+    Positionen werden ab 1 durchnummeriert, Unterpositionen je Position ebenfalls (z.B. 3.1, 3.2, ...).
+    Gibt {'items', 'sub_items'} (Anzahl neu nummerierter Zeilen) zurück. Der Aufrufer committet.
+    """
+    # Aktuelle Zuordnung mit einer Abfrage: Position -> Unterpositionen in bisheriger Reihenfolge
+    current = {}
+    rows = db.session.query(QuoteItem.id, QuoteSubItem.id).outerjoin(
+        QuoteSubItem, QuoteSubItem.quote_item_id == QuoteItem.id
+    ).filter(QuoteItem.quote_id == quote.id).order_by(
+        QuoteItem.id, QuoteSubItem.sub_position, QuoteSubItem.id
+    ).all()
+    for item_id, sub_item_id in rows:
+        sub_item_ids = current.setdefault(item_id, [])
+        if sub_item_id is not None:
+            sub_item_ids.append(sub_item_id)
+
+    if not isinstance(ordering, list) or not all(isinstance(entry, dict) for entry in ordering):
+        raise ValueError('Ungültige Reihenfolge')
+    try:
+        item_ids = [int(entry['id']) for entry in ordering]
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('Ungültige Reihenfolge')
+    if sorted(item_ids) != sorted(current):
+        raise ValueError('Die Reihenfolge muss alle Positionen des Angebots genau einmal enthalten')
+
+    position_numbers = {}
+    sub_positions = {}
+    sub_numbers = {}
+    for position_number, (item_id, entry) in enumerate(zip(item_ids, ordering), start=1):
+        position_numbers[item_id] = position_number
+        sub_item_ids = entry.get('sub_items')
+        if sub_item_ids is None:
+            sub_item_ids = current[item_id]
+        else:
+            if not isinstance(sub_item_ids, list):
+                raise ValueError('Ungültige Reihenfolge')
+            try:
+                sub_item_ids = [int(sub_item_id) for sub_item_id in sub_item_ids]
+            except (TypeError, ValueError):
+                raise ValueError('Ungültige Reihenfolge')
+            if sorted(sub_item_ids) != sorted(current[item_id]):
+                raise ValueError(f'Die Unterpositionen passen nicht zu Position {position_number}')
+        for sub_position, sub_item_id in enumerate(sub_item_ids, start=1):
+            sub_positions[sub_item_id] = sub_position
+            sub_numbers[sub_item_id] = f"{position_number}.{sub_position}"
+
+    if position_numbers:
+        QuoteItem.query.filter(QuoteItem.quote_id == quote.id).update({
+            QuoteItem.position_number: case(position_numbers, value=QuoteItem.id),
+        }, synchronize_session=False)
+    if sub_positions:
+        QuoteSubItem.query.filter(QuoteSubItem.quote_item_id.in_(
+            db.session.query(QuoteItem.id).filter(QuoteItem.quote_id == quote.id)
+        )).update({
+            QuoteSubItem.sub_position: case(sub_positions, value=QuoteSubItem.id),
+            QuoteSubItem.sub_number: case(sub_numbers, value=QuoteSubItem.id),
+        }, synchronize_session=False)
+
+    # Bereits geladene Positionen des Angebots sind veraltet
+    db.session.expire(quote, ['quote_items'])
+    return {'items': len(position_numbers), 'sub_items': len(sub_positions)}
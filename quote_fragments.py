@@ -0,0 +1,93 @@
+"""
+HTML-Fragmente für den Angebots-Editor
+Statt nach jeder Änderung an einer Position die ganze Editor-Seite neu zu rendern, holt der
+Editor nur die geänderten Positionszeilen und den Summenblock.
+
+Gerenderte Zeilen werden pro Worker im Speicher gehalten, Schlüssel ist (Positions-ID, Version).
+Die Version ist ein Hash über alle Spalten der Position und ihrer Unterpositionen (plus den
+Angebotsstatus, der die Bearbeiten-Buttons steuert) - jede Änderung, auch per Bulk-UPDATE,
+ergibt eine neue Version, veraltete Einträge fallen nach LRU aus dem Cache.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import render_template
+from markupsafe import Markup
+from sqlalchemy.orm import selectinload
+
+from metrics import record_cache_lookup
+from models import QuoteItem
+
+# Maximale Anzahl gerenderter Zeilen pro Worker
+MAX_CACHED_ROWS = 2000
+
+_rows = OrderedDict()  # (Positions-ID, Version) -> HTML
+_lock = threading.Lock()
+
+
+def _column_values(instance):
+    return [getattr(instance, column.key) for column in instance.__mapper__.column_attrs]
+
+
+def item_version(item, quote):
+    """Version einer Position: Hash über Position, Unterpositionen und Angebotsstatus"""
+    values = [quote.status, _column_values(item)]
+    values.extend(_column_values(sub_item) for sub_item in item.sub_items)
+    return hashlib.sha1(repr(values).encode('utf-8')).hexdigest()
+
+
+def render_item_row(item, quote):
+    """Zeile einer Position - aus dem Cache, solange sich die Version nicht geändert hat"""
+    key = (item.id, item_version(item, quote))
+    with _lock:
+        html = _rows.get(key)
+        if html is not None:
+            _rows.move_to_end(key)
+    record_cache_lookup('quote_fragment.item_row', html is not None)
+    if html is None:
+        html = render_template('quote_edit_item_row.html', item=item, quote=quote)
+        with _lock:
+            _rows[key] = html
+            while len(_rows) > MAX_CACHED_ROWS:
+                _rows.popitem(last=False)
+    return Markup(html)
+
+
+def load_items(quote, item_ids=None):
+    """Positionen samt Unterpositionen mit zwei Abfragen (optional nur die angegebenen IDs)"""
+    query = QuoteItem.query.options(selectinload(QuoteItem.sub_items)).filter_by(quote_id=quote.id)
+    if item_ids is not None:
+        query = query.filter(QuoteItem.id.in_(item_ids))
+    return query.order_by(QuoteItem.position_number, QuoteItem.id).all()
+
+
+def render_item_rows(quote, item_ids=None):
+    """Liste von (Position, HTML der Zeile)"""
+    return [(item, render_item_row(item, quote)) for item in load_items(quote, item_ids)]
+
+
+def quote_totals(quote, markup_percentage=None, discount_percentage=None):
+    """Summen für den Summenblock per Aggregat-Abfrage (optional mit Vorschau-Werten für Aufschlag/Rabatt)"""
+    if markup_percentage is None:
+        markup_percentage = quote.markup_percentage
+    if discount_percentage is None:
+        discount_percentage = quote.discount_percentage
+    net_total = quote.query_net_total()
+    # Wie Quote.total_from_net: Aufschlag auf netto, Rabatt auf die Summe inkl. Aufschlag
+    markup_amount = net_total * (markup_percentage / 100) if markup_percentage and markup_percentage > 0 else 0.0
+    total_with_markup = net_total + markup_amount
+    discount_amount = total_with_markup * (discount_percentage / 100) if discount_percentage and discount_percentage > 0 else 0.0
+    return {
+        'net_total': net_total,
+        'markup_percentage': markup_percentage,
+        'markup_amount': markup_amount,
+        'discount_percentage': discount_percentage,
+        'discount_amount': discount_amount,
+        'total': total_with_markup - discount_amount,
+    }
+
+
+def render_totals(quote, totals):
+    """Summenblock (tfoot der Positionstabelle)"""
+    return render_template('quote_edit_totals.html', quote=quote, totals=totals)
@@ -0,0 +1,226 @@
+"""
+Was-wäre-wenn-Neuberechnung offener Angebote
+Zeigt vor einer Änderung von Stundensatz, Lieferantenpreisen, Aufschlag oder Rabatt, wie sich
+die Summen aller betroffenen Angebote verändern würden.
+
+Ablauf:
+    - Angebote, Unterpositionen und Positionen ohne Unterpositionen werden mit je einer Abfrage
+      geladen (pandas DataFrames) und pro Angebot zu wenigen Summen verdichtet
+    - ein Szenario-Raster (Stundensatz × Aufschlag × Rabatt × Lieferanten-Preisfaktor) wird
+      per NumPy-Broadcasting für alle Angebote auf einmal ausgewertet
+    - ein gewähltes Szenario kann mit wenigen UPDATE-Anweisungen übernommen werden
+
+None bei einem Szenario-Wert bedeutet jeweils: aktuellen Wert des Angebots beibehalten.
+"""
+import itertools
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import case, func
+
+from models import db, Quote, QuoteItem, QuoteSubItem
+
+# Angebote, die noch geändert werden können
+OPEN_QUOTE_STATUSES = ('Entwurf', 'Gesendet')
+# Schutz vor versehentlich riesigen Rastern
+MAX_SCENARIOS = 10000
+# Anzahl Angebote pro UPDATE ... CASE beim Übernehmen
+UPDATE_CHUNK_SIZE = 500
+
+
+def _values(values):
+    """Szenario-Werte als Float-Array (None -> NaN = aktuellen Wert beibehalten)"""
+    values = list(values) or [None]
+    return np.array([np.nan if value is None else float(value) for value in values], dtype=float)
+
+
+class QuoteRepricing:
+    """Preismodell der ausgewählten Angebote für Szenario-Auswertungen"""
+
+    def __init__(self, statuses=OPEN_QUOTE_STATUSES, quote_ids=None, supplier=None, current_hourly_rate=None):
+        """
+        statuses/quote_ids: Auswahl der Angebote
+        supplier: Preisfaktor nur auf Bestellteile dieses Lieferanten anwenden (None = alle Bestellteile)
+        current_hourly_rate: neuer Stundensatz nur für Arbeitsvorgänge mit diesem Satz (None = alle)
+        """
+        self.supplier = supplier
+        self.current_hourly_rate = current_hourly_rate
+        if quote_ids is not None:
+            self.quote_condition = Quote.id.in_(list(quote_ids))
+        else:
+            self.quote_condition = Quote.status.in_(statuses)
+        self._load()
+
+    # ===============================
+    # LADEN
+    # ===============================
+
+    def _selected_quote_ids(self):
+        return db.session.query(Quote.id).filter(self.quote_condition)
+
+    def _labour_condition(self):
+        condition = (QuoteSubItem.item_type == 'arbeitsvorgang') & (QuoteSubItem.hours > 0)
+        if self.current_hourly_rate is not None:
+            condition &= QuoteSubItem.hourly_rate == self.current_hourly_rate
+        return condition
+
+    def _parts_condition(self):
+        condition = QuoteSubItem.item_type == 'bestellteil'
+        if self.supplier:
+            condition &= QuoteSubItem.supplier == self.supplier
+        return condition
+
+    def _load(self):
+        """Lädt alle Daten mit drei Abfragen und verdichtet sie zu Summen pro Angebot"""
+        self.quotes = pd.DataFrame(
+            db.session.query(
+                Quote.id, Quote.quote_number, Quote.status, Quote.markup_percentage,
+                Quote.discount_percentage, Quote.total_amount
+            ).filter(self.quote_condition).order_by(Quote.id).all(),
+            columns=['quote_id', 'quote_number', 'status', 'markup', 'discount', 'total_amount'],
+        ).set_index('quote_id')
+
+        sub_items = pd.DataFrame(
+            db.session.query(
+                QuoteItem.quote_id, QuoteSubItem.price, QuoteSubItem.hours,
+                self._labour_condition(), self._parts_condition()
+            ).join(QuoteItem, QuoteSubItem.quote_item_id == QuoteItem.id)
+            .filter(QuoteItem.quote_id.in_(self._selected_quote_ids())).all(),
+            columns=['quote_id', 'price', 'hours', 'is_labour', 'is_part'],
+        )
+        sub_items[['price', 'hours']] = sub_items[['price', 'hours']].astype(float).fillna(0.0)
+        sub_items[['is_labour', 'is_part']] = sub_items[['is_labour', 'is_part']].fillna(False).astype(bool)
+
+        # Positionen ohne Unterpositionen: Menge × Einzelpreis, von den Szenarien unberührt
+        has_sub_items = db.session.query(QuoteSubItem.id).filter(
+            QuoteSubItem.quote_item_id == QuoteItem.id
+        ).exists()
+        plain_items = pd.DataFrame(
+            db.session.query(
+                QuoteItem.quote_id, func.sum(QuoteItem.quantity * QuoteItem.unit_price)
+            ).filter(QuoteItem.quote_id.in_(self._selected_quote_ids()), ~has_sub_items)
+            .group_by(QuoteItem.quote_id).all(),
+            columns=['quote_id', 'amount'],
+        ).set_index('quote_id')['amount']
+
+        def per_quote(values):
+            return values.groupby(sub_items['quote_id']).sum().reindex(self.quotes.index, fill_value=0.0).to_numpy(dtype=float)
+
+        labour = sub_items['is_labour']
+        parts = sub_items['is_part'] & ~labour
+        other = ~(labour | parts)
+        # Netto = fest + Arbeitsstunden × Stundensatz + Bestellteile × Faktor
+        self.fixed = per_quote(sub_items['price'].where(other, 0.0)) + \
+            plain_items.reindex(self.quotes.index, fill_value=0.0).astype(float).to_numpy()
+        self.labour_price = per_quote(sub_items['price'].where(labour, 0.0))
+        self.labour_hours = per_quote(sub_items['hours'].where(labour, 0.0))
+        self.parts_price = per_quote(sub_items['price'].where(parts, 0.0))
+        self.markups = self.quotes['markup'].astype(float).fillna(0.0).to_numpy()
+        self.discounts = self.quotes['discount'].astype(float).fillna(0.0).to_numpy()
+        self.current_totals = self._totals(_values([None]), _values([None]), _values([None]), _values([None]))[:, 0, 0, 0, 0]
+
+    # ===============================
+    # AUSWERTUNG
+    # ===============================
+
+    def _totals(self, hourly_rates, markups, discounts, supplier_factors):
+        """Summen aller Angebote für das ganze Raster - Form (Angebote, Stundensätze, Aufschläge, Rabatte, Faktoren)"""
+        labour = np.where(np.isnan(hourly_rates)[None, :],
+                          self.labour_price[:, None],
+                          self.labour_hours[:, None] * hourly_rates[None, :])
+        parts = self.parts_price[:, None] * np.nan_to_num(supplier_factors, nan=1.0)[None, :]
+        net = self.fixed[:, None, None] + labour[:, :, None] + parts[:, None, :]
+
+        # Wie Quote.total_from_net: Aufschlag auf netto, Rabatt auf die Summe inkl. Aufschlag
+        markup = np.where(np.isnan(markups)[None, :], self.markups[:, None], markups[None, :])
+        discount = np.where(np.isnan(discounts)[None, :], self.discounts[:, None], discounts[None, :])
+        markup_factor = 1 + np.clip(markup, 0, None) / 100
+        discount_factor = 1 - np.clip(discount, 0, None) / 100
+        return (net[:, :, None, None, :]
+                * markup_factor[:, None, :, None, None]
+                * discount_factor[:, None, None, :, None])
+
+    def evaluate(self, hourly_rates=(None,), markups=(None,), discounts=(None,), supplier_factors=(None,)):
+        """Wertet das Szenario-Raster aus - ein DataFrame mit einer Zeile pro Szenario"""
+        grid = [_values(hourly_rates), _values(markups), _values(discounts), _values(supplier_factors)]
+        if np.prod([len(values) for values in grid]) > MAX_SCENARIOS:
+            raise ValueError(f'Zu viele Szenarien (maximal {MAX_SCENARIOS})')
+
+        totals = self._totals(*grid)
+        differences = totals - self.current_totals[:, None, None, None, None]
+        current_sum = self.current_totals.sum()
+        scenarios = pd.DataFrame(
+            list(itertools.product(*grid)),
+            columns=['hourly_rate', 'markup', 'discount', 'supplier_factor'],
+        ).astype(object).where(lambda frame: frame.notna(), None)
+        scenarios['total_current'] = round(current_sum, 2)
+        scenarios['total_new'] = totals.sum(axis=0).reshape(-1).round(2)
+        scenarios['difference'] = (scenarios['total_new'] - current_sum).round(2)
+        scenarios['difference_percent'] = (scenarios['difference'] / current_sum * 100).round(2) if current_sum else 0.0
+        scenarios['quotes_changed'] = (np.abs(differences) >= 0.005).sum(axis=0).reshape(-1)
+        return scenarios
+
+    def quote_totals(self, hourly_rate=None, markup=None, discount=None, supplier_factor=None):
+        """Alte und neue Summe pro Angebot für ein einzelnes Szenario"""
+        totals = self._totals(_values([hourly_rate]), _values([markup]), _values([discount]),
+                              _values([supplier_factor]))[:, 0, 0, 0, 0]
+        result = self.quotes[['quote_number', 'status']].copy()
+        result['total_current'] = self.current_totals.round(2)
+        result['total_new'] = totals.round(2)
+        result['difference'] = (result['total_new'] - result['total_current']).round(2)
+        return result
+
+    # ===============================
+    # ÜBERNEHMEN
+    # ===============================
+
+    def apply(self, hourly_rate=None, markup=None, discount=None, supplier_factor=None):
+        """Übernimmt ein Szenario mit set-basierten UPDATEs in einer Transaktion; gibt die Anzahl Angebote zurück"""
+        totals = self.quote_totals(hourly_rate, markup, discount, supplier_factor)['total_new']
+        selected_items = db.session.query(QuoteItem.id).filter(
+            QuoteItem.quote_id.in_(self._selected_quote_ids())
+        )
+        try:
+            if hourly_rate is not None:
+                QuoteSubItem.query.filter(
+                    QuoteSubItem.quote_item_id.in_(selected_items), self._labour_condition()
+                ).update({
+                    QuoteSubItem.hourly_rate: hourly_rate,
+                    QuoteSubItem.price: QuoteSubItem.hours * hourly_rate,
+                }, synchronize_session=False)
+            if supplier_factor is not None and supplier_factor != 1:
+                QuoteSubItem.query.filter(
+                    QuoteSubItem.quote_item_id.in_(selected_items), self._parts_condition()
+                ).update({
+                    QuoteSubItem.part_price: QuoteSubItem.part_price * supplier_factor,
+                    QuoteSubItem.price: QuoteSubItem.price * supplier_factor,
+                }, synchronize_session=False)
+
+            # Hauptpositionen mit Unterpositionen: Summe der Unterpositionen
+            sub_item_total = db.session.query(func.sum(QuoteSubItem.price)).filter(
+                QuoteSubItem.quote_item_id == QuoteItem.id
+            ).scalar_subquery()
+            has_sub_items = db.session.query(QuoteSubItem.id).filter(
+                QuoteSubItem.quote_item_id == QuoteItem.id
+            ).exists()
+            QuoteItem.query.filter(QuoteItem.id.in_(selected_items), has_sub_items).update(
+                {QuoteItem.total_price: sub_item_total}, synchronize_session=False
+            )
+
+            quote_values = {}
+            if markup is not None:
+                quote_values[Quote.markup_percentage] = markup
+            if discount is not None:
+                quote_values[Quote.discount_percentage] = discount
+            quote_ids = [int(quote_id) for quote_id in totals.index]
+            for start in range(0, len(quote_ids), UPDATE_CHUNK_SIZE):
+                chunk = quote_ids[start:start + UPDATE_CHUNK_SIZE]
+                Quote.query.filter(Quote.id.in_(chunk)).update({
+                    **quote_values,
+                    Quote.total_amount: case({quote_id: float(totals[quote_id]) for quote_id in chunk}, value=Quote.id),
+                }, synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return len(quote_ids)
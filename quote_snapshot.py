@@ -0,0 +1,169 @@
+"""
+Snapshots angenommener Angebote
+Ein angenommenes Angebot ist eingefroren. Beim Annehmen wird es deshalb einmal als kompaktes
+JSON-Dokument (Tabelle quote_snapshot) festgehalten:
+    - Positionen mit Unterpositionen (inkl. berechneter Preise mit Aufschlag für das PDF)
+    - Summen (netto, Aufschlag, Rabatt, Gesamtsumme)
+    - Kosten nach Typ der Unterposition (Bestellteil, Arbeitsvorgang, Sonstiges)
+
+Auftragsansicht, Rechnungen, Arbeitsanweisungs- und Angebots-PDF lesen angenommene Angebote
+aus diesem Dokument (eine Zeile) statt den Positionsbaum Abfrage für Abfrage zu durchlaufen.
+Die Leser-Funktionen liefern Objekte mit denselben Attributen/Methoden wie QuoteItem und
+QuoteSubItem, sodass Templates und PDF-Code für beide Quellen gleich bleiben.
+"""
+from datetime import datetime
+
+from sqlalchemy.orm import selectinload
+
+from models import db, QuoteItem, QuoteSnapshot, QUOTE_SNAPSHOT_VERSION
+
+ITEM_FIELDS = (
+    'id', 'position_number', 'description', 'quantity', 'unit_price', 'total_price',
+    'item_type', 'requires_order', 'supplier',
+)
+SUB_ITEM_FIELDS = (
+    'id', 'sub_number', 'description', 'item_type', 'requires_order', 'supplier', 'part_number',
+    'part_quantity', 'part_price', 'hours', 'hourly_rate', 'quantity', 'unit_price', 'price',
+)
+COST_TYPES = ('bestellteil', 'arbeitsvorgang', 'sonstiges')
+
+
+# ===============================
+# SCHREIBEN
+# ===============================
+
+def build_snapshot_document(quote):
+    """Dokument aus dem aktuellen Stand des Angebots (Positionen werden mit zwei Abfragen geladen)"""
+    items = QuoteItem.query.options(selectinload(QuoteItem.sub_items)).filter_by(
+        quote_id=quote.id
+    ).order_by(QuoteItem.position_number, QuoteItem.id).all()
+    markup_factor = 1.0
+    if quote.markup_percentage and quote.markup_percentage > 0:
+        markup_factor = 1 + (quote.markup_percentage / 100)
+
+    # price = gespeicherter Preis, calculated_price = QuoteSubItem.calculate_price()
+    costs = {item_type: {'count': 0, 'price': 0.0, 'calculated_price': 0.0, 'hours': 0.0} for item_type in COST_TYPES}
+    positions = []
+    net_total = 0.0
+    for item in items:
+        sub_items = []
+        for sub_item in item.sub_items:
+            calculated_price = sub_item.calculate_price()
+            sub_items.append({
+                **{field: getattr(sub_item, field) for field in SUB_ITEM_FIELDS},
+                'calculated_price': calculated_price,
+                'price_with_markup': calculated_price * markup_factor,
+            })
+            bucket = costs.setdefault(sub_item.item_type, {'count': 0, 'price': 0.0, 'calculated_price': 0.0, 'hours': 0.0})
+            bucket['count'] += 1
+            bucket['price'] += sub_item.price or 0.0
+            bucket['calculated_price'] += calculated_price
+            bucket['hours'] += sub_item.hours or 0.0
+
+        # Wie Quote.calculate_net_total: Summe der Unterpositionen bzw. Menge × Einzelpreis
+        if item.sub_items:
+            net_price = sum(sub_item.price for sub_item in item.sub_items)
+        else:
+            net_price = item.quantity * item.unit_price
+        net_total += net_price
+        calculated_price = item.calculate_price()
+        positions.append({
+            **{field: getattr(item, field) for field in ITEM_FIELDS},
+            'calculated_price': calculated_price,
+            'price_with_markup': calculated_price * markup_factor,
+            'sub_items': sub_items,
+        })
+
+    markup_amount = net_total * (markup_factor - 1)
+    total = quote.total_from_net(net_total)
+    return {
+        'version': QUOTE_SNAPSHOT_VERSION,
+        'quote_id': quote.id,
+        'quote_number': quote.quote_number,
+        'accepted_at': datetime.utcnow().isoformat(),
+        'markup_percentage': quote.markup_percentage,
+        'discount_percentage': quote.discount_percentage,
+        'positions': positions,
+        'totals': {
+            'net_total': net_total,
+            'markup_amount': markup_amount,
+            'discount_amount': net_total + markup_amount - total,
+            'total': total,
+        },
+        'costs': costs,
+    }
+
+
+def write_quote_snapshot(quote):
+    """Schreibt (bzw. ersetzt nach einer Stornierung) den Snapshot eines angenommenen Angebots.
+    Der Aufrufer committet - zusammen mit dem Statuswechsel."""
+    document = build_snapshot_document(quote)
+    snapshot = quote.snapshot
+    if snapshot is None:
+        snapshot = QuoteSnapshot(quote_id=quote.id)
+        db.session.add(snapshot)
+        quote.snapshot = snapshot
+    snapshot.schema_version = QUOTE_SNAPSHOT_VERSION
+    snapshot.created_at = datetime.utcnow()
+    snapshot.document = document
+    return snapshot
+
+
+# ===============================
+# LESEN
+# ===============================
+
+class SnapshotSubItem:
+    """Unterposition aus dem Snapshot - gleiche Attribute wie QuoteSubItem"""
+
+    def __init__(self, data):
+        self.__dict__.update(data)
+
+    def calculate_price(self):
+        return self.calculated_price
+
+    def calculate_price_with_markup(self):
+        return self.price_with_markup
+
+
+class SnapshotItem:
+    """Position aus dem Snapshot - gleiche Attribute wie QuoteItem"""
+
+    def __init__(self, data):
+        self.__dict__.update({key: value for key, value in data.items() if key != 'sub_items'})
+        self.sub_items = [SnapshotSubItem(sub_item) for sub_item in data['sub_items']]
+
+    def calculate_price(self):
+        return self.calculated_price
+
+    def calculate_price_with_markup(self):
+        return self.price_with_markup
+
+
+def quote_positions(quote):
+    """Positionen eines Angebots - bei angenommenen Angeboten aus dem Snapshot, sonst live"""
+    document = QuoteSnapshot.document_for(quote)
+    if document is None:
+        return quote.quote_items
+    return [SnapshotItem(position) for position in document['positions']]
+
+
+def quote_summary(quote):
+    """Summen (net_total, markup_amount, discount_amount, total) - aus dem Snapshot oder live berechnet"""
+    document = QuoteSnapshot.document_for(quote)
+    if document is not None:
+        return document['totals']
+    return {
+        'net_total': quote.calculate_net_total(),
+        'markup_amount': quote.calculate_markup_amount(),
+        'discount_amount': quote.calculate_discount_amount(),
+        'total': quote.calculate_total(),
+    }
+
+
+def quote_costs(quote):
+    """Kosten nach Typ der Unterposition ({Typ: {count, price, calculated_price, hours}})"""
+    document = QuoteSnapshot.document_for(quote)
+    if document is not None:
+        return document['costs']
+    return build_snapshot_document(quote)['costs']
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Lokaler SMTP-Testserver für die E-Mail-Warteschlange (mail_queue.py)
+Nimmt alle E-Mails an, zeigt Empfänger und Betreff an und speichert sie optional als .eml-Dateien.
+Es wird nichts weitergeleitet.
+
+Verwendung:
+    python smtp_test_server.py [--port 1025] [--save-dir temp_mails]
+    SMTP_HOST=localhost SMTP_PORT=1025 SMTP_USE_TLS=0 python app.py
+"""
+import os
+import argparse
+import threading
+import socketserver
+from datetime import datetime
+from email import message_from_bytes
+from email.header import decode_header, make_header
+
+
+class SMTPTestHandler(socketserver.StreamRequestHandler):
+    """Minimaler SMTP-Dialog (EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT) - mehrere E-Mails pro Verbindung"""
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode('ascii'))
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 localhost SMTP-Testserver')
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250-localhost' if verb == 'EHLO' else '250 localhost')
+                if verb == 'EHLO':
+                    self.reply('250-8BITMIME')
+                    self.reply('250 SMTPUTF8')
+            elif verb == 'MAIL':
+                sender, recipients = command[10:].strip(), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(command[8:].strip())
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 Ende mit <CRLF>.<CRLF>')
+                data = []
+                for data_line in self.rfile:
+                    if data_line in (b'.\r\n', b'.\n'):
+                        break
+                    data.append(data_line[1:] if data_line.startswith(b'..') else data_line)
+                reply = self.server.data_reply
+                if reply.startswith('250'):
+                    self.server.receive(sender, recipients, b''.join(data))
+                sender, recipients = None, []
+                self.reply(reply)
+            elif verb == 'RSET':
+                sender, recipients = None, []
+                self.reply('250 OK')
+            elif verb == 'NOOP':
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Befehl nicht unterstützt')
+
+
+class SMTPTestServer(socketserver.ThreadingTCPServer):
+    """
+    SMTP-Testserver; empfangene E-Mails stehen in .messages (auch für Tests im selben Prozess).
+    data_reply ist die Antwort auf DATA - z.B. '451 ...' oder '554 ...', um Fehler des Servers zu testen.
+    """
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host='localhost', port=1025, save_dir=None, verbose=True):
+        super().__init__((host, port), SMTPTestHandler)
+        self.save_dir = save_dir
+        self.verbose = verbose
+        self.messages = []
+        self.connections = 0
+        self.data_reply = '250 OK'
+        self._lock = threading.Lock()
+
+    def receive(self, sender, recipients, data):
+        message = message_from_bytes(data)
+        with self._lock:
+            self.messages.append(message)
+            number = len(self.messages)
+        if self.save_dir:
+            os.makedirs(self.save_dir, exist_ok=True)
+            filename = f"{datetime.now():%Y%m%d_%H%M%S}_{number:04d}.eml"
+            with open(os.path.join(self.save_dir, filename), 'wb') as file:
+                file.write(data)
+        if self.verbose:
+            subject = str(make_header(decode_header(message.get('Subject', ''))))
+            print(f"[{number}] {sender} -> {', '.join(recipients)}: {subject}")
+
+    def start(self):
+        """Startet den Server im Hintergrund-Thread"""
+        thread = threading.Thread(target=self.serve_forever, name='smtp-test-server', daemon=True)
+        thread.start()
+        return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lokaler SMTP-Testserver')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=1025)
+    parser.add_argument('--save-dir', help='Empfangene E-Mails als .eml-Dateien speichern')
+    args = parser.parse_args()
+
+    server = SMTPTestServer(args.host, args.port, args.save_dir)
+    print(f"SMTP-Testserver läuft auf {args.host}:{args.port} (Strg+C zum Beenden)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n{len(server.messages)} E-Mail(s) über {server.connections} Verbindung(en) empfangen")
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Gemeinsame Fixtures: eigene Flask-App mit leerer SQLite-Datenbank und lokalem SMTP-Testserver
+(app.py wird nicht importiert - die Tests sollen die Entwicklungsdatenbank nicht anfassen)
+"""
+import os
+import sys
+
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db  # noqa: E402
+from smtp_test_server import SMTPTestServer  # noqa: E402
+
+
+@pytest.fixture
+def smtp_server():
+    """SMTP-Testserver auf einem freien Port"""
+    server = SMTPTestServer('localhost', 0, verbose=False)
+    server.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def app(tmp_path, smtp_server):
+    """App mit leerer Datenbank, versendet über den SMTP-Testserver"""
+    app = Flask(__name__)
+    app.config.update(
+        TESTING=True,
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'test.db'}",
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        SMTP_HOST='localhost',
+        SMTP_PORT=smtp_server.server_address[1],
+        SMTP_USE_TLS=False,
+        SMTP_TIMEOUT=5,
+        MAIL_DEFAULT_SENDER='bestellung@innsan.at',
+        MAIL_QUEUE_BATCH_SIZE=50,
+        MAIL_MAX_ATTEMPTS=5,
+        MAIL_RETRY_DELAY=60,
+    )
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
@@ -0,0 +1,118 @@
+"""
+E-Mail-Warteschlange (mail_queue.py) gegen den lokalen SMTP-Testserver
+"""
+from datetime import datetime, timedelta
+
+from mail_queue import (
+    EMAIL_STATUS_FAILED, EMAIL_STATUS_QUEUED, EMAIL_STATUS_SENT,
+    enqueue_supplier_order_email, send_queued_emails
+)
+from models import db, Customer, OutboundEmail, Quote, Supplier, SupplierOrder, SupplierOrderItem
+from purchasing import STATUS_OPEN, STATUS_ORDERED, start_purchase_run
+
+SUPPLIER = 'Sanitär Großhandel'
+
+
+def _queue_purchase_run(order_count):
+    """Legt order_count offene Bestellungen (je ein Projekt) an und reiht die Sammelbestellung ein"""
+    db.session.add(Supplier(name=SUPPLIER, email='einkauf@example.com'))
+    supplier_order_ids = []
+    for index in range(order_count):
+        customer = Customer(first_name='Max', last_name=f'Kunde {index}', email=f'kunde{index}@example.com')
+        db.session.add(customer)
+        db.session.flush()
+        quote = Quote(quote_number=f'ANG-TEST_{index}', customer_id=customer.id)
+        db.session.add(quote)
+        db.session.flush()
+        supplier_order = SupplierOrder(quote_id=quote.id, supplier_name=SUPPLIER, status=STATUS_OPEN)
+        supplier_order.items.append(SupplierOrderItem(sub_number='1.1', description='Duschtasse', quantity='1'))
+        db.session.add(supplier_order)
+        db.session.flush()
+        supplier_order_ids.append(supplier_order.id)
+    db.session.commit()
+
+    purchase_run, supplier_orders = start_purchase_run(SUPPLIER, supplier_order_ids)
+    enqueue_supplier_order_email(SUPPLIER, supplier_orders)
+    db.session.commit()
+    return purchase_run, supplier_order_ids
+
+
+def _supplier_orders(ids):
+    db.session.expire_all()
+    return SupplierOrder.query.filter(SupplierOrder.id.in_(ids)).all()
+
+
+def test_purchase_run_sent_as_one_mail_over_one_connection(app, smtp_server):
+    purchase_run, ids = _queue_purchase_run(20)
+    assert all(order.email_status == EMAIL_STATUS_QUEUED for order in _supplier_orders(ids))
+
+    results = send_queued_emails()
+
+    assert results == {'sent': 1, 'retry': 0, 'failed': 0}
+    assert smtp_server.connections == 1
+    assert len(smtp_server.messages) == 1
+    assert smtp_server.messages[0]['To'] == 'einkauf@example.com'
+    for order in _supplier_orders(ids):
+        assert order.purchase_run == purchase_run
+        assert order.status == STATUS_ORDERED
+        assert order.email_status == EMAIL_STATUS_SENT
+    email = OutboundEmail.query.one()
+    assert email.status == OutboundEmail.STATUS_SENT
+    assert email.sent_at is not None
+
+
+def test_temporary_failure_is_retried_later(app, smtp_server):
+    smtp_server.data_reply = '451 Bitte spaeter erneut versuchen'
+    _, ids = _queue_purchase_run(3)
+    before = datetime.utcnow()
+
+    results = send_queued_emails()
+
+    assert results == {'sent': 0, 'retry': 1, 'failed': 0}
+    email = OutboundEmail.query.one()
+    assert email.status == OutboundEmail.STATUS_PENDING
+    assert email.attempts == 1
+    assert '451' in email.last_error
+    # Erster Versuch: MAIL_RETRY_DELAY Sekunden Wartezeit, bis dahin nicht erneut fällig
+    assert email.next_attempt_at >= before + timedelta(seconds=60)
+    assert send_queued_emails() == {'sent': 0, 'retry': 0, 'failed': 0}
+    for order in _supplier_orders(ids):
+        assert order.status == STATUS_OPEN
+        assert order.email_status == EMAIL_STATUS_QUEUED
+
+    # Zweiter Versuch: Wartezeit verdoppelt sich
+    email.next_attempt_at = datetime.utcnow()
+    db.session.commit()
+    before = datetime.utcnow()
+    assert send_queued_emails() == {'sent': 0, 'retry': 1, 'failed': 0}
+    db.session.expire_all()
+    email = OutboundEmail.query.one()
+    assert email.attempts == 2
+    assert email.next_attempt_at >= before + timedelta(seconds=120)
+
+    # Server wieder erreichbar: E-Mail geht raus, Bestellungen werden bestellt
+    smtp_server.data_reply = '250 OK'
+    email.next_attempt_at = datetime.utcnow()
+    db.session.commit()
+    assert send_queued_emails() == {'sent': 1, 'retry': 0, 'failed': 0}
+    assert len(smtp_server.messages) == 1
+    for order in _supplier_orders(ids):
+        assert order.status == STATUS_ORDERED
+        assert order.email_status == EMAIL_STATUS_SENT
+
+
+def test_permanent_failure_is_not_retried(app, smtp_server):
+    smtp_server.data_reply = '554 Nachricht abgelehnt'
+    _, ids = _queue_purchase_run(3)
+
+    results = send_queued_emails()
+
+    assert results == {'sent': 0, 'retry': 0, 'failed': 1}
+    email = OutboundEmail.query.one()
+    assert email.status == OutboundEmail.STATUS_FAILED
+    assert email.attempts == 1
+    assert '554' in email.last_error
+    assert smtp_server.messages == []
+    for order in _supplier_orders(ids):
+        assert order.status == STATUS_OPEN
+        assert order.email_status == EMAIL_STATUS_FAILED
@@ -3,8 +3,11 @@ Utility-Funktionen für die InstallationApp
 """
 import os
 import csv
+import logging
 from datetime import date
-from models import db, PositionTemplate, Supplier, CompanySettings, Quote
+from models import db, PositionTemplate, Supplier, CompanySettings, Quote, parse_quantity
+
+logger = logging.getLogger(__name__)
 
 def format_currency_de(amount):
     """Formatiert Beträge im deutschen Format: 1.234,56 € oder -1.234,56 €"""
@@ -138,10 +141,10 @@ def generate_quote_number():
 def load_position_templates():
     """Lädt Positionsvorlagen aus CSV - DEAKTIVIERT da neues Template-System verwendet wird"""
     try:
-        print("CSV-Import von Positionsvorlagen wurde deaktiviert - verwende neues Template-System")
+        logger.info("CSV-Import von Positionsvorlagen wurde deaktiviert - verwende neues Template-System")
         return True
     except Exception as e:
-        print(f"Fehler beim Laden der Positionsvorlagen: {e}")
+        logger.error("Fehler beim Laden der Positionsvorlagen: %s", e)
         return False
 
 def load_suppliers():
@@ -150,7 +153,7 @@ def load_suppliers():
         suppliers_path = os.path.join(os.path.dirname(__file__), 'templates_excel', 'lieferanten_template.csv')
         
         if not os.path.exists(suppliers_path):
-            print(f"CSV-Datei nicht gefunden: {suppliers_path}")
+            logger.warning("CSV-Datei nicht gefunden: %s", suppliers_path)
             return False
         
         # Lösche vorhandene Lieferanten
@@ -173,7 +176,7 @@ def load_suppliers():
         db.session.commit()
         return True
     except Exception as e:
-        print(f"Fehler beim Laden der Lieferanten: {e}")
+        logger.error("Fehler beim Laden der Lieferanten: %s", e)
         db.session.rollback()
         return False
 
@@ -197,25 +200,7 @@ def safe_float_conversion(value, default=0.0):
 
 def parse_quantity_from_text(quantity_text):
     """Extrahiert numerischen Wert aus Text (z.B. "2.5m²" -> 2.5)"""
-    if not quantity_text:
-        return 0.0
-    
-    # Versuche direkte Konvertierung
-    try:
-        return float(quantity_text.replace(',', '.'))
-    except ValueError:
-        pass
-    
-    # Extrahiere Zahlen am Anfang des Textes
-    import re
-    match = re.match(r'^([\d,\.]+)', quantity_text.strip())
-    if match:
-        try:
-            return float(match.group(1).replace(',', '.'))
-        except ValueError:
-            pass
-    
-    return 0.0
+    return parse_quantity(quantity_text) or 0.0
 
 def generate_supplier_order_email(quote, supplier_name, order_items, order_number=None):
     """Generiert E-Mail-Template für Lieferantenbestellung"""
@@ -319,36 +304,14 @@ Mit freundlichen Grüßen<br>
     return subject, html_body, plain_body
 
 def collect_supplier_orders(quote):
-    """Sammelt alle Bestellteile pro Lieferant für ein Angebot"""
-    supplier_orders = {}
-    
-    for quote_item in quote.quote_items:
-        for sub_item in quote_item.sub_items:
-            if (sub_item.item_type == 'bestellteil' and 
-                sub_item.requires_order and 
-                sub_item.supplier):
-                
-                supplier = sub_item.supplier
-                if supplier not in supplier_orders:
-                    supplier_orders[supplier] = []
-                
-                supplier_orders[supplier].append({
-                    'sub_number': sub_item.sub_number,
-                    'description': sub_item.description,
-                    'part_number': sub_item.part_number or '',
-                    'quantity': sub_item.part_quantity or '1',
-                    'quote_sub_item_id': sub_item.id  # Für Referenz
-                })
-    
-    return supplier_orders
+    """Sammelt alle Bestellteile pro Lieferant für ein Angebot (eine Abfrage, siehe purchasing.py)"""
+    from purchasing import collect_orderable_parts
+    return collect_orderable_parts([quote.id]).get(quote.id, {})
 
 def get_supplier_email(supplier_name):
-    """Holt die E-Mail-Adresse eines Lieferanten"""
-    from models import Supplier
-    supplier = Supplier.query.filter_by(name=supplier_name).first()
-    if supplier and supplier.email:
-        return supplier.email
-    return None
+    """Holt die E-Mail-Adresse eines Lieferanten (aus dem Stammdaten-Cache)"""
+    from master_data_cache import get_supplier_email as get_cached_supplier_email
+    return get_cached_supplier_email(supplier_name)
 
 def generate_order_number():
     """Generiert eine eindeutige Auftragsnummer"""
@@ -1,16 +1,97 @@
-# Arbeitsschritte-Konfiguration für Angebotserstellung
-# Diese Datei definiert alle verfügbaren Arbeitsschritte mit Standardzeiten
+"""
+Arbeitsschritte-Katalog für die Angebotserstellung
+Die Arbeitsschritte mit Standardzeiten stehen in der Tabelle work_step und werden über den
+Stammdaten-Cache gelesen (master_data_cache.py, Art 'work_step'): jeder Worker hält den Katalog
+samt Index (Kategorie, Name) im Speicher und lädt ihn nur neu, wenn sich die Version geändert hat.
+Änderungen sind damit sofort in allen gunicorn-Workern sichtbar und überstehen ein Redeploy.
+
+DEFAULT_WORK_STEPS ist der Ausgangsbestand (per Migration eingespielt); er wird nur verwendet,
+solange die Tabelle leer ist und der Katalog noch nie gespeichert wurde.
+"""
+from master_data_cache import get_work_step_catalog
+from models import db, WorkStep
+
+DEFAULT_WORK_STEPS = {
+    'Abbruch': [
+        {'name': 'Wanne raus', 'default_hours': 4.0},
+        {'name': 'Dusche raus', 'default_hours': 4.0},
+        {'name': 'WC abbauen', 'default_hours': 1.0},
+        {'name': 'WT abbauen je Teil', 'default_hours': 1.0},
+        {'name': 'Duschglas abbauen', 'default_hours': 1.0},
+        {'name': 'Sockel / Vorwand abbauen', 'default_hours': 1.0},
+        {'name': 'Heizkörper', 'default_hours': 2.0},
+        {'name': 'Bodenfliesen raus', 'default_hours': 4.0},
+        {'name': 'Wandfliesen raus', 'default_hours': 8.0},
+        {'name': 'Therme demonieren', 'default_hours': 2.0},
+        {'name': 'Zwischenwand entfernen', 'default_hours': 2.0},
+        {'name': 'Decke abbauen', 'default_hours': 3.0},
+    ],
+    'Duschtasse': [
+        {'name': 'Abfluss stemmen Versetzen', 'default_hours': 2.0},
+        {'name': 'Abfluss stemmen Bodengleich', 'default_hours': 4.0},
+        {'name': 'Tasse setzen', 'default_hours': 4.0},
+        {'name': 'Tasse zuscheiden', 'default_hours': 2.0},
+        {'name': 'Duschkabine schwer', 'default_hours': 6.0},
+        {'name': 'Duschkabine leicht', 'default_hours': 2.0},
+        {'name': 'Armatur montieren', 'default_hours': 2.0},
+        {'name': 'Klappsitz', 'default_hours': 1.0},
+        {'name': 'Haltegriff montieren', 'default_hours': 1.0},
+        {'name': 'Duschnische einbauen', 'default_hours': 2.0},
+        {'name': 'Duschrinne installieren', 'default_hours': 4.0},
+        {'name': 'geflieste Rinne setzen', 'default_hours': 4.0},
+    ],
+    'Badewanne': [
+        {'name': 'setzen', 'default_hours': 4.0},
+        {'name': 'verkleiden', 'default_hours': 4.0},
+        {'name': 'Armatur', 'default_hours': 2.0},
+        {'name': 'Glasaufsatz', 'default_hours': 2.0},
+    ],
+    'WC': [
+        {'name': 'UP-Gestell', 'default_hours': 6.0},
+        {'name': 'WC installieren', 'default_hours': 2.0},
+        {'name': 'Dusch WC installieren', 'default_hours': 4.0},
+        {'name': 'Haltegriff montieren', 'default_hours': 1.0},
+    ],
+    'Waschtisch/Möbel': [
+        {'name': 'Waschtisch', 'default_hours': 2.0},
+        {'name': 'Möbel je Teil', 'default_hours': 2.0},
+    ],
+    'Heizkörper': [
+        {'name': 'Heizkörper installieren', 'default_hours': 6.0},
+        {'name': 'Heizkörper montieren', 'default_hours': 2.0},
+        {'name': 'Therme montieren', 'default_hours': 4.0},
+    ],
+    'Entsorgung': [
+        {'name': 'Pauschale klein', 'default_hours': 1.1},
+        {'name': 'Pauschale normal', 'default_hours': 5.1},
+    ],
+}
 
-WORK_STEPS = {'Abbruch': [{'name': 'Wanne raus', 'default_hours': 4.0}, {'name': 'Dusche raus', 'default_hours': 4.0}, {'name': 'WC abbauen', 'default_hours': 1.0}, {'name': 'WT abbauen je Teil', 'default_hours': 1.0}, {'name': 'Duschglas abbauen', 'default_hours': 1.0}, {'name': 'Sockel / Vorwand abbauen', 'default_hours': 1.0}, {'name': 'Heizkörper', 'default_hours': 2.0}, {'name': 'Bodenfliesen raus', 'default_hours': 4.0}, {'name': 'Wandfliesen raus', 'default_hours': 8.0}, {'name': 'Therme demonieren', 'default_hours': 2.0}, {'name': 'Zwischenwand entfernen', 'default_hours': 2.0}, {'name': 'Decke abbauen', 'default_hours': 3.0}], 'Duschtasse': [{'name': 'Abfluss stemmen Versetzen', 'default_hours': 2.0}, {'name': 'Abfluss stemmen Bodengleich', 'default_hours': 4.0}, {'name': 'Tasse setzen', 'default_hours': 4.0}, {'name': 'Tasse zuscheiden', 'default_hours': 2.0}, {'name': 'Duschkabine schwer', 'default_hours': 6.0}, {'name': 'Duschkabine leicht', 'default_hours': 2.0}, {'name': 'Armatur montieren', 'default_hours': 2.0}, {'name': 'Klappsitz', 'default_hours': 1.0}, {'name': 'Haltegriff montieren', 'default_hours': 1.0}, {'name': 'Duschnische einbauen', 'default_hours': 2.0}, {'name': 'Duschrinne installieren', 'default_hours': 4.0}, {'name': 'geflieste Rinne setzen', 'default_hours': 4.0}], 'Badewanne': [{'name': 'setzen', 'default_hours': 4.0}, {'name': 'verkleiden', 'default_hours': 4.0}, {'name': 'Armatur', 'default_hours': 2.0}, {'name': 'Glasaufsatz', 'default_hours': 2.0}], 'WC': [{'name': 'UP-Gestell', 'default_hours': 6.0}, {'name': 'WC installieren', 'default_hours': 2.0}, {'name': 'Dusch WC installieren', 'default_hours': 4.0}, {'name': 'Haltegriff montieren', 'default_hours': 1.0}], 'Waschtisch/Möbel': [{'name': 'Waschtisch', 'default_hours': 2.0}, {'name': 'Möbel je Teil', 'default_hours': 2.0}], 'Heizkörper': [{'name': 'Heizkörper installieren', 'default_hours': 6.0}, {'name': 'Heizkörper montieren', 'default_hours': 2.0}, {'name': 'Therme montieren', 'default_hours': 4.0}], 'Entsorgung': [{'name': 'Pauschale klein', 'default_hours': 1.1}, {'name': 'Pauschale normal', 'default_hours': 5.1}]}
 
 def get_work_steps():
-    """Gibt alle verfügbaren Arbeitsschritte zurück"""
-    return WORK_STEPS
+    """Gibt alle verfügbaren Arbeitsschritte zurück ({Kategorie: [{'name', 'default_hours'}, ...]})"""
+    return get_work_step_catalog()['by_category']
+
 
 def get_work_step_by_category_and_name(category, name):
-    """Gibt einen spezifischen Arbeitsschritt zurück"""
-    if category in WORK_STEPS:
-        for step in WORK_STEPS[category]:
-            if step["name"] == name:
-                return step
-    return None
+    """Gibt einen spezifischen Arbeitsschritt zurück (Nachschlagen per Index in O(1))"""
+    return get_work_step_catalog()['by_key'].get((category, name))
+
+
+def replace_work_steps(work_steps):
+    """
+    Ersetzt den Katalog durch work_steps ({Kategorie: [{'name', 'default_hours'}, ...]}, Reihenfolge
+    wie übergeben). Der Aufrufer committet - mit dem Commit sehen alle Worker den neuen Stand.
+    """
+    WorkStep.query.delete(synchronize_session=False)
+    db.session.add_all([
+        WorkStep(
+            category=category,
+            category_order=category_order,
+            name=step['name'],
+            default_hours=step['default_hours'],
+            sort_order=sort_order,
+        )
+        for category_order, (category, steps) in enumerate(work_steps.items())
+        for sort_order, step in enumerate(steps)
+    ])
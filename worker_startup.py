@@ -0,0 +1,79 @@
+"""
+Schneller Start der gunicorn-Worker
+    - Jinja-Bytecode-Cache auf der Platte (JINJA_BYTECODE_CACHE_DIR): kompilierte Templates
+      überleben Worker-Neustarts, geänderte Templates werden über die Prüfsumme erkannt
+    - Vorwärmen: alle Templates beim Start kompilieren statt beim ersten Aufruf jeder Seite
+      (auch manuell per "flask --app app warm-templates")
+    - Preload-Modus (preload_app in gunicorn.conf.py): app.py wird einmal im Master importiert,
+      die Worker teilen sich Code, Templates und Caches per Copy-on-Write. Vor dem Fork werden die
+      DB-Verbindungen geschlossen und alle Objekte per gc.freeze() aus der Garbage Collection
+      genommen (sonst kopiert jeder GC-Lauf die Seiten in jeden Worker); Hintergrund-Jobs
+      starten erst im Worker. Der Log-Listener-Thread startet sich im Worker selbst neu
+      (os.register_at_fork in logging_config.setup_logging).
+"""
+import gc
+import logging
+import os
+import time
+
+from jinja2 import FileSystemBytecodeCache, TemplateError
+
+from logging_config import setup_logging
+from models import db
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up_templates(app):
+    """Kompiliert alle HTML-Templates vorab (landen im Template-Cache und im Bytecode-Cache)"""
+    started = time.perf_counter()
+    count = 0
+    for name in app.jinja_env.list_templates(extensions=('html',)):
+        try:
+            app.jinja_env.get_template(name)
+            count += 1
+        except TemplateError as e:
+            # Fehlerhafte Templates fallen erst beim Aufruf auf - der Start geht trotzdem weiter
+            logger.warning("Template %s konnte nicht kompiliert werden: %s", name, e)
+    logger.info("%d Templates in %.0f ms vorkompiliert", count, (time.perf_counter() - started) * 1000)
+    return count
+
+
+def init_template_cache(app):
+    """Aktiviert den Bytecode-Cache und registriert den CLI-Befehl zum Vorwärmen"""
+    directory = app.config.get('JINJA_BYTECODE_CACHE_DIR')
+    if directory:
+        try:
+            os.makedirs(directory, exist_ok=True)
+            app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+        except OSError as e:
+            logger.warning("Jinja-Bytecode-Cache %s nicht verfügbar: %s", directory, e)
+
+    @app.cli.command('warm-templates')
+    def warm_templates_command():
+        """Alle Templates kompilieren und im Bytecode-Cache ablegen"""
+        print(f"{warm_up_templates(app)} Templates vorkompiliert")
+
+
+def prepare_for_fork(app):
+    """Im gunicorn-Master nach dem Laden der App (preload_app), bevor die Worker geforkt werden"""
+    warm_up_templates(app)
+    # Verbindungen aus dem Start (z.B. DB-Prüfung in create_app) nicht an die Worker vererben
+    with app.app_context():
+        db.engine.dispose()
+    gc.collect()
+    gc.freeze()
+
+
+def after_fork(app):
+    """Im Worker direkt nach dem Fork (preload_app)"""
+    # Log-Listener läuft bereits wieder (register_at_fork) - hier nur zur Sicherheit, kostet nichts
+    setup_logging()
+    with app.app_context():
+        # Geerbte Pool-Einträge verwerfen, ohne die Verbindungen des Masters zu schließen
+        db.engine.dispose(close=False)
+
+    from customer_status_job import start_customer_status_job
+    from mail_queue import start_mail_sender
+    start_customer_status_job(app)
+    start_mail_sender(app)